@@ -32,6 +32,22 @@ class Config:
     CELERY_BROKER_CONNECTION_RETRY_ON_STARTUP = True
     FLOWER_PORT = os.environ['VNDB_FLOWER_PORT']
 
+    # Local search slow-query journal
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('VNDB_SLOW_QUERY_THRESHOLD_MS', 200))
+    SLOW_QUERY_SAMPLE_RATE = float(os.environ.get('VNDB_SLOW_QUERY_SAMPLE_RATE', 1.0))
+    SLOW_QUERY_JOURNAL_SIZE = int(os.environ.get('VNDB_SLOW_QUERY_JOURNAL_SIZE', 200))
+
+    # Remote VNDB API client
+    REMOTE_CONCURRENCY = int(os.environ.get('VNDB_REMOTE_CONCURRENCY', 8))
+    REMOTE_MAX_CONNECTIONS = int(os.environ.get('VNDB_REMOTE_MAX_CONNECTIONS', 16))
+    REMOTE_TIMEOUT = float(os.environ.get('VNDB_REMOTE_TIMEOUT', 30))
+    REMOTE_RATE_LIMIT = int(os.environ.get('VNDB_REMOTE_RATE_LIMIT', 200))
+    REMOTE_RATE_PERIOD = float(os.environ.get('VNDB_REMOTE_RATE_PERIOD', 300))
+    REMOTE_RATE_BURST = int(os.environ.get('VNDB_REMOTE_RATE_BURST', 20))
+    REMOTE_BACKGROUND_RESERVE = float(os.environ.get('VNDB_REMOTE_BACKGROUND_RESERVE', 0.5))
+    REMOTE_RATE_LIMIT_REDIS_URL = os.environ.get('VNDB_REMOTE_RATE_LIMIT_REDIS_URL', CACHE_REDIS_URL)
+    REMOTE_COALESCE_TIMEOUT = float(os.environ.get('VNDB_REMOTE_COALESCE_TIMEOUT', 30))
+
     # Scheduler configuration
     SCHEDULER_API_ENABLED = True
     # SCHEDULER_TIMEZONE = "UTC"
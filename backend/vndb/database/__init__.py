@@ -1,13 +1,17 @@
 from .common import *
+from .serializer import serialize, serialize_many, dumps
 from .models import *
 from .commands import *
+from .dictionary import resolve_name, complete_name, invalidate_dictionary
 from .operations import (
-    formatId, exists, count_all, updatable,
+    MULTI_GET_LIMIT, formatId, exists, exists_many, count_all, updatable, freshness_many,
     create_save as create,
     update_save as update,
+    upsert_many_save as upsert_many,
     delete_save as delete,
     delete_all_save as delete_all,
     get_save as get,
+    get_many_save as get_many,
     get_all_save as get_all,
     cleanup_save as cleanup,
     cleanup_all_save as cleanup_all,
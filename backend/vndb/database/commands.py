@@ -1,15 +1,22 @@
+import gzip
+import json
 import os
 import subprocess
 from datetime import datetime, timezone
 from urllib.parse import urlparse
 
 import click
+import httpx
 from flask import current_app
 from flask.cli import with_appcontext
-from sqlalchemy import inspect
+from sqlalchemy import inspect, bindparam, update
 
 from vndb import db
-from .models import MODEL_MAP
+from .models import MODEL_MAP, CLOSURE_MAP
+from .operations import formatId, sync_hierarchy
+
+# The API does not expose the tag/trait hierarchy, the database dumps do
+HIERARCHY_DUMP_URL = 'https://dl.vndb.org/dump/vndb-{plural}-latest.json.gz'
 
 def register_commands(app):
     app.cli.add_command(init_db)
@@ -18,6 +25,7 @@ def register_commands(app):
     app.cli.add_command(inspect_db)
     app.cli.add_command(backup_db)
     app.cli.add_command(restore_db)
+    app.cli.add_command(sync_hierarchy_db)
 
 @click.command('init-db')
 @click.option('--drop', is_flag=True, help='Create after drop.')
@@ -160,4 +168,33 @@ def restore_db(filename):
         subprocess.run(command, env=env, check=True, capture_output=True, text=True)
         click.echo(f"Database restored successfully from: {filename}")
     except Exception as e:
-        click.echo(f"Error restoring database: {str(e)}", err=True)
\ No newline at end of file
+        click.echo(f"Error restoring database: {str(e)}", err=True)
+
+@click.command('sync-hierarchy')
+@click.option('--from-dumps', is_flag=True, help='Import tag and trait parents from the VNDB database dumps first.')
+@with_appcontext
+def sync_hierarchy_db(from_dumps):
+    """Rebuild the tag and trait closure tables."""
+    for type in CLOSURE_MAP:
+        if from_dumps:
+            url = HIERARCHY_DUMP_URL.format(plural=f'{type}s')
+            try:
+                response = httpx.get(url, follow_redirects=True, timeout=120)
+                response.raise_for_status()
+                entries = json.loads(gzip.decompress(response.content))
+            except Exception as e:
+                click.echo(f"Error downloading {url}: {str(e)}", err=True)
+                return
+            table = MODEL_MAP[type].__table__
+            rows = [
+                {'node_id': formatId(type, entry['id']), 'node_parents': [formatId(type, parent) for parent in entry.get('parents') or []]}
+                for entry in entries
+            ]
+            db.session.execute(
+                update(table).where(table.c.id == bindparam('node_id')).values(parents=bindparam('node_parents')),
+                rows
+            )
+            click.echo(f"Imported the parents of {len(rows)} {type}s.")
+        sync_hierarchy(type)
+        db.session.commit()
+        click.echo(f"Rebuilt the {type} closure table.")
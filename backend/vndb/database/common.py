@@ -4,9 +4,13 @@ from sqlalchemy import inspect
 from sqlalchemy.dialects.postgresql import JSON, JSONB, ARRAY
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
+from .derived import DERIVED_COLUMNS
+
 def convert_model_to_dict(model):
     result = {}
     for column in inspect(model).mapper.column_attrs:
+        if column.key in DERIVED_COLUMNS:
+            continue
         value = getattr(model, column.key)
         result[column.key] = convert_value(value, column)
     return result
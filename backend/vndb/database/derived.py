@@ -0,0 +1,172 @@
+import re
+from datetime import date
+from typing import Any
+
+
+# Fields folded into the `search_text` column of each model. Plain strings name
+# string or ARRAY(String) columns, (column, key) pairs pick a key out of every
+# entry of a JSONB array column.
+SEARCH_TEXT_FIELDS: dict[str, list[str | tuple[str, str]]] = {
+    'vn': ['title', 'alttitle', 'aliases', ('titles', 'title'), ('titles', 'latin')],
+    'release': ['title', 'alttitle'],
+    'character': ['name', 'original', 'aliases'],
+    'producer': ['name', 'original', 'aliases'],
+    'staff': ['name', 'original', ('aliases', 'name'), ('aliases', 'latin')],
+    'tag': ['name', 'aliases'],
+    'trait': ['name', 'aliases'],
+}
+
+# Derived columns are internal to the local search and never returned to clients
+DERIVED_COLUMNS = {
+    'search_text',
+    'released_date', 'released_precision',
+    'birthday_month', 'birthday_day', 'birthday_ordinal',
+    'resolution_width', 'resolution_height', 'resolution_aspect',
+    'cup_ordinal',
+    'has_ero_tag', 'has_sexual_trait',
+    'max_screenshot_sexual', 'max_screenshot_violence',
+    'max_image_sexual', 'max_image_violence',
+}
+
+CUP_SIZES = ['AAA', 'AA', 'A', 'B', 'C', 'D', 'E',
+             'F', 'G', 'H', 'I', 'J', 'K', 'L',
+             'M', 'N', 'O', 'P', 'Q', 'R', 'S',
+             'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
+
+_WHITESPACE = re.compile(r'\s+')
+_RELEASED = re.compile(r'^(\d{4})(?:-(\d{2}))?(?:-(\d{2}))?$')
+_PAIR = re.compile(r'^\[?(\d+),(\d+)\]?$')
+
+
+def normalize_search_text(value: str) -> str:
+    """Lowercase and collapse whitespace, the same way the migration backfill does in SQL."""
+    return _WHITESPACE.sub(' ', value).strip().lower()
+
+
+def build_search_text(type: str, values: dict[str, Any]) -> str | None:
+    parts = []
+    for field in SEARCH_TEXT_FIELDS.get(type, []):
+        if isinstance(field, tuple):
+            column, key = field
+            parts.extend(
+                entry.get(key) for entry in values.get(column) or []
+                if isinstance(entry, dict)
+            )
+        else:
+            value = values.get(field)
+            parts.extend(value if isinstance(value, list) else [value])
+
+    parts = [normalize_search_text(part) for part in parts if isinstance(part, str)]
+    parts = list(dict.fromkeys(part for part in parts if part))
+    return '\n'.join(parts) or None
+
+
+def parse_pair(value: Any) -> tuple[int, int] | None:
+    """Read the `[a,b]` pairs the remote API uses for birthdays and resolutions, as list or stored string."""
+    if isinstance(value, (list, tuple)) and len(value) == 2 and all(isinstance(item, int) for item in value):
+        return value[0], value[1]
+    match = _PAIR.match(re.sub(r'\s', '', value)) if isinstance(value, str) else None
+    return (int(match.group(1)), int(match.group(2))) if match else None
+
+
+def derive_released(value: Any) -> dict[str, Any]:
+    """
+    Type a `YYYY`, `YYYY-MM` or `YYYY-MM-DD` release string.
+
+    Partial dates are stored as their first day with the precision they were given
+    in; 'TBA' and malformed values leave both columns empty.
+    """
+    match = _RELEASED.match(value) if isinstance(value, str) else None
+    if not match:
+        return {'released_date': None, 'released_precision': None}
+    year, month, day = match.groups()
+    try:
+        released = date(int(year), int(month or 1), int(day or 1))
+    except ValueError:
+        return {'released_date': None, 'released_precision': None}
+    precision = 'day' if day else 'month' if month else 'year'
+    return {'released_date': released, 'released_precision': precision}
+
+
+def derive_birthday(value: Any) -> dict[str, Any]:
+    month, day = parse_pair(value) or (None, None)
+    return {
+        'birthday_month': month,
+        'birthday_day': day,
+        # Single sort key for keyset pagination, ordered like (month, day)
+        'birthday_ordinal': month * 100 + day if month is not None else None,
+    }
+
+
+def derive_resolution(value: Any) -> dict[str, Any]:
+    width, height = parse_pair(value) or (None, None)
+    return {
+        'resolution_width': width,
+        'resolution_height': height,
+        'resolution_aspect': width / height if height else None,
+    }
+
+
+def derive_cup(value: Any) -> dict[str, Any]:
+    cup = value.upper() if isinstance(value, str) else None
+    return {'cup_ordinal': CUP_SIZES.index(cup) if cup in CUP_SIZES else None}
+
+
+def max_score(images: Any, key: str) -> float:
+    """Highest `sexual`/`violence` vote of one image object or a list of them, 0 without votes."""
+    if isinstance(images, dict):
+        images = [images]
+    scores = [image.get(key) for image in images or [] if isinstance(image, dict)]
+    return float(max((score for score in scores if isinstance(score, (int, float))), default=0))
+
+
+def derive_content_flags(type: str, values: dict[str, Any]) -> dict[str, Any]:
+    """Precompute the verdicts the `ero=false` filters used to evaluate per row at query time."""
+    if type == 'vn':
+        return {
+            'has_ero_tag': any(
+                isinstance(tag, dict) and tag.get('category') == 'ero' for tag in values.get('tags') or []
+            ),
+            'max_screenshot_sexual': max_score(values.get('screenshots'), 'sexual'),
+            'max_screenshot_violence': max_score(values.get('screenshots'), 'violence'),
+            'max_image_sexual': max_score(values.get('image'), 'sexual'),
+            'max_image_violence': max_score(values.get('image'), 'violence'),
+        }
+    if type == 'release':
+        return {
+            'max_image_sexual': max_score(values.get('images'), 'sexual'),
+            'max_image_violence': max_score(values.get('images'), 'violence'),
+        }
+    if type == 'character':
+        return {
+            'has_sexual_trait': any(
+                'sexual' in (trait.get(key) or '').lower()
+                for trait in values.get('traits') or [] if isinstance(trait, dict)
+                for key in ('name', 'group_name')
+            ),
+            'max_image_sexual': max_score(values.get('image'), 'sexual'),
+            'max_image_violence': max_score(values.get('image'), 'violence'),
+        }
+    return {}
+
+
+def derive_columns(type: str, values: dict[str, Any]) -> dict[str, Any]:
+    """
+    Compute the derived (write-maintained) columns of a resource.
+
+    :param type: The resource type
+    :param values: The full column values of the resource
+    :return: A dict of derived column names to values
+    """
+    derived = {
+        'search_text': build_search_text(type, values),
+    }
+    if type in ('vn', 'release'):
+        derived.update(derive_released(values.get('released')))
+    if type == 'release':
+        derived.update(derive_resolution(values.get('resolution')))
+    if type == 'character':
+        derived.update(derive_birthday(values.get('birthday')))
+        derived.update(derive_cup(values.get('cup')))
+    derived.update(derive_content_flags(type, values))
+    return derived
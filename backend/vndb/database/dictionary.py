@@ -0,0 +1,154 @@
+import re
+import threading
+import time
+import unicodedata
+import uuid
+from bisect import bisect_left
+from typing import Any
+
+from sqlalchemy import event, select
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+
+from vndb import db
+from .models import MODEL_MAP
+
+DICTIONARY_TYPES = ('tag', 'trait')
+DICTIONARY_VERSION_KEY = 'name_dictionary:version:{type}'
+# Seconds between checks of the shared version, i.e. how stale another process' sync may be
+DICTIONARY_CHECK_INTERVAL = 60
+# Most ids a prefix completion may return
+PREFIX_LIMIT = 50
+
+# Session.info key collecting the dictionary types changed by the pending transaction
+DICTIONARY_CHANGED = 'name_dictionary_changed'
+
+def normalize_name(name: str) -> str:
+    """Case, width and punctuation insensitive form of a name: 'Sci-Fi' and 'sci fi' both become 'scifi'."""
+    return re.sub(r'[\W_]+', '', unicodedata.normalize('NFKC', name).casefold())
+
+class NameDictionary:
+    """
+    Name to id indexes of the local tags or traits: names and aliases, plus for traits
+    their group names and `group:name` qualified names, the syntax of the trait filters.
+    """
+
+    def __init__(self, entries: list[tuple[str, str]]):
+        self.exact: dict[str, list[str]] = {}
+        self.normalized: dict[str, list[str]] = {}
+        for id, name in entries:
+            if not name:
+                continue
+            for index, key in ((self.exact, name.strip().casefold()), (self.normalized, normalize_name(name))):
+                ids = index.setdefault(key, [])
+                if id not in ids:
+                    ids.append(id)
+        self.prefixes = sorted(self.normalized)
+
+    @classmethod
+    def build(cls, type: str) -> 'NameDictionary':
+        model = MODEL_MAP[type]
+        columns = [model.id, model.name, model.aliases]
+        if type == 'trait':
+            columns += [model.group_id, model.group_name]
+
+        entries = []
+        for row in db.session.execute(select(*columns).where(model.deleted_at == None)):
+            entries += [(row.id, name) for name in [row.name, *(row.aliases or [])]]
+            if type == 'trait' and row.group_id and row.group_name:
+                entries += [(row.group_id, row.group_name), (row.id, f"{row.group_name}:{row.name}")]
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self.normalized)
+
+    def resolve(self, name: str) -> list[str] | None:
+        """Ids of an exact, then normalized match of `name`; None if neither matches."""
+        if ids := self.exact.get(name.strip().casefold()):
+            return ids
+        key = normalize_name(name)
+        return self.normalized.get(key) if key else None
+
+    def complete(self, name: str) -> list[str] | None:
+        """Ids of the names starting with `name`, normalized; None if there are none."""
+        key = normalize_name(name)
+        if not key:
+            return None
+        ids = []
+        for prefixed in self.prefixes[bisect_left(self.prefixes, key):]:
+            if not prefixed.startswith(key) or len(ids) >= PREFIX_LIMIT:
+                break
+            ids += [id for id in self.normalized[prefixed] if id not in ids]
+        return ids[:PREFIX_LIMIT] or None
+
+_lock = threading.Lock()
+_dictionaries: dict[str, NameDictionary] = {}
+_versions: dict[str, Any] = {}
+_checked_at: dict[str, float] = {}
+
+def get_cache() -> Any:
+    """The app cache, resolved at call time: `vndb.cache` only exists once the app is created."""
+    try:
+        from vndb import cache
+        return cache
+    except ImportError:
+        return None
+
+def get_version(type: str) -> Any:
+    try:
+        return get_cache().get(DICTIONARY_VERSION_KEY.format(type=type))
+    except Exception:
+        return None
+
+def get_dictionary(type: str) -> NameDictionary:
+    """The dictionary of this process, rebuilt when a sync in any process changed the shared version."""
+    with _lock:
+        now = time.monotonic()
+        if type in _dictionaries and now - _checked_at[type] < DICTIONARY_CHECK_INTERVAL:
+            return _dictionaries[type]
+        version = get_version(type)
+        if type not in _dictionaries or version != _versions.get(type):
+            _dictionaries[type] = NameDictionary.build(type)
+            _versions[type] = version
+        _checked_at[type] = now
+        return _dictionaries[type]
+
+def resolve_name(type: str, name: str) -> list[str] | None:
+    """Ids of the local tags or traits called `name`, or None when unknown or the dictionary is unavailable."""
+    if type not in DICTIONARY_TYPES:
+        raise ValueError(f"Invalid dictionary type: {type}. Must be one of {', '.join(DICTIONARY_TYPES)}.")
+    try:
+        return get_dictionary(type).resolve(name)
+    except (SQLAlchemyError, RuntimeError):
+        return None
+
+def complete_name(type: str, name: str) -> list[str] | None:
+    """Ids of the local tags or traits whose names start with `name`, or None like `resolve_name`."""
+    if type not in DICTIONARY_TYPES:
+        raise ValueError(f"Invalid dictionary type: {type}. Must be one of {', '.join(DICTIONARY_TYPES)}.")
+    try:
+        return get_dictionary(type).complete(name)
+    except (SQLAlchemyError, RuntimeError):
+        return None
+
+def invalidate_dictionary(type: str) -> None:
+    with _lock:
+        _dictionaries.pop(type, None)
+    try:
+        get_cache().set(DICTIONARY_VERSION_KEY.format(type=type), uuid.uuid4().hex, timeout=0)
+    except Exception:
+        pass
+
+def mark_dictionary_changed(type: str) -> None:
+    """Refresh the dictionaries of every process once the current transaction commits."""
+    if type in DICTIONARY_TYPES:
+        db.session.info.setdefault(DICTIONARY_CHANGED, set()).add(type)
+
+@event.listens_for(Session, 'after_commit')
+def _refresh_after_commit(session: Session) -> None:
+    for type in session.info.pop(DICTIONARY_CHANGED, ()):
+        invalidate_dictionary(type)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_after_rollback(session: Session) -> None:
+    session.info.pop(DICTIONARY_CHANGED, None)
@@ -1,8 +1,9 @@
-from typing import Union
+from typing import Any, Union
 
-from sqlalchemy import Column, String, Integer, Float, Boolean, Text, DateTime
+from sqlalchemy import Column, String, Integer, Float, Boolean, Text, Date, DateTime, ForeignKey, Index, Table, Join, DDL, event, text, and_
 from sqlalchemy.dialects.postgresql import JSONB, ARRAY
-from sqlalchemy.sql import func
+from sqlalchemy.orm import declared_attr, column_property
+from sqlalchemy.sql import func, ColumnElement
 
 from vndb import db
 
@@ -10,103 +11,249 @@ from vndb import db
 # Resources Models
 # ----------------------------------------
 
+# The search_text trigram indexes need pg_trgm before `db.create_all()` emits them
+event.listen(db.metadata, 'before_create', DDL('CREATE EXTENSION IF NOT EXISTS pg_trgm'))
+
+def keyset_index(table: str, column: str) -> Index:
+    """(sort column, id) index over active rows, used by the cursor pagination of local listings."""
+    return Index(f'ix_{table}_{column}_id_active', column, 'id', postgresql_where=text('deleted_at IS NULL'))
+
+def detail_table(name: str, owner: str, *columns: Column) -> Table:
+    """1:1 table holding the wide, rarely listed columns of a resource, keyed by the owner id."""
+    return db.Table(
+        name,
+        Column('id', String, ForeignKey(f'{owner}.id', ondelete='CASCADE'), primary_key=True),
+        *columns
+    )
+
+def listing_table(model: type) -> Table:
+    """The table holding the id, listing columns and soft-delete state of a resource model."""
+    table = model.__table__
+    return table.left if isinstance(table, Join) else table
+
+def detail_tables(model: type) -> list[Table]:
+    """The detail tables of a split resource model, empty for single-table models."""
+    table = model.__table__
+    return [table.right] if isinstance(table, Join) else []
+
+# Content flags precomputed by `derive_columns`, per resource type
+CONTENT_FLAGS = {
+    'vn': ['has_ero_tag'],
+    'release': ['has_ero'],
+    'character': ['has_sexual_trait'],
+}
+CONTENT_SCORES = {
+    'vn': ['max_screenshot_sexual', 'max_screenshot_violence', 'max_image_sexual', 'max_image_violence'],
+    'release': ['max_image_sexual', 'max_image_violence'],
+    'character': ['max_image_sexual', 'max_image_violence'],
+}
+CONTENT_SCORE_LIMIT = 0.5
+
+def safe_content(columns: Any, type: str) -> ColumnElement:
+    """
+    The `ero=false` verdict over the precomputed content flags.
+
+    Built from the same expression for the filter (`columns` is the model) and for the
+    partial index (`columns` is `table.c`), so the planner can match the index predicate.
+    """
+    return and_(
+        *[getattr(columns, flag) == False for flag in CONTENT_FLAGS[type]],
+        *[getattr(columns, score) <= CONTENT_SCORE_LIMIT for score in CONTENT_SCORES[type]],
+    )
+
+# VN, Release and Character are split vertically: the listing table keeps the small
+# response fields, sort keys and derived columns, the detail table keeps the wide
+# JSONB/text columns. The models map a LEFT JOIN of both; since the detail id is
+# unique, Postgres drops the join from any query that reads no detail column, so
+# small listings only scan the narrow heap.
+
+vns_table = db.Table(
+    'vns',
+    Column('id', String, primary_key=True),
+    Column('title', String),
+    Column('alttitle', String),
+    Column('titles', ARRAY(JSONB)),
+    Column('aliases', ARRAY(String)),
+    Column('olang', String),
+    Column('devstatus', Integer),
+    Column('released', String),
+    Column('languages', ARRAY(String)),
+    Column('platforms', ARRAY(String)),
+    Column('image', JSONB),
+    Column('length', Integer),
+    Column('length_minutes', Integer),
+    Column('length_votes', Integer),
+    Column('average', Float),
+    Column('rating', Integer),
+    Column('votecount', Integer),
+    Column('developers', JSONB(none_as_null=True)),
+    Column('search_text', Text),
+    Column('released_date', Date),
+    Column('released_precision', String),
+    Column('has_ero_tag', Boolean),
+    Column('max_screenshot_sexual', Float),
+    Column('max_screenshot_violence', Float),
+    Column('max_image_sexual', Float),
+    Column('max_image_violence', Float),
+    Column('created_at', DateTime(timezone=True), default=func.now()),
+    Column('updated_at', DateTime(timezone=True), default=func.now(), onupdate=func.now()),
+    Column('deleted_at', DateTime(timezone=True), nullable=True),
+    Index('ix_vns_developers', 'developers', postgresql_using='gin', postgresql_ops={'developers': 'jsonb_path_ops'}),
+    Index('ix_vns_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    keyset_index('vns', 'title'),
+    keyset_index('vns', 'released_date'),
+    keyset_index('vns', 'rating'),
+    keyset_index('vns', 'votecount'),
+    keyset_index('vns', 'updated_at'),
+)
+
+vn_details_table = detail_table(
+    'vn_details', 'vns',
+    Column('description', Text),
+    Column('screenshots', ARRAY(JSONB)),
+    Column('relations', ARRAY(JSONB)),
+    Column('tags', JSONB(none_as_null=True)),
+    Column('editions', ARRAY(JSONB)),
+    Column('staff', JSONB(none_as_null=True)),
+    Column('va', ARRAY(JSONB)),
+    Column('extlinks', ARRAY(JSONB)),
+    Column('characters', JSONB(none_as_null=True)),
+    Column('releases', JSONB(none_as_null=True)),
+    Column('publishers', ARRAY(JSONB)),
+    Index('ix_vn_details_tags', 'tags', postgresql_using='gin', postgresql_ops={'tags': 'jsonb_path_ops'}),
+    Index('ix_vn_details_staff', 'staff', postgresql_using='gin', postgresql_ops={'staff': 'jsonb_path_ops'}),
+    Index('ix_vn_details_characters', 'characters', postgresql_using='gin', postgresql_ops={'characters': 'jsonb_path_ops'}),
+    Index('ix_vn_details_releases', 'releases', postgresql_using='gin', postgresql_ops={'releases': 'jsonb_path_ops'}),
+)
+
+Index('ix_vns_safe_content', vns_table.c.id,
+      postgresql_where=and_(vns_table.c.deleted_at == None, safe_content(vns_table.c, 'vn')))
+
 class VN(db.Model):
     __tablename__ = 'vns'
+    __table__ = vns_table.outerjoin(vn_details_table)
 
-    id = Column(String, primary_key=True)
-    title = Column(String)
-    alttitle = Column(String)
-    titles = Column(ARRAY(JSONB))
-    aliases = Column(ARRAY(String))
-    olang = Column(String)
-    devstatus = Column(Integer)
-    released = Column(String)
-    languages = Column(ARRAY(String))
-    platforms = Column(ARRAY(String))
-    image = Column(JSONB)
-    length = Column(Integer)
-    length_minutes = Column(Integer)
-    length_votes = Column(Integer)
-    description = Column(Text)
-    average = Column(Float)
-    rating = Column(Integer)
-    votecount = Column(Integer)
-    screenshots = Column(ARRAY(JSONB))
-    relations = Column(ARRAY(JSONB))
-    tags = Column(ARRAY(JSONB))
-    developers = Column(ARRAY(JSONB))
-    editions = Column(ARRAY(JSONB))
-    staff = Column(ARRAY(JSONB))
-    va = Column(ARRAY(JSONB))
-    extlinks = Column(ARRAY(JSONB))
-    characters = Column(ARRAY(JSONB))
-    releases = Column(ARRAY(JSONB))
-    publishers = Column(ARRAY(JSONB))
+    id = column_property(vns_table.c.id, vn_details_table.c.id)
 
-    created_at = Column(DateTime(timezone=True), default=func.now())
-    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
-    deleted_at = Column(DateTime(timezone=True), nullable=True)
+releases_table = db.Table(
+    'releases',
+    Column('id', String, primary_key=True),
+    Column('title', String),
+    Column('alttitle', String),
+    Column('languages', ARRAY(JSONB)),
+    Column('platforms', ARRAY(String)),
+    Column('vns', JSONB(none_as_null=True)),
+    Column('producers', JSONB(none_as_null=True)),
+    Column('released', String),
+    Column('minage', Integer),
+    Column('patch', Boolean),
+    Column('freeware', Boolean),
+    Column('uncensored', Boolean),
+    Column('official', Boolean),
+    Column('has_ero', Boolean),
+    Column('resolution', String),
+    Column('engine', String),
+    Column('voiced', Integer),
+    Column('gtin', String),
+    Column('catalog', String),
+    Column('search_text', Text),
+    Column('released_date', Date),
+    Column('released_precision', String),
+    Column('resolution_width', Integer),
+    Column('resolution_height', Integer),
+    Column('resolution_aspect', Float),
+    Column('max_image_sexual', Float),
+    Column('max_image_violence', Float),
+    Column('created_at', DateTime(timezone=True), default=func.now()),
+    Column('updated_at', DateTime(timezone=True), default=func.now(), onupdate=func.now()),
+    Column('deleted_at', DateTime(timezone=True), nullable=True),
+    Index('ix_releases_vns', 'vns', postgresql_using='gin', postgresql_ops={'vns': 'jsonb_path_ops'}),
+    Index('ix_releases_producers', 'producers', postgresql_using='gin', postgresql_ops={'producers': 'jsonb_path_ops'}),
+    Index('ix_releases_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    keyset_index('releases', 'title'),
+    keyset_index('releases', 'released_date'),
+    Index('ix_releases_resolution', 'resolution_width', 'resolution_height'),
+    Index('ix_releases_resolution_aspect', 'resolution_aspect'),
+)
+
+release_details_table = detail_table(
+    'release_details', 'releases',
+    Column('media', ARRAY(JSONB)),
+    Column('images', ARRAY(JSONB)),
+    Column('notes', Text),
+    Column('extlinks', ARRAY(JSONB)),
+)
+
+Index('ix_releases_safe_content', releases_table.c.id,
+      postgresql_where=and_(releases_table.c.deleted_at == None, safe_content(releases_table.c, 'release')))
 
 class Release(db.Model):
-    __tablename__ ='releases'
+    __tablename__ = 'releases'
+    __table__ = releases_table.outerjoin(release_details_table)
 
-    id = Column(String, primary_key=True)
-    title = Column(String)
-    alttitle = Column(String)
-    languages = Column(ARRAY(JSONB))
-    platforms = Column(ARRAY(String))
-    media = Column(ARRAY(JSONB))
-    vns = Column(ARRAY(JSONB))
-    producers = Column(ARRAY(JSONB))
-    images = Column(ARRAY(JSONB))
-    released = Column(String)
-    minage = Column(Integer)
-    patch = Column(Boolean)
-    freeware = Column(Boolean)
-    uncensored = Column(Boolean)
-    official = Column(Boolean)
-    has_ero = Column(Boolean)
-    resolution = Column(String)
-    engine = Column(String)
-    voiced = Column(Integer)
-    notes = Column(Text)
-    gtin = Column(String)
-    catalog = Column(String)
-    extlinks = Column(ARRAY(JSONB))
+    id = column_property(releases_table.c.id, release_details_table.c.id)
 
-    created_at = Column(DateTime(timezone=True), default=func.now())
-    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
-    deleted_at = Column(DateTime(timezone=True), nullable=True)
+characters_table = db.Table(
+    'characters',
+    Column('id', String, primary_key=True),
+    Column('name', String),
+    Column('original', String),
+    Column('aliases', ARRAY(String)),
+    Column('blood_type', String),
+    Column('height', Integer),
+    Column('weight', Integer),
+    Column('bust', Integer),
+    Column('waist', Integer),
+    Column('hips', Integer),
+    Column('cup', String),
+    Column('age', Integer),
+    Column('birthday', String),
+    Column('sex', ARRAY(String)),
+    Column('image', JSONB),
+    Column('vns', JSONB(none_as_null=True)),
+    Column('search_text', Text),
+    Column('birthday_month', Integer),
+    Column('birthday_day', Integer),
+    Column('birthday_ordinal', Integer),
+    Column('cup_ordinal', Integer),
+    Column('has_sexual_trait', Boolean),
+    Column('max_image_sexual', Float),
+    Column('max_image_violence', Float),
+    Column('created_at', DateTime(timezone=True), default=func.now()),
+    Column('updated_at', DateTime(timezone=True), default=func.now(), onupdate=func.now()),
+    Column('deleted_at', DateTime(timezone=True), nullable=True),
+    Index('ix_characters_vns', 'vns', postgresql_using='gin', postgresql_ops={'vns': 'jsonb_path_ops'}),
+    Index('ix_characters_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+    keyset_index('characters', 'name'),
+    keyset_index('characters', 'birthday_ordinal'),
+    Index('ix_characters_birthday', 'birthday_month', 'birthday_day'),
+    Index('ix_characters_cup_ordinal', 'cup_ordinal'),
+)
+
+character_details_table = detail_table(
+    'character_details', 'characters',
+    Column('description', Text),
+    Column('traits', JSONB(none_as_null=True)),
+    Column('seiyuu', JSONB(none_as_null=True)),
+    Index('ix_character_details_traits', 'traits', postgresql_using='gin', postgresql_ops={'traits': 'jsonb_path_ops'}),
+    Index('ix_character_details_seiyuu', 'seiyuu', postgresql_using='gin', postgresql_ops={'seiyuu': 'jsonb_path_ops'}),
+)
+
+Index('ix_characters_safe_content', characters_table.c.id,
+      postgresql_where=and_(characters_table.c.deleted_at == None, safe_content(characters_table.c, 'character')))
 
 class Character(db.Model):
     __tablename__ = 'characters'
+    __table__ = characters_table.outerjoin(character_details_table)
 
-    id = Column(String, primary_key=True)
-    name = Column(String)
-    original = Column(String)
-    aliases = Column(ARRAY(String))
-    description = Column(Text)
-    blood_type = Column(String)
-    height = Column(Integer)
-    weight = Column(Integer)
-    bust = Column(Integer)
-    waist = Column(Integer)
-    hips = Column(Integer)
-    cup = Column(String)
-    age = Column(Integer)
-    birthday = Column(String)
-    sex = Column(ARRAY(String))
-    image = Column(JSONB)
-    vns = Column(ARRAY(JSONB))
-    traits = Column(ARRAY(JSONB))
-    seiyuu = Column(ARRAY(JSONB))
-
-    created_at = Column(DateTime(timezone=True), default=func.now())
-    updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
-    deleted_at = Column(DateTime(timezone=True), nullable=True)
+    id = column_property(characters_table.c.id, character_details_table.c.id)
 
 class Producer(db.Model):
     __tablename__ = 'producers'
+    __table_args__ = (
+        Index('ix_producers_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        keyset_index('producers', 'name'),
+    )
 
     id = Column(String, primary_key=True)
     name = Column(String)
@@ -117,12 +264,18 @@ class Producer(db.Model):
     description = Column(Text)
     extlinks = Column(ARRAY(JSONB))
 
+    search_text = Column(Text)
+
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
 
 class Staff(db.Model):
     __tablename__ = 'staff'
+    __table_args__ = (
+        Index('ix_staff_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        keyset_index('staff', 'name'),
+    )
 
     id = Column(String, primary_key=True)
     aid = Column(String)
@@ -135,12 +288,19 @@ class Staff(db.Model):
     extlinks = Column(ARRAY(JSONB))
     aliases = Column(ARRAY(JSONB))
 
+    search_text = Column(Text)
+
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
 
 class Tag(db.Model):
     __tablename__ = 'tags'
+    __table_args__ = (
+        Index('ix_tags_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        keyset_index('tags', 'name'),
+        keyset_index('tags', 'vn_count'),
+    )
 
     id = Column(String, primary_key=True)
     aid = Column(String)
@@ -151,6 +311,9 @@ class Tag(db.Model):
     searchable = Column(Boolean)
     applicable = Column(Boolean)
     vn_count = Column(Integer)
+    parents = Column(ARRAY(String))
+
+    search_text = Column(Text)
 
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
@@ -158,6 +321,11 @@ class Tag(db.Model):
 
 class Trait(db.Model):
     __tablename__ = 'traits'
+    __table_args__ = (
+        Index('ix_traits_search_text', 'search_text', postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'}),
+        keyset_index('traits', 'name'),
+        keyset_index('traits', 'char_count'),
+    )
 
     id = Column(String, primary_key=True)
     name = Column(String)
@@ -168,11 +336,127 @@ class Trait(db.Model):
     group_id = Column(String)
     group_name = Column(String)
     char_count = Column(Integer)
+    parents = Column(ARRAY(String))
+
+    search_text = Column(Text)
 
     created_at = Column(DateTime(timezone=True), default=func.now())
     updated_at = Column(DateTime(timezone=True), default=func.now(), onupdate=func.now())
     deleted_at = Column(DateTime(timezone=True), nullable=True)
 
+# ----------------------------------------
+# Relation Models
+# ----------------------------------------
+
+class RelationMixin:
+    """
+    Side table holding one (owner_id, related_id) pair per entry of a JSONB relation array.
+
+    Subclasses set `__owner__` to the table of the owning resource. The primary key
+    serves owner -> related lookups, the (related_id, owner_id) index serves the
+    reverse direction used by the local filters.
+    """
+    __owner__ = None
+
+    @declared_attr
+    def owner_id(cls):
+        return Column(String, ForeignKey(f'{cls.__owner__}.id', ondelete='CASCADE'), primary_key=True)
+
+    @declared_attr
+    def related_id(cls):
+        return Column(String, primary_key=True)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (Index(f'ix_{cls.__tablename__}_related_id_owner_id', 'related_id', 'owner_id'),)
+
+class VNTag(RelationMixin, db.Model):
+    __tablename__ = 'vn_tags'
+    __owner__ = 'vns'
+
+class VNCharacter(RelationMixin, db.Model):
+    __tablename__ = 'vn_characters'
+    __owner__ = 'vns'
+
+class VNStaff(RelationMixin, db.Model):
+    __tablename__ = 'vn_staff'
+    __owner__ = 'vns'
+
+class VNDeveloper(RelationMixin, db.Model):
+    __tablename__ = 'vn_developers'
+    __owner__ = 'vns'
+
+class VNRelease(RelationMixin, db.Model):
+    __tablename__ = 'vn_releases'
+    __owner__ = 'vns'
+
+class CharacterTrait(RelationMixin, db.Model):
+    __tablename__ = 'character_traits'
+    __owner__ = 'characters'
+
+class CharacterVN(RelationMixin, db.Model):
+    __tablename__ = 'character_vns'
+    __owner__ = 'characters'
+
+class CharacterSeiyuu(RelationMixin, db.Model):
+    __tablename__ = 'character_seiyuu'
+    __owner__ = 'characters'
+
+class ReleaseVN(RelationMixin, db.Model):
+    __tablename__ = 'release_vns'
+    __owner__ = 'releases'
+
+class ReleaseProducer(RelationMixin, db.Model):
+    __tablename__ = 'release_producers'
+    __owner__ = 'releases'
+
+# ----------------------------------------
+# Hierarchy Models
+# ----------------------------------------
+
+class ClosureMixin:
+    """
+    Ancestor/descendant pairs of the tag or trait hierarchy, every node paired with
+    itself at depth 0, `depth` being the shortest distance between the two.
+
+    The primary key answers "the subtree of X", the (descendant_id, ancestor_id) index
+    "the ancestors of X". Ancestors that are not stored locally yet still get their
+    rows, so there is no foreign key.
+    """
+
+    @declared_attr
+    def ancestor_id(cls):
+        return Column(String, primary_key=True)
+
+    @declared_attr
+    def descendant_id(cls):
+        return Column(String, primary_key=True)
+
+    @declared_attr
+    def depth(cls):
+        return Column(Integer, nullable=False)
+
+    @declared_attr
+    def __table_args__(cls):
+        return (Index(f'ix_{cls.__tablename__}_descendant_id_ancestor_id', 'descendant_id', 'ancestor_id'),)
+
+class TagClosure(ClosureMixin, db.Model):
+    __tablename__ = 'tag_closure'
+
+class TraitClosure(ClosureMixin, db.Model):
+    __tablename__ = 'trait_closure'
+
+# ----------------------------------------
+# Counter Models
+# ----------------------------------------
+
+class ResourceCount(db.Model):
+    """Number of active (not soft-deleted) rows per resource type, maintained by triggers."""
+    __tablename__ = 'resource_counts'
+
+    type = Column(String, primary_key=True)
+    active = Column(Integer, nullable=False, default=0)
+
 # ----------------------------------------
 # Variables 
 # ----------------------------------------
@@ -189,6 +473,89 @@ MODEL_MAP = {
     'release': Release
 }
 
+# Statement-level triggers with transition tables keep resource_counts current,
+# so a bulk upsert or delete adjusts the counter once per statement
+RESOURCE_COUNT_FUNCTIONS = {
+    'insert': "active + (SELECT count(*) FROM new_rows WHERE deleted_at IS NULL)",
+    'update': "active + (SELECT count(*) FROM new_rows WHERE deleted_at IS NULL)"
+              " - (SELECT count(*) FROM old_rows WHERE deleted_at IS NULL)",
+    'delete': "active - (SELECT count(*) FROM old_rows WHERE deleted_at IS NULL)",
+}
+
+RESOURCE_COUNT_TRANSITIONS = {
+    'insert': 'NEW TABLE AS new_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+}
+
+def resource_count_function_ddl() -> list[str]:
+    return [
+        f"""
+        CREATE OR REPLACE FUNCTION resource_counts_{operation}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            UPDATE resource_counts SET active = {expression} WHERE type = TG_ARGV[0];
+            RETURN NULL;
+        END $$
+        """
+        for operation, expression in RESOURCE_COUNT_FUNCTIONS.items()
+    ]
+
+def resource_count_trigger_ddl(type: str, table: str) -> list[str]:
+    """The counter row and triggers of a table that has just been created, and so is empty."""
+    statements = [
+        f"INSERT INTO resource_counts (type, active) VALUES ('{type}', 0) "
+        f"ON CONFLICT (type) DO UPDATE SET active = 0"
+    ]
+    for operation, transition in RESOURCE_COUNT_TRANSITIONS.items():
+        statements.append(
+            f"CREATE TRIGGER {table}_count_{operation} AFTER {operation.upper()} ON {table} "
+            f"REFERENCING {transition} FOR EACH STATEMENT "
+            f"EXECUTE FUNCTION resource_counts_{operation}('{type}')"
+        )
+    return statements
+
+def register_resource_count_triggers() -> None:
+    """
+    Bind the counter DDL to the tables themselves, so it only runs when create_all
+    (init-db) actually creates them; existing databases get the same objects from
+    migration 3ad81f6c27e4.
+    """
+    for statement in resource_count_function_ddl():
+        event.listen(ResourceCount.__table__, 'after_create', DDL(statement))
+    for type, model in MODEL_MAP.items():
+        table = listing_table(model)
+        table.add_is_dependent_on(ResourceCount.__table__)
+        for statement in resource_count_trigger_ddl(type, table.name):
+            event.listen(table, 'after_create', DDL(statement))
+
+register_resource_count_triggers()
+
+# resource type -> relation column -> side table
+RELATION_MAP = {
+    'vn': {
+        'tags': VNTag,
+        'characters': VNCharacter,
+        'staff': VNStaff,
+        'developers': VNDeveloper,
+        'releases': VNRelease
+    },
+    'character': {
+        'traits': CharacterTrait,
+        'vns': CharacterVN,
+        'seiyuu': CharacterSeiyuu
+    },
+    'release': {
+        'vns': ReleaseVN,
+        'producers': ReleaseProducer
+    }
+}
+
+# resource type -> hierarchy closure table
+CLOSURE_MAP = {
+    'tag': TagClosure,
+    'trait': TraitClosure
+}
+
 
 class LogEntry(db.Model):
     __tablename__ = 'logs'
@@ -1,12 +1,20 @@
 import re
-from typing import Any 
+from typing import Any, Callable
 from datetime import datetime, timezone, timedelta
 from functools import wraps
 
-from sqlalchemy import asc, desc
+from sqlalchemy import (
+    or_, case, func, select, literal, any_, inspect, String,
+    delete as sql_delete, insert as sql_insert, update as sql_update
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+from sqlalchemy.orm import load_only
 
 from vndb import db
-from .models import MODEL_MAP, ModelType 
+from .models import MODEL_MAP, RELATION_MAP, CLOSURE_MAP, ModelType, ResourceCount, listing_table, detail_tables
+from .derived import derive_columns
+from .dictionary import mark_dictionary_changed
+from .pagination import keyset_order, keyset_filter
 
 
 def db_transaction(func):
@@ -25,6 +33,18 @@ def db_transaction(func):
             return None
     return wrapper
 
+def db_chunked_transaction(func):
+    """For operations that commit per chunk themselves: only roll back the unfinished chunk on error."""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        try:
+            return func(*args, **kwargs)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error in {func.__name__}: {str(e)}")
+            return None
+    return wrapper
+
 
 def formatId(type: str, id: str) -> str:
     type_prefix = {
@@ -45,26 +65,201 @@ def formatId(type: str, id: str) -> str:
         return id
     raise ValueError(f"Invalid ID: {id}")
 
+def probe_many(type: str, ids: list[str]) -> dict[str, Any]:
+    """Fetch only `id, deleted_at, updated_at` for the ids that have a row, keyed by id."""
+    model = MODEL_MAP[type]
+    if not ids:
+        return {}
+    rows = db.session.execute(
+        select(model.id, model.deleted_at, model.updated_at).where(id_any(model, ids))
+    ).all()
+    return {row.id: row for row in rows}
+
+def exists_many(type: str, ids: list[str]) -> dict[str, bool]:
+    """
+    Check which of the ids have an active row, in a single query.
+
+    :param type: The resource type
+    :param ids: The resource ids, with or without their type prefix
+    :return: A mapping of each formatted id to whether it exists and is not deleted
+    """
+    ids = [formatId(type, id) for id in ids]
+    rows = probe_many(type, ids)
+    return {id: id in rows and rows[id].deleted_at is None for id in ids}
+
 def exists(type: str, id: str) -> bool:
     id = formatId(type, id)
-    model = MODEL_MAP[type]
-    item = db.session.query(model).get(id)
-    return item is not None and item.deleted_at is None
+    return exists_many(type, [id])[id]
 
 def count_all(type: str) -> int:
+    counter = db.session.get(ResourceCount, type)
+    if counter is not None:
+        return counter.active
     model = MODEL_MAP[type]
     return db.session.query(model).filter(model.deleted_at == None).count()
 
+def freshness_many(type: str, ids: list[str], update_interval: timedelta = timedelta(minutes=10)) -> dict[str, bool]:
+    """
+    Check which of the ids are due for an update, in a single query.
+
+    An id is due when it has no row (it will be created), is deleted, has never
+    been updated or was last updated more than `update_interval` ago.
+
+    :param type: The resource type
+    :param ids: The resource ids, with or without their type prefix
+    :param update_interval: The minimum age of a row before it is updated again
+    :return: A mapping of each formatted id to whether it is updatable
+    """
+    ids = [formatId(type, id) for id in ids]
+    rows = probe_many(type, ids)
+    current_time = datetime.now(timezone.utc)
+    updatable = {}
+    for id in ids:
+        row = rows.get(id)
+        updatable[id] = (
+            row is None or row.deleted_at is not None or row.updated_at is None
+            or current_time - row.updated_at > update_interval
+        )
+    return updatable
+
 def updatable(type: str, id: str, update_interval: timedelta = timedelta(minutes=10)) -> bool:
     id = formatId(type, id)
-    item = get(type, id)
-    if not item:
-        return True  # Allow update if item doesn't exist (it will be created)
-    if item.deleted_at is not None:
-        return True  # Allow update if item is deleted
-    if item.updated_at is None:
-        return True  # Allow update if item has never been updated
-    return datetime.now(timezone.utc) - item.updated_at > update_interval
+    return freshness_many(type, [id], update_interval)[id]
+
+
+def sync_relations_many(type: str, rows: dict[str, dict[str, Any]]) -> None:
+    """Rewrite the side table rows of every relation column present in each of `rows` (keyed by id)."""
+    for column, relation_model in RELATION_MAP.get(type, {}).items():
+        owner_ids = [id for id, data in rows.items() if column in data]
+        if not owner_ids:
+            continue
+        pairs = [
+            {'owner_id': id, 'related_id': related_id}
+            for id in owner_ids
+            for related_id in dict.fromkeys(
+                entry['id'] for entry in rows[id][column] or []
+                if isinstance(entry, dict) and entry.get('id')
+            )
+        ]
+        db.session.execute(sql_delete(relation_model).where(relation_model.owner_id.in_(owner_ids)))
+        if pairs:
+            db.session.execute(sql_insert(relation_model), pairs)
+
+def sync_relations(type: str, id: str, data: dict[str, Any]) -> None:
+    """Rewrite the side table rows of every relation column present in `data`."""
+    sync_relations_many(type, {id: data})
+
+
+# Guards the closure walk against parent cycles; the VNDB hierarchies are far shallower
+CLOSURE_MAX_DEPTH = 32
+
+def hierarchy_parents(type: str) -> Any:
+    """The parent ids of a tag or trait. Traits without known parents hang below their group."""
+    model = MODEL_MAP[type]
+    if type == 'trait':
+        return case((model.parents != None, model.parents), else_=array([model.group_id]))
+    return model.parents
+
+def sync_hierarchy(type: str, ids: list[str] | None = None) -> None:
+    """
+    Recompute the closure rows of the tags or traits in `ids` and of everything below
+    them, or of the whole hierarchy when `ids` is None.
+
+    Each affected node is walked up through its parents with a recursive CTE, so nodes
+    with several parents get all their ancestors whichever of them changed.
+    """
+    if type not in CLOSURE_MAP:
+        return
+    closure = CLOSURE_MAP[type]
+    model = MODEL_MAP[type]
+
+    if ids is None:
+        db.session.execute(sql_delete(closure))
+        start = select(model.id.label('descendant_id'), model.id.label('ancestor_id'), literal(0).label('depth'))
+    else:
+        if not ids:
+            return
+        # The current closure knows which nodes sit below the changed ones
+        below = db.session.scalars(
+            select(closure.descendant_id).where(closure.ancestor_id == any_(literal(ids, ARRAY(String))))
+        )
+        affected = list(dict.fromkeys([*ids, *below]))
+        db.session.execute(sql_delete(closure).where(closure.descendant_id == any_(literal(affected, ARRAY(String)))))
+        node = func.unnest(literal(affected, ARRAY(String))).column_valued('node_id')
+        start = select(node.label('descendant_id'), node.label('ancestor_id'), literal(0).label('depth'))
+
+    walk = start.cte('walk', recursive=True)
+    parent = func.unnest(hierarchy_parents(type)).column_valued('parent_id')
+    walk = walk.union_all(
+        select(walk.c.descendant_id, parent, walk.c.depth + 1)
+        .select_from(walk.join(model.__table__, model.id == walk.c.ancestor_id))
+        .where(parent != None, parent != walk.c.ancestor_id, walk.c.depth < CLOSURE_MAX_DEPTH)
+    )
+    db.session.execute(
+        sql_insert(closure).from_select(
+            ['ancestor_id', 'descendant_id', 'depth'],
+            select(walk.c.ancestor_id, walk.c.descendant_id, func.min(walk.c.depth))
+            .group_by(walk.c.ancestor_id, walk.c.descendant_id)
+        )
+    )
+
+def sync_derived(type: str, item: ModelType) -> None:
+    """Recompute the derived columns of `item` from its current column values."""
+    values = {key: getattr(item, key) for key in inspect(item).mapper.column_attrs.keys()}
+    for key, value in derive_columns(type, values).items():
+        setattr(item, key, value)
+
+
+TRASH_CHUNK_SIZE = 1000
+
+ProgressCallback = Callable[[int, int], None]
+
+def id_any(model: Any, ids: list[str]) -> Any:
+    """`id = ANY(:ids)`, a single array parameter however many ids there are."""
+    return model.id == any_(literal(ids, ARRAY(String)))
+
+def process_in_chunks(type: str, condition: Any, statement: Callable[[list[str]], Any],
+                      chunk_size: int = TRASH_CHUNK_SIZE, progress: ProgressCallback | None = None) -> int:
+    """
+    Apply a set-based statement to the rows matching `condition`, one id chunk at a time.
+
+    Ids are walked in keyset order and every chunk is committed on its own, so the
+    statement only ever locks `chunk_size` rows and a failure keeps the finished chunks.
+
+    :param type: The resource type
+    :param condition: The filter selecting the rows to process
+    :param statement: Builds the UPDATE/DELETE statement for a list of ids
+    :param chunk_size: The number of ids per chunk
+    :param progress: Called with (processed, total) after every chunk
+    :return: The number of affected rows
+    """
+    model = MODEL_MAP[type]
+    total = db.session.query(func.count(model.id)).filter(condition).scalar()
+    processed = 0
+    last_id = None
+    if progress:
+        progress(processed, total)
+    while True:
+        query = select(model.id).where(condition).order_by(model.id).limit(chunk_size)
+        if last_id is not None:
+            query = query.where(model.id > last_id)
+        ids = db.session.execute(query).scalars().all()
+        if not ids:
+            break
+        result = db.session.execute(statement(ids).execution_options(synchronize_session=False))
+        db.session.commit()
+        processed += result.rowcount
+        last_id = ids[-1]
+        if progress:
+            progress(processed, total)
+    return processed
+
+def vacuum_analyze(type: str) -> None:
+    """VACUUM cannot run inside a transaction block, so use a dedicated autocommit connection."""
+    model = MODEL_MAP[type]
+    with db.engine.connect().execution_options(isolation_level='AUTOCOMMIT') as connection:
+        for table in [listing_table(model), *detail_tables(model)]:
+            connection.exec_driver_sql(f'VACUUM ANALYZE {table.name}')
 
 
 def get(type: str, id: str) -> ModelType | None:
@@ -78,13 +273,40 @@ def get(type: str, id: str) -> ModelType | None:
     )
     return item
 
-def get_all(type: str, page: int | None = None, limit: int | None = None, sort: str = 'id', reverse: bool = False) -> list[ModelType]:
+MULTI_GET_LIMIT = 5000
+
+def get_many(type: str, ids: list[str], fields: list[str] | None = None) -> dict[str, ModelType | None]:
+    """
+    Load the active items of many ids with a single `id = ANY(:ids)` query.
+
+    :param ids: Up to `MULTI_GET_LIMIT` ids, with or without their type prefix
+    :param fields: Optional subset of columns to load
+    :return: {id: item} in the order of `ids`, with None for every miss
+    """
+    ids = list(dict.fromkeys(formatId(type, id) for id in ids))
+    if len(ids) > MULTI_GET_LIMIT:
+        raise ValueError(f"Too many ids: {len(ids)}. At most {MULTI_GET_LIMIT} can be fetched at once.")
+    if not ids:
+        return {}
+
+    model = MODEL_MAP[type]
+    query = db.session.query(model).filter(id_any(model, ids), model.deleted_at == None)
+    if fields:
+        query = query.options(load_only(*[getattr(model, field) for field in fields]))
+    items = {item.id: item for item in query}
+    return {id: items.get(id) for id in ids}
+
+def get_all(type: str, page: int | None = None, limit: int | None = None, sort: str = 'id', reverse: bool = False,
+            cursor: str | None = None) -> list[ModelType]:
     model = MODEL_MAP[type]
     query = db.session.query(model).filter(model.deleted_at == None)
-    order_func = desc if reverse else asc
-    query = query.order_by(order_func(getattr(model, sort)))
-    if page and limit:
-        page = max(1, page) 
+    query = query.order_by(*keyset_order(model, sort, reverse))
+    if cursor:
+        query = query.filter(keyset_filter(model, sort, reverse, cursor))
+        if limit:
+            query = query.limit(min(max(1, limit), 100))
+    elif page and limit:
+        page = max(1, page)
         limit = min(max(1, limit), 100)
         query = query.offset((page - 1) * limit).limit(limit)
     return query.all()
@@ -98,8 +320,12 @@ def create(type: str, id: str, data: dict[str, Any]) -> ModelType | None:
     # Use cleanup to ensure deletion of any existing inactive items
     cleanup(type, id)
     item = model(id=id, **data)
+    sync_derived(type, item)
     db.session.add(item)
     db.session.flush()
+    sync_relations(type, id, data)
+    sync_hierarchy(type, [id])
+    mark_dictionary_changed(type)
     return item
 
 def update(type: str, id: str, data: dict[str, Any]) -> ModelType | None:
@@ -110,9 +336,95 @@ def update(type: str, id: str, data: dict[str, Any]) -> ModelType | None:
     for key, value in data.items():
         setattr(item, key, value)
     item.updated_at = datetime.now(timezone.utc)
+    sync_derived(type, item)
     db.session.flush()
+    sync_relations(type, id, data)
+    sync_hierarchy(type, [id])
+    mark_dictionary_changed(type)
     return item
 
+UPSERT_BATCH_SIZE = 500
+
+def upsert_many(type: str, rows: list[dict[str, Any]], update_interval: timedelta = timedelta(minutes=10)) -> dict[str, str]:
+    """
+    Create or update a batch of resources with one INSERT ... ON CONFLICT DO UPDATE per chunk.
+
+    Rows that exist and were updated within `update_interval` are left untouched, soft-deleted
+    rows are revived and count as created, like `create` does after `cleanup`. Rows are
+    expected to carry full resource data; keys that are not model columns are ignored.
+
+    :param type: The resource type
+    :param rows: The resources to write, each with an 'id' key
+    :param update_interval: The freshness window inside which existing rows are skipped
+    :return: A dict of id to 'created', 'updated' or 'skipped'
+    """
+    model = MODEL_MAP[type]
+    table = listing_table(model)
+    columns = set(inspect(model).column_attrs.keys()) - {'id', 'created_at', 'updated_at', 'deleted_at'}
+
+    values_by_id = {}
+    for row in rows:
+        id = formatId(type, row['id'])
+        values = {key: value for key, value in row.items() if key in columns}
+        values.update(derive_columns(type, values))
+        values_by_id[id] = values
+
+    statuses = {id: 'skipped' for id in values_by_id}
+    ids = list(values_by_id)
+
+    for start in range(0, len(ids), UPSERT_BATCH_SIZE):
+        chunk = ids[start:start + UPSERT_BATCH_SIZE]
+        keys = set().union(*(values_by_id[id] for id in chunk))
+        listing_keys = sorted(keys & set(table.c.keys()))
+
+        stmt = pg_insert(table).values([
+            {'id': id, **{key: values_by_id[id].get(key) for key in listing_keys}} for id in chunk
+        ])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.id],
+            set_={
+                **{key: stmt.excluded[key] for key in listing_keys},
+                'created_at': case((table.c.deleted_at != None, func.now()), else_=table.c.created_at),
+                'updated_at': func.now(),
+                'deleted_at': None,
+            },
+            where=or_(
+                table.c.deleted_at != None,
+                table.c.updated_at == None,
+                table.c.updated_at < func.now() - update_interval
+            )
+        ).returning(table.c.id, (table.c.created_at == func.now()).label('created'))
+
+        written = db.session.execute(stmt).all()
+        for id, created in written:
+            statuses[id] = 'created' if created else 'updated'
+
+        # Only the rows the listing upsert accepted get their detail row written
+        written_ids = [id for id, _ in written]
+        for detail in detail_tables(model):
+            if not written_ids:
+                break
+            detail_keys = sorted(keys & set(detail.c.keys()) - {'id'})
+            detail_stmt = pg_insert(detail).values([
+                {'id': id, **{key: values_by_id[id].get(key) for key in detail_keys}} for id in written_ids
+            ])
+            if detail_keys:
+                detail_stmt = detail_stmt.on_conflict_do_update(
+                    index_elements=[detail.c.id],
+                    set_={key: detail_stmt.excluded[key] for key in detail_keys}
+                )
+            else:
+                detail_stmt = detail_stmt.on_conflict_do_nothing(index_elements=[detail.c.id])
+            db.session.execute(detail_stmt)
+
+        sync_relations_many(type, {id: values_by_id[id] for id in written_ids})
+
+    sync_hierarchy(type, [id for id, status in statuses.items() if status != 'skipped'])
+    if any(status != 'skipped' for status in statuses.values()):
+        mark_dictionary_changed(type)
+    db.session.flush()
+    return statuses
+
 def delete(type: str, id: str) -> ModelType | None:
     id = formatId(type, id)
     item = get(type, id)
@@ -122,18 +434,19 @@ def delete(type: str, id: str) -> ModelType | None:
     db.session.flush()
     return item
 
-def delete_all(type: str) -> int:
+def delete_all(type: str, chunk_size: int = TRASH_CHUNK_SIZE, progress: ProgressCallback | None = None,
+               vacuum: bool = False) -> int:
     model = MODEL_MAP[type]
     current_time = datetime.now(timezone.utc)
-    count = (
-        db.session.query(model)
-        .filter(model.deleted_at == None)
-        .update({model.deleted_at: current_time})
+    count = process_in_chunks(
+        type, model.deleted_at == None,
+        lambda ids: sql_update(listing_table(model)).where(id_any(model, ids), model.deleted_at == None).values(deleted_at=current_time),
+        chunk_size, progress
     )
-    db.session.flush()
+    if vacuum:
+        vacuum_analyze(type)
     return count
 
-
 def get_inactive(type: str, id: str) -> ModelType | None:
     id = formatId(type, id)
     model = MODEL_MAP[type]
@@ -145,12 +458,16 @@ def get_inactive(type: str, id: str) -> ModelType | None:
     )
     return item
 
-def get_inactive_all(type: str, page: int | None = None, limit: int | None = None, sort: str = 'id', reverse: bool = False) -> list[ModelType]:
+def get_inactive_all(type: str, page: int | None = None, limit: int | None = None, sort: str = 'id', reverse: bool = False,
+                     cursor: str | None = None) -> list[ModelType]:
     model = MODEL_MAP[type]
     query = db.session.query(model).filter(model.deleted_at != None)
-    order_func = desc if reverse else asc
-    query = query.order_by(order_func(getattr(model, sort)))
-    if page and limit:
+    query = query.order_by(*keyset_order(model, sort, reverse))
+    if cursor:
+        query = query.filter(keyset_filter(model, sort, reverse, cursor))
+        if limit:
+            query = query.limit(min(max(1, limit), 100))
+    elif page and limit:
         page = max(1, page)
         limit = min(max(1, limit), 100)
         query = query.offset((page - 1) * limit).limit(limit)
@@ -165,14 +482,16 @@ def recover(type: str, id: str) -> ModelType | None:
     db.session.flush()
     return item
 
-def recover_all(type: str) -> int:
+def recover_all(type: str, chunk_size: int = TRASH_CHUNK_SIZE, progress: ProgressCallback | None = None,
+                vacuum: bool = False) -> int:
     model = MODEL_MAP[type]
-    count = (
-        db.session.query(model)
-        .filter(model.deleted_at != None)
-        .update({model.deleted_at: None})
+    count = process_in_chunks(
+        type, model.deleted_at != None,
+        lambda ids: sql_update(listing_table(model)).where(id_any(model, ids), model.deleted_at != None).values(deleted_at=None),
+        chunk_size, progress
     )
-    db.session.flush()
+    if vacuum:
+        vacuum_analyze(type)
     return count
 
 def cleanup(type: str, id: str) -> ModelType | None:
@@ -184,18 +503,25 @@ def cleanup(type: str, id: str) -> ModelType | None:
     db.session.flush()
     return item
 
-def cleanup_all(type: str) -> int:
-    items = get_inactive_all(type)
-    count = len(items)
-    for item in items:
-        db.session.delete(item)
-    db.session.flush()
+def cleanup_all(type: str, chunk_size: int = TRASH_CHUNK_SIZE, progress: ProgressCallback | None = None,
+                vacuum: bool = False) -> int:
+    model = MODEL_MAP[type]
+    # Detail and relation side tables follow through their ON DELETE CASCADE foreign keys
+    count = process_in_chunks(
+        type, model.deleted_at != None,
+        lambda ids: sql_delete(listing_table(model)).where(id_any(model, ids), model.deleted_at != None),
+        chunk_size, progress
+    )
+    if vacuum:
+        vacuum_analyze(type)
     return count
 
-
 @db_transaction
 def get_save(*args, **kwargs) -> ModelType | None: return get(*args, **kwargs)
 
+@db_transaction
+def get_many_save(*args, **kwargs) -> dict[str, ModelType | None]: return get_many(*args, **kwargs)
+
 @db_transaction
 def get_all_save(*args, **kwargs) -> list[ModelType]: return get_all(*args, **kwargs)
 
@@ -206,11 +532,13 @@ def create_save(*args, **kwargs) -> ModelType | None: return create(*args, **kwa
 def update_save(*args, **kwargs) -> ModelType | None: return update(*args, **kwargs)
 
 @db_transaction
-def delete_save(*args, **kwargs) -> ModelType | None: return delete(*args, **kwargs)
+def upsert_many_save(*args, **kwargs) -> dict[str, str]: return upsert_many(*args, **kwargs)
 
 @db_transaction
-def delete_all_save(*args, **kwargs) -> int: return delete_all(*args, **kwargs)
+def delete_save(*args, **kwargs) -> ModelType | None: return delete(*args, **kwargs)
 
+@db_chunked_transaction
+def delete_all_save(*args, **kwargs) -> int: return delete_all(*args, **kwargs)
 
 @db_transaction
 def get_inactive_save(*args, **kwargs) -> ModelType | None: return get_inactive(*args, **kwargs)
@@ -221,11 +549,11 @@ def get_inactive_all_save(*args, **kwargs) -> list[ModelType]: return get_inacti
 @db_transaction
 def recover_save(*args, **kwargs) -> ModelType | None: return recover(*args, **kwargs)
 
-@db_transaction
+@db_chunked_transaction
 def recover_all_save(*args, **kwargs) -> int: return recover_all(*args, **kwargs)
 
 @db_transaction
 def cleanup_save(*args, **kwargs) -> int: return cleanup(*args, **kwargs)
 
-@db_transaction
-def cleanup_all_save(*args, **kwargs) -> dict[str, int]: return cleanup_all(*args, **kwargs)
\ No newline at end of file
+@db_chunked_transaction
+def cleanup_all_save(*args, **kwargs) -> int: return cleanup_all(*args, **kwargs)
\ No newline at end of file
@@ -0,0 +1,85 @@
+import json
+import base64
+import binascii
+from typing import Any
+from datetime import date, datetime
+
+from sqlalchemy import and_, or_, asc, desc, tuple_
+
+
+def encode_cursor(sort: str, reverse: bool, value: Any, id: str) -> str:
+    """
+    Encode the position after a row as an opaque cursor.
+
+    :param sort: The sort field the listing is ordered by
+    :param reverse: Whether the listing is in descending order
+    :param value: The sort value of the last returned row
+    :param id: The id of the last returned row
+    :return: A url-safe cursor string
+    """
+    if isinstance(value, datetime):
+        value = {'$dt': value.isoformat()}
+    elif isinstance(value, date):
+        value = {'$d': value.isoformat()}
+    payload = json.dumps({'s': sort, 'r': bool(reverse), 'v': value, 'i': id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str, sort: str, reverse: bool) -> tuple[Any, str]:
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    :param cursor: The cursor string
+    :param sort: The sort field of the current request
+    :param reverse: The order of the current request
+    :return: The (sort value, id) pair of the last row of the previous page
+    :raises ValueError: If the cursor is malformed or was issued for another ordering
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        value, id = payload['v'], payload['i']
+        if payload['s'] != sort or payload['r'] != bool(reverse):
+            raise ValueError("Cursor was issued for a different sort order")
+    except (KeyError, TypeError, json.JSONDecodeError, UnicodeDecodeError, binascii.Error) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    if isinstance(value, dict) and '$dt' in value:
+        value = datetime.fromisoformat(value['$dt'])
+    elif isinstance(value, dict) and '$d' in value:
+        value = date.fromisoformat(value['$d'])
+    return value, id
+
+def sort_column(model: Any, sort: str) -> Any:
+    """
+    The column a listing is ordered by. `sort` is a column name, as mapped by the
+    search's `validate_sort`; anything else is rejected here rather than failing deeper.
+    """
+    if sort not in model.__mapper__.column_attrs:
+        raise ValueError(f"Invalid sort: {sort}")
+    return getattr(model, sort)
+
+def keyset_order(model: Any, sort: str, reverse: bool) -> list[Any]:
+    """Order by the sort column with the id as tiebreaker, both in the same direction."""
+    order_func = desc if reverse else asc
+    column = sort_column(model, sort)
+    columns = [column] if sort == 'id' else [column, model.id]
+    return [order_func(column) for column in columns]
+
+def keyset_filter(model: Any, sort: str, reverse: bool, cursor: str) -> Any:
+    """
+    Create the seek predicate for the rows after `cursor`.
+
+    Postgres puts NULLs last in ascending order and first in descending order, so the
+    NULL region of the sort column is handled next to the row-value comparison.
+    """
+    value, id = decode_cursor(cursor, sort, reverse)
+    if sort == 'id':
+        return model.id < id if reverse else model.id > id
+
+    column = sort_column(model, sort)
+    if not reverse:
+        if value is None:
+            return and_(column == None, model.id > id)
+        return or_(tuple_(column, model.id) > tuple_(value, id), column == None)
+    else:
+        if value is None:
+            return or_(and_(column == None, model.id < id), column != None)
+        return tuple_(column, model.id) < tuple_(value, id)
@@ -0,0 +1,84 @@
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from operator import attrgetter
+from typing import Any, Callable, Iterable
+
+from sqlalchemy import inspect
+from sqlalchemy.types import Date, DateTime
+
+from .derived import DERIVED_COLUMNS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@lru_cache(maxsize=None)
+def get_serializer(model_class: type, fields: tuple[str, ...] | None = None) -> Callable[[Any], dict[str, Any]]:
+    """
+    Compile a row serializer for a model from its column types.
+
+    Column values loaded by psycopg2 are already JSON-ready (JSONB is decoded to
+    lists/dicts, ARRAY to lists), so only date and datetime columns need converting.
+
+    :param model_class: The SQLAlchemy model class
+    :param fields: An optional subset of column names to emit, in order
+    :return: A function turning a model instance into a dict
+    """
+    columns = {
+        column.key: column for column in inspect(model_class).column_attrs
+        if column.key not in DERIVED_COLUMNS
+    }
+    if fields is not None:
+        if unknown := [field for field in fields if field not in columns]:
+            raise ValueError(f"Invalid fields for {model_class.__name__}: {unknown}")
+        columns = {field: columns[field] for field in fields}
+
+    keys = tuple(columns)
+    temporal_keys = tuple(
+        key for key, column in columns.items()
+        if isinstance(column.columns[0].type, (Date, DateTime))
+    )
+
+    if len(keys) == 1:
+        key = keys[0]
+        getter = lambda item: (getattr(item, key),)
+    else:
+        getter = attrgetter(*keys)
+
+    def serialize(item: Any) -> dict[str, Any]:
+        result = dict(zip(keys, getter(item)))
+        for key in temporal_keys:
+            value = result[key]
+            if value is not None:
+                result[key] = value.isoformat()
+        return result
+
+    return serialize
+
+def serialize(item: Any, fields: Iterable[str] | None = None) -> dict[str, Any]:
+    return get_serializer(type(item), tuple(fields) if fields is not None else None)(item)
+
+def serialize_many(items: Iterable[Any], fields: Iterable[str] | None = None) -> list[dict[str, Any]]:
+    fields = tuple(fields) if fields is not None else None
+    serializers = {}
+    results = []
+    for item in items:
+        model_class = type(item)
+        if model_class not in serializers:
+            serializers[model_class] = get_serializer(model_class, fields)
+        results.append(serializers[model_class](item))
+    return results
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+def dumps(data: Any) -> bytes:
+    """Encode JSON-ready data to bytes, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(data, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=_default).encode()
@@ -0,0 +1,80 @@
+"""trigger-maintained resource_counts
+
+Revision ID: 3ad81f6c27e4
+Revises: e7a2c94f1b06
+Create Date: 2025-05-02 09:51:27.640319
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3ad81f6c27e4'
+down_revision = 'e7a2c94f1b06'
+branch_labels = None
+depends_on = None
+
+
+RESOURCE_TABLES = {
+    'vn': 'vns',
+    'tag': 'tags',
+    'producer': 'producers',
+    'staff': 'staff',
+    'character': 'characters',
+    'trait': 'traits',
+    'release': 'releases',
+}
+
+COUNT_EXPRESSIONS = {
+    'insert': "active + (SELECT count(*) FROM new_rows WHERE deleted_at IS NULL)",
+    'update': "active + (SELECT count(*) FROM new_rows WHERE deleted_at IS NULL)"
+              " - (SELECT count(*) FROM old_rows WHERE deleted_at IS NULL)",
+    'delete': "active - (SELECT count(*) FROM old_rows WHERE deleted_at IS NULL)",
+}
+
+TRANSITION_TABLES = {
+    'insert': 'NEW TABLE AS new_rows',
+    'update': 'OLD TABLE AS old_rows NEW TABLE AS new_rows',
+    'delete': 'OLD TABLE AS old_rows',
+}
+
+
+def upgrade():
+    op.create_table('resource_counts',
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('active', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('type')
+    )
+
+    for operation, expression in COUNT_EXPRESSIONS.items():
+        op.execute(f"""
+            CREATE OR REPLACE FUNCTION resource_counts_{operation}() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                UPDATE resource_counts SET active = {expression} WHERE type = TG_ARGV[0];
+                RETURN NULL;
+            END $$
+        """)
+
+    for type, table in RESOURCE_TABLES.items():
+        op.execute(f"""
+            INSERT INTO resource_counts (type, active)
+            SELECT '{type}', count(*) FROM {table} WHERE deleted_at IS NULL
+        """)
+        for operation, transition in TRANSITION_TABLES.items():
+            op.execute(f"""
+                CREATE TRIGGER {table}_count_{operation} AFTER {operation.upper()} ON {table}
+                REFERENCING {transition} FOR EACH STATEMENT
+                EXECUTE FUNCTION resource_counts_{operation}('{type}')
+            """)
+
+
+def downgrade():
+    for type, table in RESOURCE_TABLES.items():
+        for operation in TRANSITION_TABLES:
+            op.execute(f"DROP TRIGGER IF EXISTS {table}_count_{operation} ON {table}")
+
+    for operation in COUNT_EXPRESSIONS:
+        op.execute(f"DROP FUNCTION IF EXISTS resource_counts_{operation}()")
+
+    op.drop_table('resource_counts')
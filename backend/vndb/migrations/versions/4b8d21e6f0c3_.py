@@ -0,0 +1,109 @@
+"""typed derived columns for release dates, birthdays, resolutions and cups
+
+Revision ID: 4b8d21e6f0c3
+Revises: 9c3e5b71d2a8
+Create Date: 2025-05-09 18:37:04.126593
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b8d21e6f0c3'
+down_revision = '9c3e5b71d2a8'
+branch_labels = None
+depends_on = None
+
+
+CUP_SIZES = ['AAA', 'AA', 'A', 'B', 'C', 'D', 'E',
+             'F', 'G', 'H', 'I', 'J', 'K', 'L',
+             'M', 'N', 'O', 'P', 'Q', 'R', 'S',
+             'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
+
+# Same rules as vndb.database.derived, in SQL
+RELEASED_DATE = r"""
+    CASE
+        WHEN released ~ '^\d{4}-\d{2}-\d{2}$' THEN to_date(released, 'YYYY-MM-DD')
+        WHEN released ~ '^\d{4}-\d{2}$' THEN to_date(released || '-01', 'YYYY-MM-DD')
+        WHEN released ~ '^\d{4}$' THEN to_date(released || '-01-01', 'YYYY-MM-DD')
+    END
+"""
+RELEASED_PRECISION = r"""
+    CASE
+        WHEN released ~ '^\d{4}-\d{2}-\d{2}$' THEN 'day'
+        WHEN released ~ '^\d{4}-\d{2}$' THEN 'month'
+        WHEN released ~ '^\d{4}$' THEN 'year'
+    END
+"""
+PAIR = r"regexp_match({column}, '^\[(\d+),(\d+)\]$')"
+
+
+def keyset_index(table, column):
+    op.create_index(f'ix_{table}_{column}_id_active', table, [column, 'id'], unique=False,
+                    postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def drop_keyset_index(table, column):
+    op.drop_index(f'ix_{table}_{column}_id_active', table_name=table,
+                  postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def upgrade():
+    for table in ['vns', 'releases']:
+        op.add_column(table, sa.Column('released_date', sa.Date(), nullable=True))
+        op.add_column(table, sa.Column('released_precision', sa.String(), nullable=True))
+        op.execute(f"UPDATE {table} SET released_date = {RELEASED_DATE}, released_precision = {RELEASED_PRECISION}")
+        drop_keyset_index(table, 'released')
+        keyset_index(table, 'released_date')
+
+    op.add_column('releases', sa.Column('resolution_width', sa.Integer(), nullable=True))
+    op.add_column('releases', sa.Column('resolution_height', sa.Integer(), nullable=True))
+    op.add_column('releases', sa.Column('resolution_aspect', sa.Float(), nullable=True))
+    pair = PAIR.format(column='resolution')
+    op.execute(f"""
+        UPDATE releases
+        SET resolution_width = ({pair})[1]::int,
+            resolution_height = ({pair})[2]::int,
+            resolution_aspect = ({pair})[1]::float / NULLIF(({pair})[2]::int, 0)
+        WHERE resolution IS NOT NULL
+    """)
+    op.create_index('ix_releases_resolution', 'releases', ['resolution_width', 'resolution_height'], unique=False)
+    op.create_index('ix_releases_resolution_aspect', 'releases', ['resolution_aspect'], unique=False)
+
+    op.add_column('characters', sa.Column('birthday_month', sa.Integer(), nullable=True))
+    op.add_column('characters', sa.Column('birthday_day', sa.Integer(), nullable=True))
+    op.add_column('characters', sa.Column('birthday_ordinal', sa.Integer(), nullable=True))
+    op.add_column('characters', sa.Column('cup_ordinal', sa.Integer(), nullable=True))
+    pair = PAIR.format(column='birthday')
+    op.execute(f"""
+        UPDATE characters
+        SET birthday_month = ({pair})[1]::int,
+            birthday_day = ({pair})[2]::int,
+            birthday_ordinal = ({pair})[1]::int * 100 + ({pair})[2]::int
+        WHERE birthday IS NOT NULL
+    """)
+    cup_sizes = ', '.join(f"'{cup}'" for cup in CUP_SIZES)
+    op.execute(f"UPDATE characters SET cup_ordinal = array_position(ARRAY[{cup_sizes}], upper(cup)) - 1 WHERE cup IS NOT NULL")
+    keyset_index('characters', 'birthday_ordinal')
+    op.create_index('ix_characters_birthday', 'characters', ['birthday_month', 'birthday_day'], unique=False)
+    op.create_index('ix_characters_cup_ordinal', 'characters', ['cup_ordinal'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_characters_cup_ordinal', table_name='characters')
+    op.drop_index('ix_characters_birthday', table_name='characters')
+    drop_keyset_index('characters', 'birthday_ordinal')
+    for column in ['cup_ordinal', 'birthday_ordinal', 'birthday_day', 'birthday_month']:
+        op.drop_column('characters', column)
+
+    op.drop_index('ix_releases_resolution_aspect', table_name='releases')
+    op.drop_index('ix_releases_resolution', table_name='releases')
+    for column in ['resolution_aspect', 'resolution_height', 'resolution_width']:
+        op.drop_column('releases', column)
+
+    for table in ['vns', 'releases']:
+        drop_keyset_index(table, 'released_date')
+        keyset_index(table, 'released')
+        op.drop_column(table, 'released_precision')
+        op.drop_column(table, 'released_date')
@@ -0,0 +1,63 @@
+"""trigram search_text columns
+
+Revision ID: 5f93c0d2e718
+Revises: b41d7e0c5a92
+Create Date: 2025-04-25 18:03:41.227590
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5f93c0d2e718'
+down_revision = 'b41d7e0c5a92'
+branch_labels = None
+depends_on = None
+
+
+def _normalize(expr):
+    # Mirrors vndb.database.derived.normalize_search_text
+    return f"NULLIF(lower(btrim(regexp_replace({expr}, '\\s+', ' ', 'g'))), '')"
+
+
+def _string(column):
+    return _normalize(column)
+
+
+def _array(column):
+    return f"(SELECT string_agg({_normalize('item')}, E'\\n') FROM unnest({column}) AS item)"
+
+
+def _jsonb_array(column, key):
+    return f"(SELECT string_agg({_normalize(f'item->>{key!r}')}, E'\\n') FROM unnest({column}) AS item)"
+
+
+SEARCH_TEXT_SOURCES = {
+    'vns': [_string('title'), _string('alttitle'), _array('aliases'),
+            _jsonb_array('titles', 'title'), _jsonb_array('titles', 'latin')],
+    'releases': [_string('title'), _string('alttitle')],
+    'characters': [_string('name'), _string('original'), _array('aliases')],
+    'producers': [_string('name'), _string('original'), _array('aliases')],
+    'staff': [_string('name'), _string('original'),
+              _jsonb_array('aliases', 'name'), _jsonb_array('aliases', 'latin')],
+    'tags': [_string('name'), _array('aliases')],
+    'traits': [_string('name'), _array('aliases')],
+}
+
+
+def upgrade():
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    for table, sources in SEARCH_TEXT_SOURCES.items():
+        op.add_column(table, sa.Column('search_text', sa.Text(), nullable=True))
+        op.execute(f"UPDATE {table} SET search_text = NULLIF(concat_ws(E'\\n', {', '.join(sources)}), '')")
+        op.create_index(f'ix_{table}_search_text', table, ['search_text'], unique=False,
+                        postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+
+
+def downgrade():
+    for table in SEARCH_TEXT_SOURCES:
+        op.drop_index(f'ix_{table}_search_text', table_name=table,
+                      postgresql_using='gin', postgresql_ops={'search_text': 'gin_trgm_ops'})
+        op.drop_column(table, 'search_text')
@@ -0,0 +1,59 @@
+"""tag and trait hierarchy closure tables
+
+Revision ID: 7e2b9f4c1a65
+Revises: c6f1a8e93d47
+Create Date: 2025-05-14 21:08:33.402917
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '7e2b9f4c1a65'
+down_revision = 'c6f1a8e93d47'
+branch_labels = None
+depends_on = None
+
+
+# closure table -> (node table, parents expression), as in vndb.database.operations.hierarchy_parents
+CLOSURE_TABLES = {
+    'tag_closure': ('tags', 'tags.parents'),
+    'trait_closure': ('traits', 'CASE WHEN traits.parents IS NOT NULL THEN traits.parents ELSE ARRAY[traits.group_id] END'),
+}
+
+
+def upgrade():
+    op.add_column('tags', sa.Column('parents', postgresql.ARRAY(sa.String()), nullable=True))
+    op.add_column('traits', sa.Column('parents', postgresql.ARRAY(sa.String()), nullable=True))
+
+    for closure, (table, parents) in CLOSURE_TABLES.items():
+        op.create_table(closure,
+            sa.Column('ancestor_id', sa.String(), nullable=False),
+            sa.Column('descendant_id', sa.String(), nullable=False),
+            sa.Column('depth', sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+        )
+        op.create_index(f'ix_{closure}_descendant_id_ancestor_id', closure, ['descendant_id', 'ancestor_id'], unique=False)
+
+        # Tag parents only come with `flask sync-hierarchy --from-dumps`, traits start below their group
+        op.execute(f"""
+            INSERT INTO {closure} (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE walk(descendant_id, ancestor_id, depth) AS (
+                SELECT id, id, 0 FROM {table}
+                UNION ALL
+                SELECT walk.descendant_id, parent_id, walk.depth + 1
+                FROM walk JOIN {table} ON {table}.id = walk.ancestor_id, unnest({parents}) AS parent_id
+                WHERE parent_id IS NOT NULL AND parent_id != walk.ancestor_id AND walk.depth < 32
+            )
+            SELECT ancestor_id, descendant_id, min(depth) FROM walk GROUP BY ancestor_id, descendant_id
+        """)
+
+
+def downgrade():
+    for closure in CLOSURE_TABLES:
+        op.drop_index(f'ix_{closure}_descendant_id_ancestor_id', table_name=closure)
+        op.drop_table(closure)
+    op.drop_column('traits', 'parents')
+    op.drop_column('tags', 'parents')
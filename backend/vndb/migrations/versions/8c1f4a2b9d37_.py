@@ -0,0 +1,55 @@
+"""relation side tables
+
+Revision ID: 8c1f4a2b9d37
+Revises: 2d5057ad0a52
+Create Date: 2025-04-20 10:12:03.514208
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4a2b9d37'
+down_revision = '2d5057ad0a52'
+branch_labels = None
+depends_on = None
+
+
+RELATION_TABLES = [
+    # (table, owner table, owner JSONB array column)
+    ('vn_tags', 'vns', 'tags'),
+    ('vn_characters', 'vns', 'characters'),
+    ('vn_staff', 'vns', 'staff'),
+    ('vn_developers', 'vns', 'developers'),
+    ('vn_releases', 'vns', 'releases'),
+    ('character_traits', 'characters', 'traits'),
+    ('character_vns', 'characters', 'vns'),
+    ('character_seiyuu', 'characters', 'seiyuu'),
+    ('release_vns', 'releases', 'vns'),
+    ('release_producers', 'releases', 'producers'),
+]
+
+
+def upgrade():
+    for table, owner, column in RELATION_TABLES:
+        op.create_table(table,
+            sa.Column('owner_id', sa.String(), nullable=False),
+            sa.Column('related_id', sa.String(), nullable=False),
+            sa.ForeignKeyConstraint(['owner_id'], [f'{owner}.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('owner_id', 'related_id')
+        )
+        op.create_index(f'ix_{table}_related_id_owner_id', table, ['related_id', 'owner_id'], unique=False)
+
+        op.execute(f"""
+            INSERT INTO {table} (owner_id, related_id)
+            SELECT DISTINCT t.id, item->>'id'
+            FROM {owner} t, unnest(t.{column}) AS item
+            WHERE item->>'id' IS NOT NULL
+        """)
+
+
+def downgrade():
+    for table, _, _ in reversed(RELATION_TABLES):
+        op.drop_index(f'ix_{table}_related_id_owner_id', table_name=table)
+        op.drop_table(table)
@@ -0,0 +1,88 @@
+"""split the wide columns of vns, releases and characters into detail tables
+
+Revision ID: 9c3e5b71d2a8
+Revises: 3ad81f6c27e4
+Create Date: 2025-05-06 20:14:52.318704
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3e5b71d2a8'
+down_revision = '3ad81f6c27e4'
+branch_labels = None
+depends_on = None
+
+
+JSONB = postgresql.JSONB(astext_type=sa.Text())
+JSONB_ARRAY = postgresql.ARRAY(postgresql.JSONB(astext_type=sa.Text()))
+
+# listing table -> (detail table, [(column, type)], [gin indexed jsonb columns])
+DETAIL_TABLES = {
+    'vns': ('vn_details', [
+        ('description', sa.Text()),
+        ('screenshots', JSONB_ARRAY),
+        ('relations', JSONB_ARRAY),
+        ('tags', JSONB),
+        ('editions', JSONB_ARRAY),
+        ('staff', JSONB),
+        ('va', JSONB_ARRAY),
+        ('extlinks', JSONB_ARRAY),
+        ('characters', JSONB),
+        ('releases', JSONB),
+        ('publishers', JSONB_ARRAY),
+    ], ['tags', 'staff', 'characters', 'releases']),
+    'releases': ('release_details', [
+        ('media', JSONB_ARRAY),
+        ('images', JSONB_ARRAY),
+        ('notes', sa.Text()),
+        ('extlinks', JSONB_ARRAY),
+    ], []),
+    'characters': ('character_details', [
+        ('description', sa.Text()),
+        ('traits', JSONB),
+        ('seiyuu', JSONB),
+    ], ['traits', 'seiyuu']),
+}
+
+
+def upgrade():
+    for table, (detail, columns, indexed) in DETAIL_TABLES.items():
+        op.create_table(detail,
+            sa.Column('id', sa.String(), sa.ForeignKey(f'{table}.id', ondelete='CASCADE'), nullable=False),
+            *[sa.Column(name, type_, nullable=True) for name, type_ in columns],
+            sa.PrimaryKeyConstraint('id')
+        )
+        names = ', '.join(name for name, _ in columns)
+        op.execute(f"INSERT INTO {detail} (id, {names}) SELECT id, {names} FROM {table}")
+
+        for name in indexed:
+            op.drop_index(f'ix_{table}_{name}', table_name=table,
+                          postgresql_using='gin', postgresql_ops={name: 'jsonb_path_ops'})
+            op.create_index(f'ix_{detail}_{name}', detail, [name], unique=False,
+                            postgresql_using='gin', postgresql_ops={name: 'jsonb_path_ops'})
+        for name, _ in columns:
+            op.drop_column(table, name)
+
+    # DROP COLUMN leaves the old values in place until rows are rewritten; VACUUM FULL
+    # cannot run inside the migration transaction, so only refresh the statistics here
+    for table in DETAIL_TABLES:
+        op.execute(f"ANALYZE {table}")
+
+
+def downgrade():
+    for table, (detail, columns, indexed) in DETAIL_TABLES.items():
+        for name, type_ in columns:
+            op.add_column(table, sa.Column(name, type_, nullable=True))
+        assignments = ', '.join(f"{name} = {detail}.{name}" for name, _ in columns)
+        op.execute(f"UPDATE {table} SET {assignments} FROM {detail} WHERE {detail}.id = {table}.id")
+
+        for name in indexed:
+            op.drop_index(f'ix_{detail}_{name}', table_name=detail,
+                          postgresql_using='gin', postgresql_ops={name: 'jsonb_path_ops'})
+            op.create_index(f'ix_{table}_{name}', table, [name], unique=False,
+                            postgresql_using='gin', postgresql_ops={name: 'jsonb_path_ops'})
+        op.drop_table(detail)
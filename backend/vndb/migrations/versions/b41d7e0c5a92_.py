@@ -0,0 +1,51 @@
+"""store relation columns as jsonb arrays with gin indexes
+
+Revision ID: b41d7e0c5a92
+Revises: 8c1f4a2b9d37
+Create Date: 2025-04-22 21:47:15.902331
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41d7e0c5a92'
+down_revision = '8c1f4a2b9d37'
+branch_labels = None
+depends_on = None
+
+
+RELATION_COLUMNS = {
+    'vns': ['tags', 'developers', 'staff', 'characters', 'releases'],
+    'releases': ['vns', 'producers'],
+    'characters': ['vns', 'traits', 'seiyuu'],
+}
+
+
+def upgrade():
+    for table, columns in RELATION_COLUMNS.items():
+        for column in columns:
+            op.alter_column(table, column,
+                            type_=postgresql.JSONB(astext_type=sa.Text()),
+                            existing_type=postgresql.ARRAY(postgresql.JSONB(astext_type=sa.Text())),
+                            postgresql_using=f'to_jsonb({column})')
+            op.create_index(f'ix_{table}_{column}', table, [column], unique=False,
+                            postgresql_using='gin', postgresql_ops={column: 'jsonb_path_ops'})
+
+
+def downgrade():
+    for table, columns in RELATION_COLUMNS.items():
+        for column in columns:
+            op.drop_index(f'ix_{table}_{column}', table_name=table,
+                          postgresql_using='gin', postgresql_ops={column: 'jsonb_path_ops'})
+            # Subqueries are not allowed in ALTER ... USING, so rebuild through a temporary column
+            op.add_column(table, sa.Column(f'{column}_array', postgresql.ARRAY(postgresql.JSONB(astext_type=sa.Text())), nullable=True))
+            op.execute(f"""
+                UPDATE {table}
+                SET {column}_array = ARRAY(SELECT jsonb_array_elements({column}))
+                WHERE jsonb_typeof({column}) = 'array'
+            """)
+            op.drop_column(table, column)
+            op.alter_column(table, f'{column}_array', new_column_name=column)
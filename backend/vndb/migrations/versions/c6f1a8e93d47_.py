@@ -0,0 +1,94 @@
+"""precomputed content flags with partial safe-content indexes
+
+Revision ID: c6f1a8e93d47
+Revises: 4b8d21e6f0c3
+Create Date: 2025-05-11 15:02:41.775209
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c6f1a8e93d47'
+down_revision = '4b8d21e6f0c3'
+branch_labels = None
+depends_on = None
+
+
+COLUMNS = {
+    'vns': [
+        ('has_ero_tag', sa.Boolean()),
+        ('max_screenshot_sexual', sa.Float()),
+        ('max_screenshot_violence', sa.Float()),
+        ('max_image_sexual', sa.Float()),
+        ('max_image_violence', sa.Float()),
+    ],
+    'releases': [
+        ('max_image_sexual', sa.Float()),
+        ('max_image_violence', sa.Float()),
+    ],
+    'characters': [
+        ('has_sexual_trait', sa.Boolean()),
+        ('max_image_sexual', sa.Float()),
+        ('max_image_violence', sa.Float()),
+    ],
+}
+
+# Must stay identical to vndb.database.models.safe_content for the planner to match them
+SAFE_CONTENT = {
+    'vns': "has_ero_tag = false AND max_screenshot_sexual <= 0.5 AND max_screenshot_violence <= 0.5 "
+           "AND max_image_sexual <= 0.5 AND max_image_violence <= 0.5",
+    'releases': "has_ero = false AND max_image_sexual <= 0.5 AND max_image_violence <= 0.5",
+    'characters': "has_sexual_trait = false AND max_image_sexual <= 0.5 AND max_image_violence <= 0.5",
+}
+
+
+def max_score(array, key):
+    return f"coalesce((SELECT max((item->>'{key}')::float) FROM unnest({array}) AS item), 0)"
+
+
+def upgrade():
+    for table, columns in COLUMNS.items():
+        for name, type_ in columns:
+            op.add_column(table, sa.Column(name, type_, nullable=True))
+
+    op.execute(f"""
+        UPDATE vns SET
+            has_ero_tag = coalesce(vn_details.tags @> '[{{"category": "ero"}}]', false),
+            max_screenshot_sexual = {max_score('vn_details.screenshots', 'sexual')},
+            max_screenshot_violence = {max_score('vn_details.screenshots', 'violence')},
+            max_image_sexual = coalesce((vns.image->>'sexual')::float, 0),
+            max_image_violence = coalesce((vns.image->>'violence')::float, 0)
+        FROM vn_details WHERE vn_details.id = vns.id
+    """)
+    op.execute(f"""
+        UPDATE releases SET
+            max_image_sexual = {max_score('release_details.images', 'sexual')},
+            max_image_violence = {max_score('release_details.images', 'violence')}
+        FROM release_details WHERE release_details.id = releases.id
+    """)
+    op.execute("""
+        UPDATE characters SET
+            has_sexual_trait = coalesce((
+                SELECT bool_or(trait->>'name' ILIKE '%sexual%' OR trait->>'group_name' ILIKE '%sexual%')
+                FROM jsonb_array_elements(CASE jsonb_typeof(character_details.traits)
+                                          WHEN 'array' THEN character_details.traits ELSE '[]' END) AS trait
+            ), false),
+            max_image_sexual = coalesce((characters.image->>'sexual')::float, 0),
+            max_image_violence = coalesce((characters.image->>'violence')::float, 0)
+        FROM character_details WHERE character_details.id = characters.id
+    """)
+
+    for table, predicate in SAFE_CONTENT.items():
+        op.create_index(f'ix_{table}_safe_content', table, ['id'], unique=False,
+                        postgresql_where=sa.text(f'deleted_at IS NULL AND {predicate}'))
+
+
+def downgrade():
+    for table, predicate in SAFE_CONTENT.items():
+        op.drop_index(f'ix_{table}_safe_content', table_name=table,
+                      postgresql_where=sa.text(f'deleted_at IS NULL AND {predicate}'))
+    for table, columns in COLUMNS.items():
+        for name, _ in columns:
+            op.drop_column(table, name)
@@ -0,0 +1,41 @@
+"""keyset pagination indexes
+
+Revision ID: e7a2c94f1b06
+Revises: 5f93c0d2e718
+Create Date: 2025-04-28 14:36:52.118407
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7a2c94f1b06'
+down_revision = '5f93c0d2e718'
+branch_labels = None
+depends_on = None
+
+
+KEYSET_COLUMNS = {
+    'vns': ['title', 'released', 'rating', 'votecount', 'updated_at'],
+    'releases': ['title', 'released'],
+    'characters': ['name'],
+    'producers': ['name'],
+    'staff': ['name'],
+    'tags': ['name', 'vn_count'],
+    'traits': ['name', 'char_count'],
+}
+
+
+def upgrade():
+    for table, columns in KEYSET_COLUMNS.items():
+        for column in columns:
+            op.create_index(f'ix_{table}_{column}_id_active', table, [column, 'id'], unique=False,
+                            postgresql_where=sa.text('deleted_at IS NULL'))
+
+
+def downgrade():
+    for table, columns in KEYSET_COLUMNS.items():
+        for column in columns:
+            op.drop_index(f'ix_{table}_{column}_id_active', table_name=table,
+                          postgresql_where=sa.text('deleted_at IS NULL'))
@@ -34,4 +34,7 @@ from .tasks import task_bp
 api_bp.register_blueprint(task_bp)
 
 from .query import query_bp
-api_bp.register_blueprint(query_bp)
\ No newline at end of file
+api_bp.register_blueprint(query_bp)
+
+from .stats import stats_bp
+api_bp.register_blueprint(stats_bp)
\ No newline at end of file
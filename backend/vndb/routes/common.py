@@ -1,9 +1,44 @@
-from flask import jsonify
+import zlib
+from typing import Any, Iterable
+
+from flask import Response, jsonify, stream_with_context
+
+from vndb.database import dumps
+
+# Rows encoded per chunk handed to the WSGI server while streaming
+STREAM_CHUNK_ROWS = 500
+
+def json_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
 
 def execute_task(task, sync=False, *args, **kwargs):
     if sync:
         result = task(*args, **kwargs)
-        return jsonify(result)
+        return json_response(result)
     else:
         task_result = task.delay(*args, **kwargs)
-        return jsonify({"task_id": task_result.id}), 202
\ No newline at end of file
+        return jsonify({"task_id": task_result.id}), 202
+
+def ndjson_response(rows: Iterable[Any], compress: bool = False) -> Response:
+    """
+    Stream rows as newline delimited JSON, gzip encoded when `compress` is set.
+
+    Chunks are produced only when the server asks for the next one, so a slow client
+    holds back the database cursor instead of buffering the export in memory.
+    """
+    def generate():
+        compressor = zlib.compressobj(wbits=31) if compress else None
+        lines = []
+        for row in rows:
+            lines.append(dumps(row) + b'\n')
+            if len(lines) >= STREAM_CHUNK_ROWS:
+                chunk = b''.join(lines)
+                lines.clear()
+                yield compressor.compress(chunk) if compressor else chunk
+        chunk = b''.join(lines)
+        yield compressor.compress(chunk) + compressor.flush() if compressor else chunk
+
+    response = Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+    if compress:
+        response.headers['Content-Encoding'] = 'gzip'
+    return response
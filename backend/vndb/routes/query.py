@@ -31,21 +31,34 @@ def handle_query(query):
         limit = int(params.pop('limit', 20))
         sort = params.pop('sort', 'id')
         reverse = params.pop('reverse', 'false').lower() == 'true'
-        count = params.pop('count', 'true').lower() == 'true'
+        # Local searches also accept count=exact/estimate, the remote API only a boolean
+        count = params.pop('count', 'true').lower()
+        remote_count = count not in ('false', '0')
+        cursor = params.pop('cursor', None)
+        # Plans and facets are only available for local searches
+        explain = params.pop('explain', None)
+        facets = params.pop('facets', None)
 
         search_from = params.pop('from', '')
         response_size = params.pop('size', 'large')
 
+        # Cursors, plans and facets are issued by local listings only
+        if cursor or explain or facets:
+            if search_from == 'remote':
+                abort(400, description="cursor, explain and facets are not supported with from=remote")
+            return execute_task(get_resources_task, 
+                True, type, params, response_size, page, limit, sort, reverse, count, cursor, explain, facets)
+
         if search_from == 'local':
             return execute_task(get_resources_task, 
                 True, type, params, response_size, page, limit, sort, reverse, count)
         elif search_from == 'remote':
             return execute_task(search_resources_task,
-                True, type, params, response_size, page, limit, sort, reverse, count)
+                True, type, params, response_size, page, limit, sort, reverse, remote_count)
 
         try:
             func_return = search_resources_task(
-                type, params, response_size, page, limit, sort, reverse, count)
+                type, params, response_size, page, limit, sort, reverse, remote_count)
             assert func_return['status'] == 'SUCCESS'
             return jsonify(func_return)
         except Exception as exc:
@@ -2,7 +2,7 @@ import re
 from abc import ABC, ABCMeta, abstractmethod
 from flask import Blueprint, jsonify, abort, request
 from vndb.tasks.resources import (
-    get_resource_task, get_resources_task, 
+    get_resource_task, get_resources_task, get_resources_by_ids_task,
     search_resource_task, search_resources_task,
     update_resource_task, update_resources_task, 
     delete_resource_task, delete_resources_task, 
@@ -17,7 +17,9 @@ from vndb.tasks.trash import (
     recover_resource_task, recover_resources_task,
     cleanup_resource_task, cleanup_resources_task
 )
-from .common import execute_task
+from vndb.database import MULTI_GET_LIMIT
+from vndb.search import export_local, validate_sort_local
+from .common import execute_task, ndjson_response
 
 class SingletonABCMeta(ABCMeta):
     _instances = {}
@@ -42,6 +44,8 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
 
     def register_routes(self):
         self.resource_bp.add_url_rule('', 'get_resources', self.get_resources, methods=['GET'])
+        self.resource_bp.add_url_rule('/export', 'export_resources', self.export_resources, methods=['GET'])
+        self.resource_bp.add_url_rule('/batch', 'get_resources_by_ids', self.get_resources_by_ids, methods=['POST'])
         self.resource_bp.add_url_rule('/<string:id>', 'get_resource', self.get_resource, methods=['GET'])
         self.resource_bp.add_url_rule('', 'search_resources', self.search_resources, methods=['POST'])
         self.resource_bp.add_url_rule('/<string:id>', 'search_resource', self.search_resource, methods=['POST'])
@@ -91,8 +95,11 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
                 if not re.match(f'^{prefix}\d+$', id_value):
                     abort(400, description=f"Invalid id format for {self.resource_type}: {id_value}")
 
-    def get_sync_param(self):
-        return request.args.get('sync', 'true').lower() == 'true'
+    def get_sync_param(self, default: str = 'true'):
+        return request.args.get('sync', default).lower() == 'true'
+
+    def get_vacuum_param(self):
+        return request.args.get('vacuum', 'false').lower() == 'true'
 
     def get_resources(self):
         args = request.args.to_dict()
@@ -102,10 +109,38 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
         sort = args.pop('sort', 'id')
         reverse = args.pop('reverse', False)
         count = args.pop('count', True)
+        cursor = args.pop('cursor', None)
+        explain = args.pop('explain', None)
+        facets = args.pop('facets', None)
         sync = self.get_sync_param()
         args.pop('sync', None)
 
-        return execute_task(get_resources_task, sync, self.resource_type, args, response_size, page, limit, sort, reverse, count)
+        return execute_task(get_resources_task, sync, self.resource_type, args, response_size, page, limit, sort, reverse, count, cursor, explain, facets)
+
+    def export_resources(self):
+        args = request.args.to_dict()
+        response_size = args.pop('response_size', 'large')
+        after_id = args.pop('after_id', None)
+        compress = args.pop('gzip', 'false').lower() == 'true'
+        try:
+            rows = export_local(self.resource_type, args, response_size, after_id)
+        except ValueError as exc:
+            abort(400, description=str(exc))
+        return ndjson_response(rows, compress)
+
+    def get_resources_by_ids(self):
+        body = request.json or {}
+        ids = body.get('ids', [])
+        if isinstance(ids, str):
+            ids = [id.strip() for id in ids.split(',') if id.strip()]
+        if not isinstance(ids, list) or not ids:
+            abort(400, description="ids must be a non-empty list")
+        if len(ids) > MULTI_GET_LIMIT:
+            abort(400, description=f"At most {MULTI_GET_LIMIT} ids can be fetched at once")
+        response_size = body.get('response_size', 'small')
+        remote = str(body.get('remote', False)).lower() == 'true'
+        sync = self.get_sync_param()
+        return execute_task(get_resources_by_ids_task, sync, self.resource_type, ids, response_size, remote)
 
     def get_resource(self, id):
         args = request.args.to_dict()
@@ -160,8 +195,9 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
         return execute_task(edit_resource_task, sync, self.resource_type, id, update_data)
 
     def delete_resources(self):
-        sync = self.get_sync_param()
-        return execute_task(delete_resources_task, sync, self.resource_type)
+        # Bulk trash operations run chunk by chunk, so they are queued unless sync is requested
+        sync = self.get_sync_param(default='false')
+        return execute_task(delete_resources_task, sync, self.resource_type, self.get_vacuum_param())
 
     def delete_resource(self, id):
         sync = self.get_sync_param()
@@ -174,9 +210,11 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
         limit = args.get('limit', default=20, type=int)
         sort = args.get('sort', default='id', type=str)
         reverse = args.get('reverse', default=False, type=bool)
-        count = args.get('count', default=True, type=bool)
+        count = args.get('count', default='true', type=str)
+        cursor = args.get('cursor', default=None, type=str)
+        explain = args.get('explain', default=None, type=str)
         sync = self.get_sync_param()
-        return execute_task(get_related_resources_task, sync, self.resource_type, id, related_resource_type, response_size, page, limit, sort, reverse, count)
+        return execute_task(get_related_resources_task, sync, self.resource_type, id, related_resource_type, response_size, page, limit, sort, reverse, count, cursor, explain)
 
     def search_related_resources(self, id, related_resource_type):
         search_params = request.json
@@ -204,25 +242,32 @@ class BaseResourceBlueprint(ABC, metaclass=SingletonABCMeta):
         sort = args.get('sort', default='id', type=str)
         reverse = args.get('reverse', default=False, type=bool)
         count = args.get('count', default=True, type=bool)
+        cursor = args.get('cursor', default=None, type=str)
         sync = self.get_sync_param()
+        try:
+            validate_sort_local(self.resource_type, sort)
+        except ValueError as exc:
+            abort(400, description=str(exc))
 
-        return execute_task(get_inactive_resources_task, sync, self.resource_type, page, limit, sort, reverse, count)
+        return execute_task(get_inactive_resources_task, sync, self.resource_type, page, limit, sort, reverse, count, cursor)
 
     def get_inactive_resource(self, id):
         sync = self.get_sync_param()
         return execute_task(get_inactive_resource_task, sync, self.resource_type, id)
 
     def cleanup_resources(self):
-        sync = self.get_sync_param()
-        return execute_task(cleanup_resources_task, sync, self.resource_type)
+        # Bulk trash operations run chunk by chunk, so they are queued unless sync is requested
+        sync = self.get_sync_param(default='false')
+        return execute_task(cleanup_resources_task, sync, self.resource_type, self.get_vacuum_param())
 
     def cleanup_resource(self, id):
         sync = self.get_sync_param()
         return execute_task(cleanup_resource_task, sync, self.resource_type, id)
 
     def recover_resources(self):
-        sync = self.get_sync_param()
-        return execute_task(recover_resources_task, sync, self.resource_type)
+        # Bulk trash operations run chunk by chunk, so they are queued unless sync is requested
+        sync = self.get_sync_param(default='false')
+        return execute_task(recover_resources_task, sync, self.resource_type, self.get_vacuum_param())
 
     def recover_resource(self, id):
         sync = self.get_sync_param()
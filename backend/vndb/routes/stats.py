@@ -0,0 +1,33 @@
+from flask import Blueprint, jsonify
+
+from vndb.search.local.stats import (
+    get_cache_stats, reset_cache_stats,
+    get_slow_query_journal, reset_slow_query_journal
+)
+from vndb.search.parse import parse_expression
+from vndb.search.remote.coalesce import get_coalesce_stats, reset_coalesce_stats
+
+stats_bp = Blueprint('stats', __name__, url_prefix='/stats')
+
+@stats_bp.route('', methods=['GET'])
+def get_stats():
+    return jsonify({
+        'local_search': {'compiled_cache': get_cache_stats()},
+        'expression_cache': parse_expression.cache_info()._asdict(),
+        'remote_search': {'coalescing': get_coalesce_stats()}
+    })
+
+@stats_bp.route('', methods=['DELETE'])
+def reset_stats():
+    reset_cache_stats()
+    reset_coalesce_stats()
+    return jsonify({'status': 'SUCCESS'})
+
+@stats_bp.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+    return jsonify(get_slow_query_journal())
+
+@stats_bp.route('/slow-queries', methods=['DELETE'])
+def reset_slow_queries():
+    reset_slow_query_journal()
+    return jsonify({'status': 'SUCCESS'})
@@ -13,6 +13,8 @@ def get_task_result(tid: str):
     task = celery.AsyncResult(tid)
     if task.ready():
         return jsonify(task.result)
+    if task.state == 'PROGRESS':
+        return jsonify({'status': 'PENDING', 'results': task.state, 'progress': task.info}), 202
     return jsonify({'status': 'PENDING', 'results': task.state}), 202
 
 @task_bp.route('/<string:tid>', methods=['POST'])
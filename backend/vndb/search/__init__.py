@@ -1,5 +1,6 @@
 from .local.search import (
     search as search_local,
+    export as export_local,
     search_resources_by_vnid as search_resources_by_vnid_local,
     search_resources_by_charid as search_resources_by_charid_local,
     search_resources_by_release_id as search_resources_by_release_id_local,
@@ -18,6 +19,11 @@ from .remote.search import (
     search_releases_by_resource_id_cache as search_releases_by_resource_id_remote,
 )
 
+from .remote.limiter import remote_priority
+from .remote.pager import iter_pages
+
+from .local.fields import get_local_fields, validate_sort as validate_sort_local
+
 from .common import (
     convert_remote_to_local
 )
\ No newline at end of file
@@ -0,0 +1,46 @@
+from typing import Any
+
+from sqlalchemy import func
+from sqlalchemy.orm import Query
+
+from .explain import run_explain
+
+COUNT_MODES = ('exact', 'estimate')
+
+def get_count_mode(count: Any) -> str | None:
+    """
+    Normalize the `count` search parameter.
+
+    :param count: True/False, 'true'/'false', 'exact' or 'estimate'
+    :return: 'exact', 'estimate' or None when no total is wanted
+    """
+    if count is None or count is False:
+        return None
+    if count is True:
+        return 'exact'
+    value = str(count).strip().lower()
+    if value in ('', 'false', '0', 'no'):
+        return None
+    if value in ('true', '1', 'yes'):
+        return 'exact'
+    if value in COUNT_MODES:
+        return value
+    raise ValueError(f"Invalid count: {count}. Must be a boolean, 'exact' or 'estimate'.")
+
+def with_exact_count(query: Query) -> Query:
+    """Add a `count(*) OVER ()` column so the total comes back with the page rows."""
+    return query.add_columns(func.count().over().label('total'))
+
+def count_exact(query: Query) -> int:
+    """Fallback for pages past the end, where the window column has no row to ride on."""
+    return query.order_by(None).count()
+
+def count_estimate(query: Query) -> int:
+    """
+    Estimate the number of rows of a query from the planner's row estimate.
+
+    :param query: The filtered query, without ordering, offset or limit
+    :return: The planner's estimated row count
+    """
+    plan = run_explain(query.order_by(None), 'FORMAT JSON')
+    return int(plan[0]['Plan']['Plan Rows'])
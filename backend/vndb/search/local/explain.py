@@ -0,0 +1,66 @@
+from typing import Any
+
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import Query
+from sqlalchemy.sql.expression import ClauseElement, Executable
+
+from vndb import db
+
+# explain parameter -> EXPLAIN options
+EXPLAIN_MODES = {
+    'plan': 'FORMAT JSON',
+    'analyze': 'ANALYZE, BUFFERS, FORMAT JSON',
+}
+
+class Explain(Executable, ClauseElement):
+    """
+    `EXPLAIN (options) <statement>` as a statement of its own.
+
+    Compiled by the same compiler as the statement it wraps, so its parameters go
+    through their bind processors (JSONB values are serialized, IN lists expanded)
+    exactly as when the statement itself runs.
+    """
+    inherit_cache = False
+
+    def __init__(self, statement: Any, options: str):
+        self.statement = statement
+        self.options = options
+
+@compiles(Explain)
+def _compile_explain(element: Explain, compiler: Any, **kwargs) -> str:
+    return f"EXPLAIN ({element.options}) {compiler.process(element.statement, **kwargs)}"
+
+def run_explain(query: Query, options: str) -> list[dict[str, Any]]:
+    """Postgres' JSON plan of a query; `options` must include FORMAT JSON."""
+    return db.session.execute(Explain(query.statement, options)).scalar()
+
+def get_explain_mode(explain: Any) -> str | None:
+    """
+    Normalize the `explain` search parameter.
+
+    :param explain: True/False, 'true'/'false', 'plan' or 'analyze'
+    :return: 'plan', 'analyze' or None when no plan is wanted
+    """
+    if explain is None or explain is False:
+        return None
+    if explain is True:
+        return 'plan'
+    value = str(explain).strip().lower()
+    if value in ('', 'false', '0', 'no'):
+        return None
+    if value in ('true', '1', 'yes'):
+        return 'plan'
+    if value in EXPLAIN_MODES:
+        return value
+    raise ValueError(f"Invalid explain: {explain}. Must be a boolean, 'plan' or 'analyze'.")
+
+def explain_query(query: Query, mode: str) -> dict[str, Any]:
+    """
+    Run EXPLAIN over a query exactly as it will be sent for the page.
+
+    :param query: The final query, with ordering, offset/seek and limit applied
+    :param mode: 'plan' for the planner's estimate, 'analyze' to also execute it and
+                 report actual rows, timings and shared/local buffer usage
+    :return: Postgres' JSON plan, including "Planning Time"/"Execution Time" when analyzed
+    """
+    return run_explain(query, EXPLAIN_MODES[mode])[0]
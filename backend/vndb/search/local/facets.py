@@ -0,0 +1,214 @@
+import hashlib
+import json
+from typing import Any, Callable
+
+from sqlalchemy import Integer, String, cast, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Query
+
+from vndb import db
+from vndb.database.models import MODEL_MAP, RELATION_MAP, listing_table
+
+from ..parse import Node, Term, TermSet, And, Or, parse_expression
+from .stats import LOCAL_SEARCH_OPTION
+
+# Most frequent values returned per facet
+FACET_LIMIT = 50
+FACET_CACHE_TIMEOUT = 600
+
+# A facet builder takes the listing table and the CTE of filtered ids and returns
+# the value expression to group by and the FROM clause it is read from
+FacetBuilder = Callable[[Any, Any], tuple[Any, Any]]
+
+def column_facet(column: str) -> FacetBuilder:
+    def build(table: Any, ids: Any) -> tuple[Any, Any]:
+        return table.c[column], ids.join(table, table.c.id == ids.c.id)
+    return build
+
+def element_facet(column: str, index: int) -> FacetBuilder:
+    """One element of an ARRAY column, e.g. the non-spoiler sex of a character."""
+    def build(table: Any, ids: Any) -> tuple[Any, Any]:
+        return table.c[column][index], ids.join(table, table.c.id == ids.c.id)
+    return build
+
+def array_facet(column: str, key: str | None = None) -> FacetBuilder:
+    """Every element of an ARRAY column, or the `key` of every element of an ARRAY(JSONB) column."""
+    def build(table: Any, ids: Any) -> tuple[Any, Any]:
+        if key is None:
+            value = func.unnest(table.c[column]).column_valued('facet_item')
+        else:
+            value = func.unnest(table.c[column], type_=JSONB).column_valued('facet_item')[key].astext
+        return value, ids.join(table, table.c.id == ids.c.id)
+    return build
+
+def year_facet(column: str) -> FacetBuilder:
+    def build(table: Any, ids: Any) -> tuple[Any, Any]:
+        return cast(func.extract('year', table.c[column]), Integer), ids.join(table, table.c.id == ids.c.id)
+    return build
+
+def relation_facet(owner_type: str, relation_name: str) -> FacetBuilder:
+    """The related ids of a relation side table, answered by its primary key."""
+    def build(table: Any, ids: Any) -> tuple[Any, Any]:
+        relation = RELATION_MAP[owner_type][relation_name].__table__
+        return relation.c.related_id, ids.join(relation, relation.c.owner_id == ids.c.id)
+    return build
+
+FACETS: dict[str, dict[str, FacetBuilder]] = {
+    'vn': {
+        'lang': array_facet('languages'),
+        'platform': array_facet('platforms'),
+        'olang': column_facet('olang'),
+        'devstatus': column_facet('devstatus'),
+        'length': column_facet('length'),
+        'released_year': year_facet('released_date'),
+        'tag': relation_facet('vn', 'tags'),
+        'developer': relation_facet('vn', 'developers'),
+        'staff': relation_facet('vn', 'staff'),
+    },
+    'release': {
+        'lang': array_facet('languages', 'lang'),
+        'platform': array_facet('platforms'),
+        'minage': column_facet('minage'),
+        'voiced': column_facet('voiced'),
+        'engine': column_facet('engine'),
+        'patch': column_facet('patch'),
+        'freeware': column_facet('freeware'),
+        'official': column_facet('official'),
+        'released_year': year_facet('released_date'),
+        'vn': relation_facet('release', 'vns'),
+        'producer': relation_facet('release', 'producers'),
+    },
+    'character': {
+        'sex': element_facet('sex', 1),
+        'blood_type': column_facet('blood_type'),
+        'cup': column_facet('cup'),
+        'age': column_facet('age'),
+        'birthday_month': column_facet('birthday_month'),
+        'trait': relation_facet('character', 'traits'),
+        'vn': relation_facet('character', 'vns'),
+        'seiyuu': relation_facet('character', 'seiyuu'),
+    },
+    'producer': {
+        'lang': column_facet('lang'),
+        'type': column_facet('type'),
+    },
+    'staff': {
+        'lang': column_facet('lang'),
+        'gender': column_facet('gender'),
+    },
+    'tag': {
+        'category': column_facet('category'),
+    },
+    'trait': {
+        'group_name': column_facet('group_name'),
+    },
+}
+
+def get_facet_names(resource_type: str, facets: Any) -> list[str]:
+    """
+    Normalize the `facets` search parameter.
+
+    :param facets: A list of facet names or a comma separated string
+    :return: The requested facet names, deduplicated and sorted
+    """
+    if not facets:
+        return []
+    if isinstance(facets, str):
+        facets = facets.split(',')
+    names = sorted({str(facet).strip() for facet in facets if str(facet).strip()})
+    available = FACETS.get(resource_type, {})
+    for name in names:
+        if name not in available:
+            raise ValueError(f"Invalid facet for {resource_type}: {name}. Must be one of {', '.join(available)}.")
+    return names
+
+def canonical_expression(node: Node) -> str:
+    """Order-insensitive form of a parsed expression: `a,b+c` and `c+(b , a)` give the same string."""
+    if isinstance(node, Term):
+        return json.dumps(node.value)
+    if isinstance(node, TermSet):
+        return f"or({','.join(sorted(json.dumps(value) for value in node.values))})"
+    children = []
+    for child in node.children:
+        if isinstance(node, Or) and isinstance(child, TermSet):
+            children.extend(json.dumps(value) for value in child.values)
+        else:
+            children.append(canonical_expression(child))
+    return f"{'and' if isinstance(node, And) else 'or'}({','.join(sorted(children))})"
+
+def normalize_filter_value(value: Any) -> str:
+    if isinstance(value, str):
+        try:
+            return canonical_expression(parse_expression(value))
+        except ValueError:
+            return json.dumps(value)
+    return json.dumps(value, sort_keys=True, default=str)
+
+def facet_cache_key(resource_type: str, params: dict[str, Any], names: list[str]) -> str:
+    """
+    Facets only depend on the filters, so pages, sort orders and cursors share one entry.
+    Filter expressions are keyed by their parsed form, so reordered or respaced
+    variants of the same filter set hit the same entry.
+    """
+    filters = {key: normalize_filter_value(value) for key, value in params.items() if value not in (None, '')}
+    digest = hashlib.md5(f"{resource_type}:{json.dumps(filters, sort_keys=True)}:{','.join(names)}".encode('utf-8')).hexdigest()
+    return f"facets:{resource_type}:{digest}"
+
+def facet_statement(resource_type: str, query: Query, names: list[str]) -> Any:
+    """
+    A single statement computing every requested facet histogram.
+
+    The filtered ids are collected once in a CTE; each facet groups over it and keeps
+    its `FACET_LIMIT` most frequent values, and the branches are glued by UNION ALL.
+    """
+    model = MODEL_MAP[resource_type]
+    table = listing_table(model)
+    ids = query.with_entities(model.id.label('id')).order_by(None).cte('filtered_ids')
+
+    branches = []
+    for name in names:
+        value, from_clause = FACETS[resource_type][name](table, ids)
+        count = func.count().label('count')
+        histogram = (
+            select(cast(value, String).label('value'), count)
+            .select_from(from_clause)
+            .where(value != None)
+            .group_by(value)
+            .order_by(count.desc(), value)
+            .limit(FACET_LIMIT)
+            .subquery()
+        )
+        branches.append(select(literal(name).label('facet'), histogram.c.value, histogram.c['count']))
+
+    return union_all(*branches)
+
+def get_facets(resource_type: str, query: Query, params: dict[str, Any], facets: Any) -> dict[str, list[dict[str, Any]]]:
+    """
+    Facet histograms over the filtered set of a local search.
+
+    :param query: The filtered query, before sorting and pagination
+    :param params: The search parameters the filters were built from, used as cache key
+    :param facets: The requested facet names
+    :return: {facet: [{'value': ..., 'count': ...}, ...]}, most frequent values first
+    """
+    names = get_facet_names(resource_type, facets)
+    if not names:
+        return {}
+
+    from vndb import cache
+
+    cache_key = facet_cache_key(resource_type, params, names)
+    result = cache.get(cache_key)
+    if result is not None:
+        return result
+
+    result = {name: [] for name in names}
+    statement = facet_statement(resource_type, query, names)
+    for facet, value, count in db.session.execute(statement, execution_options={LOCAL_SEARCH_OPTION: True}):
+        result[facet].append({'value': value, 'count': count})
+    # UNION ALL does not keep the order of its branches
+    for values in result.values():
+        values.sort(key=lambda item: (-item['count'], item['value']))
+
+    cache.set(cache_key, result, timeout=FACET_CACHE_TIMEOUT)
+    return result
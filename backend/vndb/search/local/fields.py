@@ -1,13 +1,16 @@
+from sqlalchemy import inspect
+
 from vndb.database.models import VN, Tag, Producer, Staff, Character, Trait, Release
+from vndb.database.derived import DERIVED_COLUMNS
 
 class LocalFields:
-    VN = [column.key for column in VN.__table__.columns]
-    RELEASE = [column.key for column in Release.__table__.columns]
-    CHARACTER = [column.key for column in Character.__table__.columns]
-    PRODUCER = [column.key for column in Producer.__table__.columns]
-    STAFF = [column.key for column in Staff.__table__.columns]
-    TAG = [column.key for column in Tag.__table__.columns]
-    TRAIT = [column.key for column in Trait.__table__.columns]
+    VN = [key for key in inspect(VN).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    RELEASE = [key for key in inspect(Release).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    CHARACTER = [key for key in inspect(Character).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    PRODUCER = [key for key in inspect(Producer).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    STAFF = [key for key in inspect(Staff).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    TAG = [key for key in inspect(Tag).column_attrs.keys() if key not in DERIVED_COLUMNS]
+    TRAIT = [key for key in inspect(Trait).column_attrs.keys() if key not in DERIVED_COLUMNS]
 
     SMALL_VN = ['id', 'title', 'titles', 'released', 'developers', 'image']
     SMALL_RELEASE = ['id', 'title', 'released', 'vns', 'producers', 'languages']
@@ -49,12 +52,20 @@ SORTABLE_FIELDS = {
     ]
 }
 
+# Sort fields stored as strings are ordered by their typed derived column instead
+SORT_COLUMNS = {
+    'vn': {'released': 'released_date'},
+    'release': {'released': 'released_date'},
+    'character': {'birthday': 'birthday_ordinal'},
+}
+
 def validate_sort(search_type: str, sort: str) -> str:
+    """Validate a sort field and return the column to order by."""
     if search_type not in SORTABLE_FIELDS:
         raise ValueError(f"Invalid search_type: {search_type}")
     if sort not in SORTABLE_FIELDS[search_type]:
         raise ValueError(f"Invalid sort: {sort} for search_type: {search_type}")
-    return sort
+    return SORT_COLUMNS.get(search_type, {}).get(sort, sort)
 
 def get_local_fields(search_type: str, response_size: str = 'small') -> list[str]:
     """
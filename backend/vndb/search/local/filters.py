@@ -1,36 +1,192 @@
 from typing import Any, Callable
 
 import re
-import uuid
 from datetime import datetime
+from functools import reduce
 
-from sqlalchemy import or_, and_, text, exists, select, func, Integer, Float, String
+from sqlalchemy import or_, and_, exists, select, func, tuple_, literal, union, String
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
 from sqlalchemy.sql.expression import BinaryExpression
 
-from vndb.database.models import VN, Tag, Producer, Staff, Character, Trait, Release
-from vndb.database.operations import formatId
-from ..parse import validate_logical_expression
+from vndb.database.models import (
+    VN, Tag, Producer, Staff, Character, Trait, Release,
+    VNTag, VNCharacter, VNStaff, VNDeveloper, VNRelease,
+    CharacterTrait, CharacterVN, CharacterSeiyuu, ReleaseVN, ReleaseProducer,
+    TagClosure, TraitClosure, safe_content
+)
+from vndb.database.operations import formatId, id_any
+from vndb.database.derived import normalize_search_text, CUP_SIZES
+from ..parse import parse_expression, compile_tree
+
+class JSONBContainment:
+    """
+    A deferred `column @> '[{key: value}, ...]'` predicate on a JSONB array column.
+
+    Kept as an object rather than a compiled clause so that AND-ed lookups on the
+    same column can be merged into a single containment check (see `merge_and`).
+    """
+
+    def __init__(self, column: Any, items: list[dict[str, Any]]):
+        self.column = column
+        self.items = items
+
+    @property
+    def target(self) -> Any:
+        return self.column
+
+    def merge(self, other: 'JSONBContainment') -> 'JSONBContainment':
+        return JSONBContainment(self.column, self.items + [item for item in other.items if item not in self.items])
+
+    def __clause_element__(self) -> BinaryExpression:
+        return self.column.contains(self.items)
+
+    def __invert__(self) -> BinaryExpression:
+        return ~self.__clause_element__()
+
+def is_jsonb_array(column: Any) -> bool:
+    return not isinstance(column.type, ARRAY)
+
+def jsonb_elements(column: Any, name: str = 'jsonb_item') -> Any:
+    """
+    The elements of a JSONB array or ARRAY(JSONB) column as a column-valued function.
 
-def generate_unique_param_name(prefix: str) -> str:
-    return f"{prefix}_{uuid.uuid4().hex[:8]}"
+    Built from core constructs only, so the bind parameters of the surrounding filter
+    get positional names and equal filter shapes compile to the same cached statement.
+    """
+    if is_jsonb_array(column):
+        return func.jsonb_array_elements(column, type_=JSONB).column_valued(name)
+    return func.unnest(column, type_=JSONB).column_valued(name)
+
+class Conjunction(list):
+    """
+    The terms of an AND expression, kept flat so that containment checks on the
+    same column can still be merged after further terms are AND-ed in.
+    """
 
-def array_jsonb_exact_match(column: Any, key: str, value: Any) -> BinaryExpression:
-    param_key = generate_unique_param_name("key")
-    param_value = generate_unique_param_name("value")
-    return exists(
-        select(1)
-        .select_from(func.unnest(column).alias('jsonb_item'))
-        .where(text(f"jsonb_item->>:{param_key} = :{param_value}"))
-    ).params({param_key: key, param_value: value})
+    def __clause_element__(self) -> BinaryExpression:
+        return and_(*self)
+
+def merge_containment_filters(filters: list[Any]) -> list[Any]:
+    """Fold the AND-ed containment checks and relation matches that target the same column or side table."""
+    merged = []
+    for condition in filters:
+        for index, existing in enumerate(merged):
+            if isinstance(existing, (JSONBContainment, RelationMatch)) and type(condition) is type(existing) \
+                    and existing.target is condition.target:
+                merged[index] = existing.merge(condition)
+                break
+        else:
+            merged.append(condition)
+    return merged
+
+def merge_and(left: Any, right: Any) -> Any:
+    terms = []
+    for side in (left, right):
+        terms.extend(side if isinstance(side, Conjunction) else [side])
+    terms = merge_containment_filters(terms)
+    return terms[0] if len(terms) == 1 else Conjunction(terms)
+
+def array_jsonb_exact_match(column: Any, key: str, value: Any) -> Any:
+    if is_jsonb_array(column):
+        return JSONBContainment(column, [{key: value}])
+    item = jsonb_elements(column)
+    return exists(select(1).where(item[key].astext == value))
 
 def array_jsonb_match(column: Any, key: str, value: Any) -> BinaryExpression:
-    param_key = generate_unique_param_name("key")
-    param_value = generate_unique_param_name("value")
-    return exists(
-        select(1)
-        .select_from(func.unnest(column).alias('jsonb_item'))
-        .where(text(f"jsonb_item->>:{param_key} ILIKE :{param_value}"))
-    ).params({param_key: key, param_value: f"%{value}%"})
+    item = jsonb_elements(column)
+    return exists(select(1).where(item[key].astext.ilike(f"%{value}%")))
+
+def is_vndb_id(value: str) -> bool:
+    return re.match(r'^[a-z]\d+$', value) is not None
+
+def relation_exact_match(model: Any, relation_model: Any, value: str) -> BinaryExpression:
+    """
+    Create a semi-join filter against a relation side table.
+    
+    :param model: The owning SQLAlchemy model (VN, Character or Release)
+    :param relation_model: The side table model (e.g. VNTag)
+    :param value: The related id to look up
+    :return: An SQLAlchemy IN clause answered by the (related_id, owner_id) index
+    """
+    return model.id.in_(
+        select(relation_model.owner_id)
+        .where(relation_model.related_id == value)
+    )
+
+class RelationMatch:
+    """
+    A deferred semi-join matching owners related to every one of `related_ids` through
+    a relation side table.
+
+    Like `JSONBContainment`, AND-ed lookups on the same side table are merged, here into
+    one semi-join grouped by owner, so `g1+g2` is still a single pass over the
+    (related_id, owner_id) index.
+    """
+
+    def __init__(self, model: Any, relation_model: Any, related_ids: list[str]):
+        self.model = model
+        self.relation_model = relation_model
+        self.related_ids = related_ids
+
+    @property
+    def target(self) -> Any:
+        return self.relation_model
+
+    def merge(self, other: 'RelationMatch') -> 'RelationMatch':
+        return RelationMatch(self.model, self.relation_model,
+                             self.related_ids + [id for id in other.related_ids if id not in self.related_ids])
+
+    def __clause_element__(self) -> BinaryExpression:
+        if len(self.related_ids) == 1:
+            return relation_exact_match(self.model, self.relation_model, self.related_ids[0])
+        # (owner_id, related_id) is the primary key, so each matched id counts once per owner
+        return self.model.id.in_(
+            select(self.relation_model.owner_id)
+            .where(self.relation_model.related_id.in_(self.related_ids))
+            .group_by(self.relation_model.owner_id)
+            .having(func.count() == len(self.related_ids))
+        )
+
+    def __invert__(self) -> BinaryExpression:
+        return ~self.__clause_element__()
+
+def relation_subtree_match(model: Any, relation_model: Any, closure_model: Any, ancestors: Any) -> BinaryExpression:
+    """
+    Create a semi-join filter matching owners related to any node of a hierarchy subtree.
+
+    :param model: The owning SQLAlchemy model (VN or Character)
+    :param relation_model: The side table model (VNTag or CharacterTrait)
+    :param closure_model: The closure table of the hierarchy (TagClosure or TraitClosure)
+    :param ancestors: A node id, or a select of node ids, whose subtrees to match
+    :return: An SQLAlchemy IN clause answered by the closure and side table indexes
+    """
+    if isinstance(ancestors, str):
+        # Nodes that are not stored locally have no closure rows but still match themselves
+        subtree = union(
+            select(literal(ancestors)),
+            select(closure_model.descendant_id).where(closure_model.ancestor_id == ancestors)
+        )
+    else:
+        subtree = select(closure_model.descendant_id).where(closure_model.ancestor_id.in_(ancestors))
+    return model.id.in_(
+        select(relation_model.owner_id)
+        .where(relation_model.related_id.in_(subtree))
+    )
+
+def escape_like(value: str) -> str:
+    """Escape the LIKE wildcards of a user value, for patterns using `escape='\\'`."""
+    return re.sub(r'([\\%_])', r'\\\1', value)
+
+def search_text_match(model: Any, value: str) -> BinaryExpression:
+    """
+    Create a substring filter on the trigram-indexed `search_text` column of a model.
+    
+    :param model: The SQLAlchemy model
+    :param value: The text to search for
+    :return: An SQLAlchemy LIKE clause answered by the gin_trgm_ops index
+    """
+    pattern = escape_like(normalize_search_text(value))
+    return model.search_text.like(f"%{pattern}%", escape='\\')
 
 def array_string_match(column: Any, value: str) -> BinaryExpression:
     """
@@ -40,67 +196,32 @@ def array_string_match(column: Any, value: str) -> BinaryExpression:
     :param value: The value to match against
     :return: An SQLAlchemy exists clause for filtering
     """
-    param_value = generate_unique_param_name("value")
-    return exists(
-        select(1)
-        .select_from(func.unnest(column).alias('array_item'))
-        .where(text(f"array_item ILIKE :{param_value}"))
-    ).params({param_value: f"%{value}%"})
-
-def process_multi_value_expression(expression: str, value_processor: Callable[[str], BinaryExpression]) -> BinaryExpression:
+    item = func.unnest(column).column_valued('array_item')
+    return exists(select(1).where(item.ilike(f"%{value}%")))
+
+def process_multi_value_expression(expression: str, value_processor: Callable[[str], BinaryExpression],
+                                   set_processor: Callable[[list[str]], BinaryExpression] | None = None) -> BinaryExpression:
     """
-    Process a multi-value expression with OR/AND logic and parentheses using two stacks.
+    Compile a multi-value expression with OR/AND logic and parentheses from its parsed tree.
     
     :param expression: The input expression (e.g., "value1,value2+(value3,value4)")
     :param value_processor: A function that takes a string value and returns a SQLAlchemy filter condition
+    :param set_processor: Optional function that matches a list of OR-ed values in one condition,
+                          e.g. `id = ANY(:ids)` instead of one comparison per value
     :return: A single SQLAlchemy filter condition
     """
-    if not validate_logical_expression(expression):
-        raise ValueError(f"Invalid expression: {expression}")
-
-    def evaluate(ops: list, vals: list) -> None:
-        if len(ops) > 0 and len(vals) >= 2:
-            op = ops.pop()
-            right = vals.pop()
-            left = vals.pop()
-            
-            if op == ',':
-                vals.append(or_(left, right))
-            elif op == '+':
-                vals.append(and_(left, right))
-
-    ops = []
-    vals = []
-    current = ""
-    
-    for char in expression:
-        if char == '(':
-            ops.append(char)
-        elif char == ')':
-            if current:
-                vals.append(value_processor(current.strip()))
-                current = ""
-            while ops and ops[-1] != '(':
-                evaluate(ops, vals)
-            if ops and ops[-1] == '(':
-                ops.pop()
-        elif char in '+,':
-            if current:
-                vals.append(value_processor(current.strip()))
-                current = ""
-            while ops and ops[-1] != '(' and char == ',' and ops[-1] == '+':
-                evaluate(ops, vals)
-            ops.append(char)
-        else:
-            current += char
-    
-    if current:
-        vals.append(value_processor(current.strip()))
-    
-    while ops:
-        evaluate(ops, vals)
-    
-    return vals[0] if vals else None
+    def process_set(values: list[str]) -> BinaryExpression:
+        if set_processor:
+            return set_processor(values)
+        return or_(*[value_processor(value) for value in values])
+
+    return compile_tree(
+        parse_expression(expression),
+        term=value_processor,
+        terms=process_set,
+        conjunction=lambda conditions: reduce(merge_and, conditions),
+        disjunction=lambda conditions: or_(*conditions)
+    )
 
 def create_comparison_filter(field: Any, value: str, value_parser: Callable[[str], Any]) -> BinaryExpression:
     pattern = r'^(>=|<=|>|<|=|!=)?(.+)$'
@@ -180,17 +301,22 @@ def parse_birthday(value: str) -> tuple[int, int]:
     raise ValueError(f"Invalid birthday format: {value}. Use 'MM-DD' format (e.g., '12-25').")
 
 def parse_cup(value: str) -> str:
-    cup_sizes = ['AAA', 'AA', 'A', 'B', 'C', 'D', 'E', 
-                 'F', 'G', 'H', 'I', 'J', 'K', 'L', 
-                 'M', 'N', 'O', 'P', 'Q', 'R', 'S', 
-                 'T', 'U', 'V', 'W', 'X', 'Y', 'Z']
-    if value.upper() in cup_sizes:
+    if value.upper() in CUP_SIZES:
         return value.upper()
     raise ValueError(f"Invalid cup size: {value}")
 
+COMPARISON_OPERATORS = {
+    '>=': lambda field, value: field >= value,
+    '<=': lambda field, value: field <= value,
+    '>': lambda field, value: field > value,
+    '<': lambda field, value: field < value,
+    '=': lambda field, value: field == value,
+    '!=': lambda field, value: field != value
+}
+
 def create_released_comparison_filter(value: str, model) -> BinaryExpression:
     """
-    Create a filter for comparing released dates stored as strings.
+    Create a filter for comparing release dates against the typed `released_date` column.
     
     :param value: The release date value to compare against in the format "OPERATOR DATE"
     :param model: The SQLAlchemy model (VN or Release) to use for the filter
@@ -204,22 +330,14 @@ def create_released_comparison_filter(value: str, model) -> BinaryExpression:
     operator, date_value = match.groups()
     operator = operator or '='
     
-    normalized_date = parse_released(date_value)
-    
-    operators = {
-        '>=': lambda field, date: and_(field != 'TBA', field.isnot(None), field >= date),
-        '<=': lambda field, date: and_(field != 'TBA', field.isnot(None), field <= date),
-        '>': lambda field, date: and_(field != 'TBA', field.isnot(None), field > date),
-        '<': lambda field, date: and_(field != 'TBA', field.isnot(None), field < date),
-        '=': lambda field, date: and_(field != 'TBA', field.isnot(None), field == date),
-        '!=': lambda field, date: and_(field != 'TBA', field.isnot(None), field != date)
-    }
+    normalized_date = datetime.strptime(parse_released(date_value), "%Y-%m-%d").date()
     
-    return operators[operator](model.released, normalized_date)
+    # 'TBA' and unknown dates have no released_date and never match, as with the string column
+    return and_(model.released_date.isnot(None), COMPARISON_OPERATORS[operator](model.released_date, normalized_date))
 
 def create_resolution_comparison_filter(value: str) -> BinaryExpression:
     """
-    Create a filter for comparing resolutions stored as strings in the format "[WIDTH,HEIGHT]".
+    Create a filter for comparing resolutions, ordered by width and then height.
     
     :param value: The resolution value to compare against in the format "OPERATORWIDTHxHEIGHT"
     :return: An SQLAlchemy filter expression
@@ -234,40 +352,17 @@ def create_resolution_comparison_filter(value: str) -> BinaryExpression:
 
     width, height = parse_resolution(resolution_value)
 
-    resolution_without_brackets = func.substring(Release.resolution, 2, func.length(Release.resolution) - 2)
-    extracted_width = func.cast(func.split_part(resolution_without_brackets, ',', 1), Integer)
-    extracted_height = func.cast(func.split_part(resolution_without_brackets, ',', 2), Integer)
-
-    operators = {
-        '>=': lambda w, h: or_(
-            extracted_width > w,
-            and_(extracted_width == w, extracted_height >= h)
-        ),
-        '<=': lambda w, h: or_(
-            extracted_width < w,
-            and_(extracted_width == w, extracted_height <= h)
-        ),
-        '>': lambda w, h: or_(
-            extracted_width > w,
-            and_(extracted_width == w, extracted_height > h)
-        ),
-        '<': lambda w, h: or_(
-            extracted_width < w,
-            and_(extracted_width == w, extracted_height < h)
-        ),
-        '=': lambda w, h: and_(extracted_width == w, extracted_height == h),
-        '!=': lambda w, h: or_(extracted_width != w, extracted_height != h)
-    }
-
+    # Row-value comparison keeps the (width, height) index usable
     return and_(
-        Release.resolution.isnot(None),
-        Release.resolution != '"non-standard"',
-        operators[operator](width, height)
+        Release.resolution_width.isnot(None),
+        COMPARISON_OPERATORS[operator](
+            tuple_(Release.resolution_width, Release.resolution_height), tuple_(width, height)
+        )
     )
 
 def create_resolution_aspect_comparison_filter(value: str) -> BinaryExpression:
     """
-    Create a filter for comparing resolutions and aspect ratios stored as strings in the format "[WIDTH,HEIGHT]".
+    Create a filter for comparing resolutions that share the aspect ratio of the given one.
     
     :param value: The resolution value to compare against in the format "OPERATORWIDTHxHEIGHT"
     :return: An SQLAlchemy filter expression
@@ -282,62 +377,25 @@ def create_resolution_aspect_comparison_filter(value: str) -> BinaryExpression:
     
     width, height = parse_resolution(resolution_value)
     
-    # Extract numbers from the stored string
-    resolution_without_brackets = func.substring(Release.resolution, 2, func.length(Release.resolution) - 2)
-    extracted_width = func.cast(func.split_part(resolution_without_brackets, ',', 1), Integer)
-    extracted_height = func.cast(func.split_part(resolution_without_brackets, ',', 2), Integer)
-    
-    # Calculate aspect ratios
-    given_aspect_ratio = width / height
-    stored_aspect_ratio = func.cast(extracted_width, Float) / func.cast(extracted_height, Float)
-    
     # Define a small tolerance for floating-point comparisons
     tolerance = 0.0001
-    
-    aspect_ratio_match = func.abs(stored_aspect_ratio - given_aspect_ratio) < tolerance
-    
-    operators = {
-        '>=': lambda w, h: and_(
-            or_(
-                extracted_width > w,
-                and_(extracted_width == w, extracted_height >= h)
-            ),
-            aspect_ratio_match
-        ),
-        '<=': lambda w, h: and_(
-            or_(
-                extracted_width < w,
-                and_(extracted_width == w, extracted_height <= h)
-            ),
-            aspect_ratio_match
-        ),
-        '>': lambda w, h: and_(
-            or_(
-                extracted_width > w,
-                and_(extracted_width == w, extracted_height > h)
-            ),
-            aspect_ratio_match
-        ),
-        '<': lambda w, h: and_(
-            or_(
-                extracted_width < w,
-                and_(extracted_width == w, extracted_height < h)
-            ),
-            aspect_ratio_match
-        ),
-        '=': lambda w, h: and_(extracted_width == w, extracted_height == h, aspect_ratio_match),
-        '!=': lambda w, h: or_(extracted_width != w, extracted_height != h, ~aspect_ratio_match)
-    }
-    
+    aspect_ratio = width / height
+    aspect_ratio_match = Release.resolution_aspect.between(aspect_ratio - tolerance, aspect_ratio + tolerance)
+    resolution = tuple_(Release.resolution_width, Release.resolution_height)
+
+    if operator == '!=':
+        return and_(
+            Release.resolution_width.isnot(None),
+            or_(resolution != tuple_(width, height), ~aspect_ratio_match)
+        )
     return and_(
-        Release.resolution.isnot(None),
-        Release.resolution != '"non-standard"',
-        operators[operator](width, height)
+        aspect_ratio_match,
+        COMPARISON_OPERATORS[operator](resolution, tuple_(width, height))
     )
 
 def create_birthday_comparison_filter(value: str) -> BinaryExpression:
     """
-    Create a filter for comparing birthdays stored as strings in the format "[MM,DD]".
+    Create a filter for comparing birthdays, ordered by month and then day.
     
     :param value: The birthday value to compare against in the format "OPERATOR MM-DD"
     :return: An SQLAlchemy filter expression
@@ -353,42 +411,18 @@ def create_birthday_comparison_filter(value: str) -> BinaryExpression:
     
     month, day = parse_birthday(birthday_value)
     
-    birthday_without_brackets = func.substring(Character.birthday, 2, func.length(Character.birthday) - 2)
-    extracted_month = func.cast(func.split_part(birthday_without_brackets, ',', 1), Integer)
-    extracted_day = func.cast(func.split_part(birthday_without_brackets, ',', 2), Integer)
-    
-    operators = {
-        '>=': lambda m, d: or_(
-            extracted_month > m,
-            and_(extracted_month == m, extracted_day >= d)
-        ),
-        '<=': lambda m, d: or_(
-            extracted_month < m,
-            and_(extracted_month == m, extracted_day <= d)
-        ),
-        '>': lambda m, d: or_(
-            extracted_month > m,
-            and_(extracted_month == m, extracted_day > d)
-        ),
-        '<': lambda m, d: or_(
-            extracted_month < m,
-            and_(extracted_month == m, extracted_day < d)
-        ),
-        '=': lambda m, d: and_(extracted_month == m, extracted_day == d),
-        '!=': lambda m, d: or_(extracted_month != m, extracted_day != d)
-    }
-    
     return and_(
-        Character.birthday.isnot(None),
-        operators[operator](month, day)
+        Character.birthday_month.isnot(None),
+        COMPARISON_OPERATORS[operator](
+            tuple_(Character.birthday_month, Character.birthday_day), tuple_(month, day)
+        )
     )
 
 def create_cup_comparison_filter(value: str) -> BinaryExpression:
     """
-    Create a filter for comparing cup sizes stored as strings.
+    Create a filter for comparing cup sizes by their position in `CUP_SIZES`.
     
     :param value: The cup size value to compare against in the format "OPERATOR SIZE"
-    :param model: The SQLAlchemy model (Character) to use for the filter
     :return: An SQLAlchemy filter expression
     """
     pattern = r'^(>=|<=|>|<|=|!=)?(.+)$'
@@ -399,46 +433,9 @@ def create_cup_comparison_filter(value: str) -> BinaryExpression:
     operator, cup_value = match.groups()
     operator = operator or '='
     
-    cup_size = parse_cup(cup_value)
-    
-    if cup_size == 'AAA':
-        operators = {
-            '>=': lambda field, size: field.isnot(None),
-            '<=': lambda field, size: field == 'AAA',
-            '>': lambda field, size: and_(field.isnot(None), field != 'AAA'),
-            '<': lambda field, size: False,  # No cup size smaller than AAA
-            '=': lambda field, size: field == 'AAA',
-            '!=': lambda field, size: field != 'AAA'
-        }
-    elif cup_size == 'AA':
-        operators = {
-            '>=': lambda field, size: and_(field.isnot(None), field != 'AAA'),
-            '<=': lambda field, size: or_(field == 'AAA', field == 'AA'),
-            '>': lambda field, size: and_(field.isnot(None), field != 'AAA', field != 'AA'),
-            '<': lambda field, size: field == 'AAA',
-            '=': lambda field, size: field == 'AA',
-            '!=': lambda field, size: field != 'AA'
-        }
-    elif cup_size == 'A':
-        operators = {
-            '>=': lambda field, size: and_(field.isnot(None), field != 'AAA', field != 'AA'),
-            '<=': lambda field, size: or_(field == 'AAA', field == 'AA', field == 'A'),
-            '>': lambda field, size: and_(field.isnot(None), field != 'AAA', field != 'AA', field != 'A'),
-            '<': lambda field, size: or_(field == 'AAA', field == 'AA'),
-            '=': lambda field, size: field == 'A',
-            '!=': lambda field, size: field != 'A'
-        }
-    else:
-        operators = {
-            '>=': lambda field, size: and_(field.isnot(None), field >= size),
-            '<=': lambda field, size: and_(field.isnot(None), field <= size),
-            '>': lambda field, size: and_(field.isnot(None), field > size),
-            '<': lambda field, size: and_(field.isnot(None), field < size),
-            '=': lambda field, size: field == size,
-            '!=': lambda field, size: field != size
-        }
+    cup_ordinal = CUP_SIZES.index(parse_cup(cup_value))
     
-    return operators[operator](Character.cup, cup_size)
+    return COMPARISON_OPERATORS[operator](Character.cup_ordinal, cup_ordinal)
 
 def create_sex_match_filter(value: str, spoil: bool = False) -> BinaryExpression:
     """
@@ -458,26 +455,19 @@ def get_vn_additional_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if release_id := params.get('release_id'):
-        filters.append(array_jsonb_exact_match(VN.releases, 'id', release_id))
+        filters.append(relation_exact_match(VN, VNRelease, release_id))
 
     if character_id := params.get('character_id'):
-        filters.append(array_jsonb_exact_match(VN.characters, 'id', character_id))
+        filters.append(relation_exact_match(VN, VNCharacter, character_id))
 
     if staff_id := params.get('staff_id'):
-        filters.append(array_jsonb_exact_match(VN.staff, 'id', staff_id))
+        filters.append(relation_exact_match(VN, VNStaff, staff_id))
 
     if developer_id := params.get('developer_id'):
-        filters.append(array_jsonb_exact_match(VN.developers, 'id', developer_id))
+        filters.append(relation_exact_match(VN, VNDeveloper, developer_id))
 
     if str(params.get('ero')).lower() == 'false' or str(params.get('ero')) == '0':
-        filters.append(and_(
-            ~exists(select(1).select_from(func.unnest(VN.tags).alias('tag')).where(text("tag->>'category' = 'ero'"))),
-            ~exists(select(1).select_from(func.unnest(VN.screenshots).alias('screenshot')).where(or_(
-                text("(screenshot->>'ero')::float > 0.5"), text("(screenshot->>'violence')::float > 0.5")
-            ))),
-            or_(VN.image.is_(None), ~VN.image.has_key('sexual'), text("(vns.image->>'sexual')::float <= 0.5")),
-            or_(VN.image.is_(None), ~VN.image.has_key('violence'), text("(vns.image->>'violence')::float <= 0.5"))
-        ))
+        filters.append(safe_content(VN, 'vn'))
 
     return filters
 
@@ -485,19 +475,13 @@ def get_release_additional_filters(params: dict[str, Any]) -> list[BinaryExpress
     filters = []
 
     if vn_id := params.get('vn_id'):
-        filters.append(array_jsonb_exact_match(Release.vns, 'id', vn_id))
+        filters.append(relation_exact_match(Release, ReleaseVN, vn_id))
 
     if producer_id := params.get('producer_id'):
-        filters.append(array_jsonb_exact_match(Release.producers, 'id', producer_id))
+        filters.append(relation_exact_match(Release, ReleaseProducer, producer_id))
 
     if str(params.get('ero')).lower() == 'false' or str(params.get('ero')) == '0':
-        filters.append(and_(
-            Release.has_ero == False,
-            ~exists(select(1).select_from(func.unnest(Release.images).alias('image')).where(or_(
-                text("(image->>'sexual')::float > 0.5"), 
-                text("(image->>'violence')::float > 0.5")
-            )))
-        ))
+        filters.append(safe_content(Release, 'release'))
 
     return filters
 
@@ -505,16 +489,10 @@ def get_character_additional_filters(params: dict[str, Any]) -> list[BinaryExpre
     filters = []
 
     if vn_id := params.get('vn_id'):
-        filters.append(array_jsonb_exact_match(Character.vns, 'id', vn_id))
+        filters.append(relation_exact_match(Character, CharacterVN, vn_id))
 
     if str(params.get('ero')).lower() == 'false' or str(params.get('ero')) == '0':
-        filters.append(and_(
-            ~exists(select(1).select_from(func.unnest(Character.traits).alias('trait')).where(or_(
-                text("trait->>'name' ILIKE '%sexual%'"), text("trait->>'group_name' ILIKE '%sexual%'")
-            ))),
-            or_(Character.image.is_(None), ~Character.image.has_key('sexual'), text("(characters.image->>'sexual')::float <= 0.5")),
-            or_(Character.image.is_(None), ~Character.image.has_key('violence'), text("(characters.image->>'violence')::float <= 0.5")),
-        ))
+        filters.append(safe_content(Character, 'character'))
 
     return filters
 
@@ -550,16 +528,15 @@ def get_vn_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : VN.id == formatId('vn', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : VN.id == formatId('vn', id),
+            lambda ids : id_any(VN, [formatId('vn', id) for id in ids])))
 
     if search := params.get('search'):
         def process_vn(vn_value):
             return or_(
                 VN.id == vn_value,
-                VN.title.ilike(f"%{vn_value}%"),
-                VN.alttitle.ilike(f"%{vn_value}%"),
-                array_string_match(VN.aliases, vn_value),
-                array_jsonb_match(VN.titles, 'title', vn_value)
+                search_text_match(VN, vn_value)
             )
         filters.append(process_multi_value_expression(search, process_vn))
 
@@ -614,21 +591,22 @@ def get_vn_filters(params: dict[str, Any]) -> list[BinaryExpression]:
         filters.append(VN.devstatus == devstatus)
 
     if tags := params.get('tag'):
-        # TODO: there is no good way to get the parent of a tag, need to wait for the official api update
-        # currently this filter works as the same as dtags
+        # Unlike dtag, a tag also matches the VNs tagged with any of its descendants
         def process_tag(tag_value):
+            if is_vndb_id(tag_value):
+                return relation_subtree_match(VN, VNTag, TagClosure, tag_value)
             return or_(
-                array_jsonb_exact_match(VN.tags, 'id', tag_value),
-                array_jsonb_match(VN.tags, 'name', tag_value)
+                array_jsonb_match(VN.tags, 'name', tag_value),
+                relation_subtree_match(VN, VNTag, TagClosure,
+                                       select(Tag.id).where(Tag.name.ilike(f"%{escape_like(tag_value)}%", escape='\\')))
             )
         filters.append(process_multi_value_expression(tags, process_tag))
 
     if dtags := params.get('dtag'):
         def process_dtag(dtag_value):
-            return or_(
-                array_jsonb_exact_match(VN.tags, 'id', dtag_value),
-                array_jsonb_match(VN.tags, 'name', dtag_value)
-            )
+            if is_vndb_id(dtag_value):
+                return RelationMatch(VN, VNTag, [dtag_value])
+            return array_jsonb_match(VN.tags, 'name', dtag_value)
         filters.append(process_multi_value_expression(dtags, process_dtag))
 
     if anime_id := params.get('anime_id'): #TODO
@@ -639,16 +617,16 @@ def get_vn_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if releases := params.get('release'):
         def process_release(release_value):
-            return or_(
-                array_jsonb_exact_match(VN.releases, 'id', release_value),
-                array_jsonb_match(VN.releases, 'title', release_value)
-            )
+            if is_vndb_id(release_value):
+                return RelationMatch(VN, VNRelease, [release_value])
+            return array_jsonb_match(VN.releases, 'title', release_value)
         filters.append(process_multi_value_expression(releases, process_release))
 
     if characters := params.get('character'):
         def process_character(char_value):
+            if is_vndb_id(char_value):
+                return RelationMatch(VN, VNCharacter, [char_value])
             return or_(
-                array_jsonb_exact_match(VN.characters, 'id', char_value),
                 array_jsonb_match(VN.characters, 'name', char_value),
                 array_jsonb_match(VN.characters, 'original', char_value)
             )
@@ -656,8 +634,9 @@ def get_vn_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if staff := params.get('staff'):
         def process_staff(staff_value):
+            if is_vndb_id(staff_value):
+                return RelationMatch(VN, VNStaff, [staff_value])
             return or_(
-                array_jsonb_exact_match(VN.staff, 'id', staff_value),
                 array_jsonb_match(VN.staff, 'name', staff_value),
                 array_jsonb_match(VN.staff, 'original', staff_value)
             )
@@ -665,8 +644,9 @@ def get_vn_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if developers := params.get('developer'):
         def process_developer(dev_value):
+            if is_vndb_id(dev_value):
+                return RelationMatch(VN, VNDeveloper, [dev_value])
             return or_(
-                array_jsonb_exact_match(VN.developers, 'id', dev_value),
                 array_jsonb_match(VN.developers, 'name', dev_value),
                 array_jsonb_match(VN.developers, 'original', dev_value)
             )
@@ -680,14 +660,15 @@ def get_release_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Release.id == formatId('release', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Release.id == formatId('release', id),
+            lambda ids : id_any(Release, [formatId('release', id) for id in ids])))
 
     if search := params.get('search'):
         def process_release(release_value):
             return or_(
                 Release.id == release_value,
-                Release.title.ilike(f"%{release_value}%"),
-                Release.alttitle.ilike(f"%{release_value}%")
+                search_text_match(Release, release_value)
             )
         filters.append(process_multi_value_expression(search, process_release))
 
@@ -778,16 +759,16 @@ def get_release_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if vns := params.get('vn'):
         def process_vn(vn_value):
-            return or_(
-                array_jsonb_exact_match(Release.vns, 'id', vn_value),
-                array_jsonb_match(Release.vns, 'title', vn_value)
-            )
+            if is_vndb_id(vn_value):
+                return RelationMatch(Release, ReleaseVN, [vn_value])
+            return array_jsonb_match(Release.vns, 'title', vn_value)
         filters.append(process_multi_value_expression(vns, process_vn))
 
     if producers := params.get('producer'):
         def process_producer(producer_value):
+            if is_vndb_id(producer_value):
+                return RelationMatch(Release, ReleaseProducer, [producer_value])
             return or_(
-                array_jsonb_exact_match(Release.producers, 'id', producer_value),
                 array_jsonb_match(Release.producers, 'name', producer_value),
                 array_jsonb_match(Release.producers, 'original', producer_value)
             )
@@ -801,15 +782,15 @@ def get_character_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Character.id == formatId('character', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Character.id == formatId('character', id),
+            lambda ids : id_any(Character, [formatId('character', id) for id in ids])))
 
     if search := params.get('search'):
         def process_character(character_value):
             return or_(
                 Character.id == character_value,
-                Character.name.ilike(f"%{character_value}%"),
-                Character.original.ilike(f"%{character_value}%"),
-                array_string_match(Character.aliases, character_value)
+                search_text_match(Character, character_value)
             )
         filters.append(process_multi_value_expression(search, process_character))
 
@@ -853,26 +834,39 @@ def get_character_filters(params: dict[str, Any]) -> list[BinaryExpression]:
         filters.append(create_comparison_filter(Character.age, age, int))
 
     if traits := params.get('trait'):
+        # Unlike dtrait, a trait also matches the characters with any of its descendants
+        def process_trait_name(trait_name, trait_group=None):
+            if is_vndb_id(trait_name):
+                return relation_subtree_match(Character, CharacterTrait, TraitClosure, trait_name)
+            ancestors = select(Trait.id).where(Trait.name.ilike(f"%{escape_like(trait_name)}%", escape='\\'))
+            if trait_group:
+                ancestors = ancestors.where(or_(
+                    Trait.group_id == trait_group,
+                    Trait.group_name.ilike(f"%{escape_like(trait_group)}%", escape='\\')
+                ))
+            return or_(
+                array_jsonb_match(Character.traits, 'name', trait_name),
+                relation_subtree_match(Character, CharacterTrait, TraitClosure, ancestors)
+            )
+
         def process_trait(trait_value):
+            if ':' not in trait_value:
+                return process_trait_name(trait_value)
             trait_group, trait_name = trait_value.split(':')
             return and_(
                 or_(
                     array_jsonb_exact_match(Character.traits, 'group_id', trait_group),
                     array_jsonb_match(Character.traits, 'group_name', trait_group)
                 ),
-                or_(
-                    array_jsonb_exact_match(Character.traits, 'id', trait_name),
-                    array_jsonb_match(Character.traits, 'name', trait_name)
-                )
+                process_trait_name(trait_name, trait_group)
             )
         filters.append(process_multi_value_expression(traits, process_trait))
 
     if dtraits := params.get('dtrait'):
         def process_dtrait(dtrait_value):
-            return or_(
-                array_jsonb_exact_match(Character.traits, 'id', dtrait_value),
-                array_jsonb_match(Character.traits, 'name', dtrait_value)
-            )
+            if is_vndb_id(dtrait_value):
+                return RelationMatch(Character, CharacterTrait, [dtrait_value])
+            return array_jsonb_match(Character.traits, 'name', dtrait_value)
         filters.append(process_multi_value_expression(dtraits, process_dtrait))
 
     if birthday := params.get('birthday'):
@@ -880,8 +874,9 @@ def get_character_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if seiyuu := params.get('seiyuu'):
         def process_seiyuu(seiyuu_value):
+            if is_vndb_id(seiyuu_value):
+                return RelationMatch(Character, CharacterSeiyuu, [seiyuu_value])
             return or_(
-                array_jsonb_exact_match(Character.seiyuu, 'id', seiyuu_value),
                 array_jsonb_match(Character.seiyuu, 'name', seiyuu_value),
                 array_jsonb_match(Character.seiyuu, 'original', seiyuu_value)
             )
@@ -889,10 +884,9 @@ def get_character_filters(params: dict[str, Any]) -> list[BinaryExpression]:
 
     if vns := params.get('vn'):
         def process_vn(vn_value):
-            return or_(
-                array_jsonb_exact_match(Character.vns, 'id', vn_value),
-                array_jsonb_match(Character.vns, 'title', vn_value)
-            )
+            if is_vndb_id(vn_value):
+                return RelationMatch(Character, CharacterVN, [vn_value])
+            return array_jsonb_match(Character.vns, 'title', vn_value)
         filters.append(process_multi_value_expression(vns, process_vn))
     
     filters.extend(get_character_additional_filters(params))
@@ -903,15 +897,15 @@ def get_producer_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Producer.id == formatId('producer', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Producer.id == formatId('producer', id),
+            lambda ids : id_any(Producer, [formatId('producer', id) for id in ids])))
 
     if search := params.get('search'):
         def process_producer(producer_value):
             return or_(
                 Producer.id == producer_value,
-                Producer.name.ilike(f"%{producer_value}%"),
-                Producer.original.ilike(f"%{producer_value}%"),
-                array_string_match(Producer.aliases, producer_value)
+                search_text_match(Producer, producer_value)
             )
         filters.append(process_multi_value_expression(search, process_producer))
     
@@ -937,7 +931,9 @@ def get_staff_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Staff.id == formatId('staff', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Staff.id == formatId('staff', id),
+            lambda ids : id_any(Staff, [formatId('staff', id) for id in ids])))
 
     if aids := params.get('aid'):
         filters.append(process_multi_value_expression(aids, lambda aid : Staff.aid == aid))
@@ -946,9 +942,7 @@ def get_staff_filters(params: dict[str, Any]) -> list[BinaryExpression]:
         def process_staff(staff_value):
             return or_(
                 Staff.id == staff_value,
-                Staff.name.ilike(f"%{staff_value}%"),
-                Staff.original.ilike(f"%{staff_value}%"),
-                array_jsonb_match(Staff.aliases, 'name', staff_value),
+                search_text_match(Staff, staff_value)
             )
         filters.append(process_multi_value_expression(search, process_staff))
 
@@ -987,14 +981,15 @@ def get_tag_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
 
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Tag.id == formatId('tag', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Tag.id == formatId('tag', id),
+            lambda ids : id_any(Tag, [formatId('tag', id) for id in ids])))
 
     if search := params.get('search'):
         def process_tag(tag_value):
             return or_(
                 Tag.id == tag_value,
-                Tag.name.ilike(f"%{tag_value}%"),
-                array_string_match(Tag.aliases, tag_value)
+                search_text_match(Tag, tag_value)
             )
         filters.append(process_multi_value_expression(search, process_tag))
 
@@ -1009,14 +1004,15 @@ def get_trait_filters(params: dict[str, Any]) -> list[BinaryExpression]:
     filters = []
     
     if ids := params.get('id'):
-        filters.append(process_multi_value_expression(ids, lambda id : Trait.id == formatId('trait', id)))
+        filters.append(process_multi_value_expression(
+            ids, lambda id : Trait.id == formatId('trait', id),
+            lambda ids : id_any(Trait, [formatId('trait', id) for id in ids])))
 
     if traits := params.get('search'):
         def process_trait(trait_value):
             return or_(
                 Trait.id == trait_value,
-                Trait.name.ilike(f"%{trait_value}%"),
-                array_string_match(Trait.aliases, trait_value)
+                search_text_match(Trait, trait_value)
             )
         filters.append(process_multi_value_expression(traits, process_trait))
     
@@ -1038,6 +1034,9 @@ def get_local_filters(search_type: str, params: dict[str, Any]) -> list[BinaryEx
     }
 
     if filter_function := filter_functions.get(search_type):
-        return filter_function(params)
+        filters = []
+        for condition in filter_function(params):
+            filters.extend(condition if isinstance(condition, Conjunction) else [condition])
+        return merge_containment_filters(filters)
     else:
         raise ValueError(f"Invalid search_type: {search_type}")
\ No newline at end of file
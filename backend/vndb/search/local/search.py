@@ -1,15 +1,75 @@
-from typing import Any
+from typing import Any, Iterator
 
-from sqlalchemy import asc, desc 
+from sqlalchemy import select
 
-from vndb.database.models import MODEL_MAP
+from vndb.database.models import MODEL_MAP, RELATION_MAP
+from vndb.database.pagination import encode_cursor, keyset_order, keyset_filter
 
 from .fields import get_local_fields, validate_sort
 from .filters import get_local_filters
+from .count import get_count_mode, with_exact_count, count_exact, count_estimate
+from .explain import get_explain_mode, explain_query
+from .facets import get_facets
+from .stats import LOCAL_SEARCH_OPTION
+
+# Rows fetched per round trip of the server-side cursor of an export
+EXPORT_BATCH_SIZE = 1000
+
+def paginate(query: Any, model: Any, fields: list[str], sort: str, reverse: bool, page: int, limit: int,
+             count: Any = True, cursor: str | None = None, explain: Any = None) -> dict[str, Any]:
+    """
+    Fetch one page of a filtered local query.
+
+    `more` is derived from fetching limit+1 rows. The total is only computed when asked
+    for: `exact` rides along as a window aggregate, `estimate` comes from the planner.
+    With `explain`, the plan of the page query is returned alongside the results.
+    """
+    count_mode = get_count_mode(count)
+    explain_mode = get_explain_mode(explain)
+
+    total = count_estimate(query) if count_mode == 'estimate' else None
+    base_query = query
+
+    # A cursor seek sits in the WHERE clause and would shrink the window, so cursor
+    # pages count the full result set separately
+    window_count = count_mode == 'exact' and not cursor
+    if count_mode == 'exact' and cursor:
+        total = count_exact(query)
+
+    query = query.add_columns(getattr(model, sort), model.id)
+    if window_count:
+        query = with_exact_count(query)
+
+    query = query.order_by(*keyset_order(model, sort, reverse))
+    if cursor:
+        query = query.filter(keyset_filter(model, sort, reverse, cursor))
+    else:
+        query = query.offset((page - 1) * limit)
+    query = query.limit(limit + 1)
+
+    plan = explain_query(query, explain_mode) if explain_mode else None
+    rows = query.all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+
+    if window_count:
+        total = rows[0][-1] if rows else count_exact(base_query)
+        rows = [row[:-1] for row in rows]
+
+    results = [dict(zip(fields, row)) for row in rows]
+    next_cursor = encode_cursor(sort, reverse, rows[-1][-2], rows[-1][-1]) if more else None
+
+    response = {'results': results, 'more': more, 'next_cursor': next_cursor}
+    if count_mode:
+        response['count'] = total
+    if explain_mode:
+        response['explain'] = plan
+    return response
 
 def search(resource_type: str, params: dict[str, Any], 
            response_size: str = 'small', page: int = 1, limit: int = 100,
-           sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
+           sort: str = 'id', reverse: bool = False, count: bool = True, cursor: str | None = None,
+           explain: str | None = None, facets: list[str] | str | None = None) -> dict[str, Any]:
 
     model = MODEL_MAP.get(resource_type)
     if not model:
@@ -18,188 +78,141 @@ def search(resource_type: str, params: dict[str, Any],
     fields = get_local_fields(resource_type, response_size)
     filters = get_local_filters(resource_type, params)
 
+    sort = validate_sort(resource_type, sort)
     query = model.query.with_entities(*[getattr(model, field) for field in fields])
     query = query.filter(model.deleted_at == None)
+    query = query.execution_options(**{LOCAL_SEARCH_OPTION: True})
 
     for filter_condition in filters:
         query = query.filter(filter_condition)
 
-    total = query.count()
-    more = (page * limit) < total
-
-    order_func = desc if reverse else asc
-    sort = validate_sort(resource_type, sort)
-    query = query.order_by(order_func(getattr(model, sort)))
-
     page = max(1, page or 1)
     limit = min(max(1, limit or 20), 100)
-    query = query.offset((page - 1) * limit).limit(limit)
-
-    # TODO:DEGUG
-    from vndb.logger import add_log_entry
-    add_log_entry(
-        level="info",
-        message=f"Search {resource_type} completed",
-        details={
-            "from": "local",
-            "query": str(query.statement.compile(compile_kwargs={"render_postcompile": True})),
-            "params": params,
-            "response_size": response_size,
-            "page": page,
-            "limit": limit,
-            "sort": sort,
-            "reverse": reverse,
-            "count": count,
-        }
-    )
-
-    results = [dict(zip(fields, result)) for result in query.all()]
-
-    return {'results': results, 'more': more, 'count': total} if count else {'results': results, 'more': more}
 
-def search_resources_by_vnid(vnid: str, related_resource_type: str, response_size: str = 'small',
-                             page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    
-    VN = MODEL_MAP['vn']
-
-    vn = VN.query.filter(VN.id == vnid, VN.deleted_at == None).first()
-    if not vn:
-        raise ValueError(f"Active VN with id {vnid} not found")
+    response = paginate(query, model, fields, sort, reverse, page, limit, count, cursor, explain)
+    if facets:
+        response['facets'] = get_facets(resource_type, query, params, facets)
+    return response
 
-    related_resource_ids = []
-    if related_resource_type == 'vn':
-        related_resource_ids = [relation['id'] for relation in vn.relations]
-    elif related_resource_type == 'tag':
-        related_resource_ids = [tag['id'] for tag in vn.tags]
-    elif related_resource_type == 'producer':
-        related_resource_ids = [dev['id'] for dev in vn.developers]
-    elif related_resource_type == 'staff':
-        related_resource_ids = [staff['id'] for staff in vn.staff]
-    elif related_resource_type == 'character':
-        related_resource_ids = [char['id'] for char in vn.characters]
-    elif related_resource_type == 'release':
-        related_resource_ids = [release['id'] for release in vn.releases]
-    else:
-        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
-    
-    if not related_resource_ids:
-        return {'results': [], 'more': False, 'count': 0} if count else {'results': [], 'more': False}
+def export(resource_type: str, params: dict[str, Any], response_size: str = 'large',
+           after_id: str | None = None, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[dict[str, Any]]:
+    """
+    Stream every local result of a search, ordered by id.
 
-    model = MODEL_MAP.get(related_resource_type)
+    Rows come from a single server-side cursor fetched `batch_size` rows at a time, so
+    memory stays constant however large the result set is. Results resume strictly
+    after `after_id`, the id of the last row a consumer received.
+    """
+    model = MODEL_MAP.get(resource_type)
     if not model:
-        raise ValueError(f"Invalid model type: {related_resource_type}")
+        raise ValueError(f"Invalid model type: {resource_type}")
 
-    fields = get_local_fields(related_resource_type, response_size)
+    fields = get_local_fields(resource_type, response_size)
     query = model.query.with_entities(*[getattr(model, field) for field in fields])
-
     query = query.filter(model.deleted_at == None)
-    query = query.filter(model.id.in_(related_resource_ids))
-
-    order_func = desc if reverse else asc
-    sort = validate_sort(related_resource_type, sort)
-    query = query.order_by(order_func(getattr(model, sort)))
-
-    page = max(1, page)
-    limit = min(max(1, limit), 100)
-    query = query.offset((page - 1) * limit).limit(limit)
-
-    results = [dict(zip(fields, result)) for result in query.all()]
-
-    total = query.count()
-    more = (page * limit) < total
-
-    return {'results': results, 'more': more, 'count': total} if count else {'results': results, 'more': more}
+    for filter_condition in get_local_filters(resource_type, params):
+        query = query.filter(filter_condition)
+    if after_id:
+        query = query.filter(model.id > after_id)
 
-def search_resources_by_charid(charid: str, related_resource_type: str, response_size: str = 'small',
-                               page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    Character = MODEL_MAP['character']
+    query = query.order_by(model.id)
+    query = query.execution_options(yield_per=max(1, batch_size), **{LOCAL_SEARCH_OPTION: True})
 
-    character = Character.query.filter(Character.id == charid, Character.deleted_at == None).first()
-    if not character:
-        raise ValueError(f"Active Character with id {charid} not found")
+    # Invalid params raise here, before the caller starts streaming a response
+    def rows() -> Iterator[dict[str, Any]]:
+        for row in query:
+            yield dict(zip(fields, row))
+    return rows()
 
-    related_resource_ids = []
-    if related_resource_type == 'vn':
-        related_resource_ids = [vn['id'] for vn in character.vns]
-    elif related_resource_type == 'trait':
-        related_resource_ids = [trait['id'] for trait in character.traits]
-    else:
-        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
-    
-    if not related_resource_ids:
-        return {'results': [], 'more': False, 'count': 0} if count else {'results': [], 'more': False}
-
-    model = MODEL_MAP.get(related_resource_type)
-    if not model:
-        raise ValueError(f"Invalid model type: {related_resource_type}")
+def _search_related_resources(model: Any, related_resource_type: str, related_ids: Any, response_size: str = 'small',
+                              page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                              cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
 
     fields = get_local_fields(related_resource_type, response_size)
+    sort = validate_sort(related_resource_type, sort)
     query = model.query.with_entities(*[getattr(model, field) for field in fields])
 
     query = query.filter(model.deleted_at == None)
-    query = query.filter(model.id.in_(related_resource_ids))
-
-    order_func = desc if reverse else asc
-    sort = validate_sort(related_resource_type, sort)
-    query = query.order_by(order_func(getattr(model, sort)))
+    query = query.filter(model.id.in_(related_ids))
+    query = query.execution_options(**{LOCAL_SEARCH_OPTION: True})
 
     page = max(1, page)
     limit = min(max(1, limit), 100)
-    query = query.offset((page - 1) * limit).limit(limit)
-
-    results = [dict(zip(fields, result)) for result in query.all()]
 
-    total = query.count()
-    more = (page * limit) < total
+    return paginate(query, model, fields, sort, reverse, page, limit, count, cursor, explain)
 
-    return {'results': results, 'more': more, 'count': total} if count else {'results': results, 'more': more}
-
-def search_resources_by_release_id(release_id: str, related_resource_type: str, response_size: str = 'small',
-                                   page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    Release = MODEL_MAP['release']
-
-    release = Release.query.filter(Release.id == release_id, Release.deleted_at == None).first()
-    if not release:
-        raise ValueError(f"Active Release with id {release_id} not found")
-
-    related_resource_ids = []
-    if related_resource_type == 'vn':
-        related_resource_ids = [vn['id'] for vn in release.vns]
-    elif related_resource_type == 'producer':
-        related_resource_ids = [producer['id'] for producer in release.producers]
-    else:
-        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
-    
-    if not related_resource_ids:
-        return {'results': [], 'more': False, 'count': 0} if count else {'results': [], 'more': False}
+def _search_resources_by_owner_id(owner_type: str, owner_id: str, related_resource_type: str, relation_name: str,
+                                  **kwargs) -> dict[str, Any]:
+    owner_model = MODEL_MAP[owner_type]
+    if not owner_model.query.filter(owner_model.id == owner_id, owner_model.deleted_at == None).first():
+        raise ValueError(f"Active {owner_model.__name__} with id {owner_id} not found")
 
     model = MODEL_MAP.get(related_resource_type)
     if not model:
         raise ValueError(f"Invalid model type: {related_resource_type}")
 
-    fields = get_local_fields(related_resource_type, response_size)
-    query = model.query.with_entities(*[getattr(model, field) for field in fields])
+    relation_model = RELATION_MAP[owner_type][relation_name]
+    related_ids = select(relation_model.related_id).where(relation_model.owner_id == owner_id)
 
-    query = query.filter(model.deleted_at == None)
-    query = query.filter(model.id.in_(related_resource_ids))
+    return _search_related_resources(model, related_resource_type, related_ids, **kwargs)
 
-    order_func = desc if reverse else asc
-    sort = validate_sort(related_resource_type, sort)
-    query = query.order_by(order_func(getattr(model, sort)))
+def search_resources_by_vnid(vnid: str, related_resource_type: str, response_size: str = 'small',
+                             page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                             cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
+    kwargs = dict(response_size=response_size, page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor,
+                  explain=explain)
 
-    page = max(1, page)
-    limit = min(max(1, limit), 100)
-    query = query.offset((page - 1) * limit).limit(limit)
+    if related_resource_type == 'vn':
+        VN = MODEL_MAP['vn']
+        vn = VN.query.with_entities(VN.relations).filter(VN.id == vnid, VN.deleted_at == None).first()
+        if not vn:
+            raise ValueError(f"Active VN with id {vnid} not found")
+        related_ids = [relation['id'] for relation in vn.relations or []]
+        return _search_related_resources(VN, 'vn', related_ids, **kwargs)
+
+    relation_name = {
+        'tag': 'tags',
+        'producer': 'developers',
+        'staff': 'staff',
+        'character': 'characters',
+        'release': 'releases'
+    }.get(related_resource_type)
+    if relation_name is None:
+        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
 
-    results = [dict(zip(fields, result)) for result in query.all()]
+    return _search_resources_by_owner_id('vn', vnid, related_resource_type, relation_name, **kwargs)
 
-    total = query.count()
-    more = (page * limit) < total
+def search_resources_by_charid(charid: str, related_resource_type: str, response_size: str = 'small',
+                               page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                               cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
+    relation_name = {
+        'vn': 'vns',
+        'trait': 'traits'
+    }.get(related_resource_type)
+    if relation_name is None:
+        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
 
-    return {'results': results, 'more': more, 'count': total} if count else {'results': results, 'more': more}
+    return _search_resources_by_owner_id('character', charid, related_resource_type, relation_name,
+                                         response_size=response_size, page=page, limit=limit,
+                                         sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain)
+
+def search_resources_by_release_id(release_id: str, related_resource_type: str, response_size: str = 'small',
+                                   page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                                   cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
+    relation_name = {
+        'vn': 'vns',
+        'producer': 'producers'
+    }.get(related_resource_type)
+    if relation_name is None:
+        raise ValueError(f"Invalid related_resource_type: {related_resource_type}")
+
+    return _search_resources_by_owner_id('release', release_id, related_resource_type, relation_name,
+                                         response_size=response_size, page=page, limit=limit,
+                                         sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain)
 
 def search_vns_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small',
-                              page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
+                              page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                              cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
     params = {{
         'tag': 'tag',
         'character': 'character',
@@ -209,33 +222,35 @@ def search_vns_by_resource_id(resource_type: str, resource_id: str, response_siz
     }.get(resource_type) : resource_id}
 
     results = search(resource_type='vn', params=params, response_size=response_size, 
-                     page=page, limit=limit, sort=sort, reverse=reverse, count=count)
+                     page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain)
 
     return results
 
 def search_characters_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small',
-                                     page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
+                                     page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                                     cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
     params = {{
         'vn': 'vn',
         'trait': 'trait'
     }.get(resource_type) : resource_id}
 
     results = search(resource_type='character', params=params, response_size=response_size, 
-                     page=page, limit=limit, sort=sort, reverse=reverse, count=count)
+                     page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain)
 
     return results
 
 def search_releases_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small',
-                                   page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    params = {{
-        'vn': 'vn',
-        'producer': 'producer'
-    }.get(resource_type) : resource_id}
-
-    if params is None:
+                                   page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                                   cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
+    param = {
+        'vn': 'vn_id',
+        'producer': 'producer_id'
+    }.get(resource_type)
+
+    if param is None:
         raise ValueError(f"Invalid resource_type: {resource_type}")
 
-    results = search(resource_type='release', params={params: resource_id}, response_size=response_size, 
-                     page=page, limit=limit, sort=sort, reverse=reverse, count=count)
+    results = search(resource_type='release', params={param: resource_id}, response_size=response_size, 
+                     page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain)
 
     return results
\ No newline at end of file
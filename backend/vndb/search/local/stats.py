@@ -0,0 +1,174 @@
+import hashlib
+import random
+import re
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from typing import Any
+
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Execution option marking the statements issued by the local search
+LOCAL_SEARCH_OPTION = 'local_search'
+
+# Defaults of the slow-query journal, overridable through the app config
+SLOW_QUERY_THRESHOLD_MS = 200.0
+SLOW_QUERY_SAMPLE_RATE = 1.0
+SLOW_QUERY_JOURNAL_SIZE = 200
+
+# Bounds of the per-fingerprint statistics
+MAX_FINGERPRINTS = 1000
+LATENCY_SAMPLES = 500
+
+_cache_stats = Counter()
+
+_journal_lock = threading.Lock()
+_fingerprints: dict[str, dict[str, Any]] = {}
+_slow_queries: deque = deque(maxlen=SLOW_QUERY_JOURNAL_SIZE)
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _record_compiled_cache(conn, cursor, statement, parameters, context, executemany) -> None:
+    if context is None or not context.execution_options.get(LOCAL_SEARCH_OPTION):
+        return
+    if context.cache_hit is context.CACHE_HIT:
+        _cache_stats['hits'] += 1
+    elif context.cache_hit is context.CACHE_MISS:
+        _cache_stats['misses'] += 1
+    else:
+        _cache_stats['uncached'] += 1
+    context.local_search_started = time.perf_counter()
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _record_latency(conn, cursor, statement, parameters, context, executemany) -> None:
+    started = getattr(context, 'local_search_started', None)
+    if started is None:
+        return
+    record_statement(statement, parameters, (time.perf_counter() - started) * 1000)
+
+def get_cache_stats() -> dict[str, Any]:
+    """
+    Compiled-statement cache counters of the local search in this process.
+
+    A miss means SQLAlchemy compiled a statement shape it had not seen before;
+    `uncached` counts statements that cannot be cached at all (e.g. raw SQL).
+    """
+    hits, misses = _cache_stats['hits'], _cache_stats['misses']
+    return {
+        'hits': hits,
+        'misses': misses,
+        'uncached': _cache_stats['uncached'],
+        'hit_rate': hits / (hits + misses) if hits + misses else None,
+    }
+
+def reset_cache_stats() -> None:
+    _cache_stats.clear()
+
+def get_journal_config(key: str, default: Any) -> Any:
+    if has_app_context():
+        return type(default)(current_app.config.get(key, default))
+    return default
+
+def normalize_statement(statement: str) -> str:
+    """
+    Reduce a statement to its shape: bind parameters and literals become `?`,
+    expanded IN lists collapse to `(?)` and whitespace is squeezed.
+    """
+    normalized = re.sub(r"%\(\w+\)s|'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b", '?', statement)
+    normalized = re.sub(r'\(\?(?:\s*,\s*\?)+\)', '(?)', normalized)
+    return re.sub(r'\s+', ' ', normalized).strip()
+
+def fingerprint_statement(normalized: str) -> str:
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()[:16]
+
+def percentile(sorted_values: list[float], fraction: float) -> float | None:
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+def record_statement(statement: str, parameters: Any, duration_ms: float) -> None:
+    """
+    Account one executed local search statement.
+
+    Every statement feeds the call count and latency samples of its fingerprint;
+    statements over the threshold are also sampled into the slow-query ring buffer.
+    """
+    global _slow_queries
+
+    threshold = get_journal_config('SLOW_QUERY_THRESHOLD_MS', SLOW_QUERY_THRESHOLD_MS)
+    sample_rate = get_journal_config('SLOW_QUERY_SAMPLE_RATE', SLOW_QUERY_SAMPLE_RATE)
+    journal_size = get_journal_config('SLOW_QUERY_JOURNAL_SIZE', SLOW_QUERY_JOURNAL_SIZE)
+
+    normalized = normalize_statement(statement)
+    fingerprint = fingerprint_statement(normalized)
+    slow = duration_ms >= threshold
+
+    with _journal_lock:
+        stats = _fingerprints.get(fingerprint)
+        if stats is None:
+            if len(_fingerprints) >= MAX_FINGERPRINTS:
+                return
+            stats = _fingerprints[fingerprint] = {
+                'statement': normalized,
+                'calls': 0,
+                'slow_calls': 0,
+                'total_ms': 0.0,
+                'max_ms': 0.0,
+                'latencies': deque(maxlen=LATENCY_SAMPLES),
+            }
+        stats['calls'] += 1
+        stats['total_ms'] += duration_ms
+        stats['max_ms'] = max(stats['max_ms'], duration_ms)
+        stats['latencies'].append(duration_ms)
+
+        if not slow:
+            return
+        stats['slow_calls'] += 1
+        if random.random() >= sample_rate:
+            return
+        if _slow_queries.maxlen != journal_size:
+            _slow_queries = deque(_slow_queries, maxlen=journal_size)
+        _slow_queries.append({
+            'fingerprint': fingerprint,
+            'duration_ms': round(duration_ms, 3),
+            'executed_at': datetime.now(timezone.utc).isoformat(),
+            'parameters': parameters if isinstance(parameters, dict) else None,
+        })
+
+def get_slow_query_journal() -> dict[str, Any]:
+    """
+    The slow-query journal of the local search in this process.
+
+    `fingerprints` lists every statement shape seen, slowest p95 first; `recent` holds
+    the latest sampled executions over the threshold, newest first.
+    """
+    with _journal_lock:
+        fingerprints = []
+        for fingerprint, stats in _fingerprints.items():
+            latencies = sorted(stats['latencies'])
+            fingerprints.append({
+                'fingerprint': fingerprint,
+                'statement': stats['statement'],
+                'calls': stats['calls'],
+                'slow_calls': stats['slow_calls'],
+                'mean_ms': stats['total_ms'] / stats['calls'],
+                'p50_ms': percentile(latencies, 0.50),
+                'p95_ms': percentile(latencies, 0.95),
+                'max_ms': stats['max_ms'],
+            })
+        recent = list(reversed(_slow_queries))
+
+    fingerprints.sort(key=lambda item: item['p95_ms'] or 0, reverse=True)
+    return {
+        'threshold_ms': get_journal_config('SLOW_QUERY_THRESHOLD_MS', SLOW_QUERY_THRESHOLD_MS),
+        'sample_rate': get_journal_config('SLOW_QUERY_SAMPLE_RATE', SLOW_QUERY_SAMPLE_RATE),
+        'fingerprints': fingerprints,
+        'recent': recent,
+    }
+
+def reset_slow_query_journal() -> None:
+    with _journal_lock:
+        _fingerprints.clear()
+        _slow_queries.clear()
@@ -1,7 +1,13 @@
+from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+from typing import Any, Callable
 import re
 
 
+EXPRESSION_CACHE_SIZE = 1024
+
+
 class TokenizeError(Exception):
     def __init__(self, message: str, position: int):
         self.message = message
@@ -29,6 +35,27 @@ class Token:
         self.value = value
         self.position = position
 
+
+@dataclass(frozen=True)
+class Term:
+    """A single value of the expression."""
+    value: str
+
+@dataclass(frozen=True)
+class TermSet:
+    """Plain values OR-ed together, folded so a backend can test them in one predicate."""
+    values: tuple[str, ...]
+
+@dataclass(frozen=True)
+class And:
+    children: tuple['Node', ...]
+
+@dataclass(frozen=True)
+class Or:
+    children: tuple['Node', ...]
+
+Node = Term | TermSet | And | Or
+
 class Parser:
     def __init__(self, tokens: list[Token]):
         self.tokens = tokens
@@ -89,6 +116,53 @@ class Parser:
         except ParserError:
             return False
 
+    def parse_expression(self) -> Node:
+        """
+        Parse the expression into a syntax tree, following the grammar of `validate_expression`.
+
+        Raises:
+            ParserError: If the expression is invalid
+        """
+        node = self._parse_expression()
+        if not self.check(TokenType.EOF):
+            raise ParserError(
+                f"Unexpected token after expression: {self.current_token.type.value}",
+                self.current_token.position
+            )
+        return node
+
+    def _parse_expression(self) -> Node:
+        """Parse an expression (OR level)."""
+        children = [self._parse_term()]
+        while self.check(TokenType.OR):
+            self.match(TokenType.OR)
+            children.append(self._parse_term())
+        return children[0] if len(children) == 1 else Or(tuple(children))
+
+    def _parse_term(self) -> Node:
+        """Parse a term (AND level)."""
+        children = [self._parse_factor()]
+        while self.check(TokenType.AND):
+            self.match(TokenType.AND)
+            children.append(self._parse_factor())
+        return children[0] if len(children) == 1 else And(tuple(children))
+
+    def _parse_factor(self) -> Node:
+        """Parse a factor (parenthesized expression or term)."""
+        if self.check(TokenType.LPAREN):
+            self.match(TokenType.LPAREN)
+            node = self._parse_expression()
+            self.match(TokenType.RPAREN)
+            return node
+        if self.check(TokenType.TERM):
+            value = self.current_token.value.strip()
+            self.match(TokenType.TERM)
+            return Term(value)
+        raise ParserError(
+            f"Unexpected token: {self.current_token.type.value}",
+            self.current_token.position
+        )
+
     def _validate_expression(self) -> None:
         """Validate an expression (OR level)."""
         self._validate_term()
@@ -207,6 +281,80 @@ def validate_logical_expression(expression: str) -> bool:
     except ParserError:
         return False
 
+def normalize_tree(node: Node) -> Node:
+    """
+    Normalize a syntax tree bottom-up.
+
+    Nested AND/OR nodes of the same kind are flattened, repeated children are dropped
+    and the plain values of an OR are folded into a single `TermSet`, so that e.g.
+    `a,(b,a),c+d` becomes `Or(TermSet(a, b), And(c, d))`.
+    """
+    if isinstance(node, (Term, TermSet)):
+        return node
+
+    kind = type(node)
+    children = []
+    for child in map(normalize_tree, node.children):
+        if isinstance(child, kind):
+            children.extend(child.children)
+        elif kind is Or and isinstance(child, TermSet):
+            children.extend(Term(value) for value in child.values)
+        else:
+            children.append(child)
+    children = list(dict.fromkeys(children))
+
+    if kind is Or:
+        values = tuple(child.value for child in children if isinstance(child, Term))
+        if len(values) > 1:
+            children = [TermSet(values)] + [child for child in children if not isinstance(child, Term)]
+
+    return children[0] if len(children) == 1 else kind(tuple(children))
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def parse_expression(expression: str) -> Node:
+    """
+    Parse and normalize a logical expression.
+
+    Trees are immutable, so parsed expressions are kept in a bounded LRU cache and
+    shared between every caller that compiles them.
+
+    Raises:
+        ValueError: If the expression is invalid
+    """
+    try:
+        return normalize_tree(Parser(tokenize(normalize_expression(expression))).parse_expression())
+    except (TokenizeError, ParserError):
+        raise ValueError(f"Invalid expression: {expression}") from None
+
+def map_terms(node: Node, mapper: Callable[[str], Node]) -> Node:
+    """Replace every value of a tree with the tree returned by `mapper`, then normalize."""
+    def replace(node: Node) -> Node:
+        if isinstance(node, Term):
+            return mapper(node.value)
+        if isinstance(node, TermSet):
+            return Or(tuple(mapper(value) for value in node.values))
+        return type(node)(tuple(map(replace, node.children)))
+    return normalize_tree(replace(node))
+
+def compile_tree(node: Node, term: Callable[[str], Any], terms: Callable[[list[str]], Any],
+                 conjunction: Callable[[list[Any]], Any], disjunction: Callable[[list[Any]], Any]) -> Any:
+    """
+    Compile a tree into a backend specific filter.
+
+    Args:
+        node: The tree to compile
+        term: Builds the filter of a single value
+        terms: Builds the filter of a folded set of OR-ed values
+        conjunction: Combines the filters of an AND
+        disjunction: Combines the filters of an OR
+    """
+    if isinstance(node, Term):
+        return term(node.value)
+    if isinstance(node, TermSet):
+        return terms(list(node.values))
+    children = [compile_tree(child, term, terms, conjunction, disjunction) for child in node.children]
+    return conjunction(children) if isinstance(node, And) else disjunction(children)
+
 
 if __name__ == "__main__":
     # Test cases
@@ -228,5 +376,7 @@ if __name__ == "__main__":
         try:
             is_valid = validate_logical_expression(expr)
             print(f"Valid: {is_valid}")
+            if is_valid:
+                print(f"Tree: {parse_expression(expr)}")
         except Exception as e:
             print(f"Error: {e}")
@@ -0,0 +1,181 @@
+import asyncio
+import hashlib
+import json
+import os
+import threading
+from importlib.util import find_spec
+from typing import Any, Awaitable, Callable, TypeVar
+
+import httpx
+from flask import current_app, has_app_context
+
+from .coalesce import REMOTE_COALESCE_TIMEOUT, SingleFlight, payload_key
+from .limiter import (
+    REMOTE_RATE_LIMIT, REMOTE_RATE_PERIOD, REMOTE_RATE_BURST, REMOTE_BACKGROUND_RESERVE, REMOTE_MAX_RETRIES,
+    RateLimiter, get_priority, remote_priority, retry_after
+)
+
+VNDB_API_URL = "https://api.vndb.org/kana"
+
+# Defaults of the remote client, overridable through the app config
+REMOTE_CONCURRENCY = 8
+REMOTE_MAX_CONNECTIONS = 16
+REMOTE_TIMEOUT = 30.0
+REMOTE_CACHE_TIMEOUT = 3600
+
+# HTTP/2 needs the optional `h2` package (httpx[http2]); without it the pool speaks HTTP/1.1
+HTTP2 = find_spec('h2') is not None
+
+T = TypeVar('T')
+
+def get_remote_config(key: str, default: Any) -> Any:
+    if has_app_context():
+        value = current_app.config.get(key, default)
+        return value if default is None or value is None else type(default)(value)
+    return default
+
+class AsyncVNDBClient:
+    """
+    One pooled connection to the VNDB API shared by every remote search of the process.
+
+    At most `concurrency` requests are in flight at once, however many coroutines are
+    waiting on the client, and each request first takes a token from the shared `limiter`.
+    Identical requests in flight at the same time are sent only once (`single_flight`).
+    """
+
+    def __init__(self, concurrency: int = REMOTE_CONCURRENCY, max_connections: int = REMOTE_MAX_CONNECTIONS,
+                 timeout: float = REMOTE_TIMEOUT, api_token: str | None = None, limiter: RateLimiter | None = None,
+                 single_flight: SingleFlight | None = None):
+        headers = {"Content-Type": "application/json"}
+        if api_token:
+            headers["Authorization"] = f"Token {api_token}"
+        self.client = httpx.AsyncClient(
+            http2=HTTP2, headers=headers, timeout=timeout,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        )
+        self.semaphore = asyncio.Semaphore(max(1, concurrency))
+        self.limiter = limiter or RateLimiter(None)
+        self.single_flight = single_flight or SingleFlight(None)
+
+    async def post(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        return await self.single_flight.do(payload_key(path, payload), lambda: self.send(path, payload))
+
+    async def send(self, path: str, payload: dict[str, Any]) -> dict[str, Any]:
+        for attempt in range(REMOTE_MAX_RETRIES):
+            await self.limiter.acquire_async()
+            async with self.semaphore:
+                response = await self.client.post(f"{VNDB_API_URL}/{path}", json=payload)
+            if response.status_code != 429 or attempt == REMOTE_MAX_RETRIES - 1:
+                break
+            # Hold back every process, not only this request
+            await self.limiter.block_async(retry_after(response))
+        response.raise_for_status()
+        return response.json()
+
+    async def query(self, path: str, filters: list, fields: list[str] | str,
+                    sort: str = "id", reverse: bool = False, results: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
+        payload = {
+            "filters": filters,
+            "fields": fields if isinstance(fields, str) else ",".join(fields),
+            "sort": sort,
+            "reverse": reverse,
+            "results": results,
+            "page": page,
+            "count": count
+        }
+        return await self.post(path, payload)
+
+    async def query_all(self, path: str, filters: list, fields: list[str] | str, **kwargs) -> list[dict[str, Any]]:
+        """Every page of a query. Pages depend on `more`, so they are fetched one after another."""
+        kwargs.setdefault('results', 100)
+        kwargs['count'] = False
+        results = []
+        page = 1
+        more = True
+        while more:
+            response = await self.query(path, filters, fields, page=page, **kwargs)
+            results.extend(response.get('results', []))
+            more = response.get('more', False)
+            page += 1
+        return results
+
+    async def cached(self, key: str, factory: Callable[[], Awaitable[T]], timeout: int = REMOTE_CACHE_TIMEOUT) -> T:
+        """Memoize a request in the app cache; cache calls run off the loop so they do not stall other requests."""
+        try:
+            from vndb import cache
+        except ImportError:
+            return await factory()
+
+        key = f"remote:{key}"
+        result = await asyncio.to_thread(cache.get, key)
+        if result is None:
+            result = await factory()
+            await asyncio.to_thread(cache.set, key, result, timeout=timeout)
+        return result
+
+    async def cached_query_all(self, path: str, filters: list, fields: list[str] | str, **kwargs) -> list[dict[str, Any]]:
+        digest = hashlib.md5(json.dumps([path, filters, fields, kwargs], sort_keys=True).encode('utf-8')).hexdigest()
+        return await self.cached(digest, lambda: self.query_all(path, filters, fields, **kwargs))
+
+# The client and its connections belong to a single event loop, run by a daemon thread so
+# that synchronous callers (Flask views, Celery tasks) all share it
+_lock = threading.Lock()
+_loop: asyncio.AbstractEventLoop | None = None
+_client: AsyncVNDBClient | None = None
+_pid: int | None = None
+
+def _start_loop() -> asyncio.AbstractEventLoop:
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='vndb-remote-loop', daemon=True).start()
+    return loop
+
+def get_client() -> tuple[AsyncVNDBClient, asyncio.AbstractEventLoop]:
+    """The shared client and the loop it runs on, created on first use in each process."""
+    global _loop, _client, _pid
+    with _lock:
+        # Forked workers inherit the parent's objects but not its loop thread
+        if _client is None or _pid != os.getpid():
+            _loop = _start_loop()
+            concurrency = get_remote_config('REMOTE_CONCURRENCY', REMOTE_CONCURRENCY)
+            max_connections = get_remote_config('REMOTE_MAX_CONNECTIONS', REMOTE_MAX_CONNECTIONS)
+            timeout = get_remote_config('REMOTE_TIMEOUT', REMOTE_TIMEOUT)
+            redis_url = get_remote_config('REMOTE_RATE_LIMIT_REDIS_URL', None) or get_remote_config('CACHE_REDIS_URL', None)
+            limiter = RateLimiter(
+                redis_url,
+                limit=get_remote_config('REMOTE_RATE_LIMIT', REMOTE_RATE_LIMIT),
+                period=get_remote_config('REMOTE_RATE_PERIOD', REMOTE_RATE_PERIOD),
+                burst=get_remote_config('REMOTE_RATE_BURST', REMOTE_RATE_BURST),
+                background_reserve=get_remote_config('REMOTE_BACKGROUND_RESERVE', REMOTE_BACKGROUND_RESERVE),
+            )
+            single_flight = SingleFlight(redis_url, get_remote_config('REMOTE_COALESCE_TIMEOUT', REMOTE_COALESCE_TIMEOUT))
+
+            async def create() -> AsyncVNDBClient:
+                return AsyncVNDBClient(concurrency, max_connections, timeout, limiter=limiter, single_flight=single_flight)
+            _client = asyncio.run_coroutine_threadsafe(create(), _loop).result()
+            _pid = os.getpid()
+        return _client, _loop
+
+def get_limiter() -> RateLimiter:
+    return get_client()[0].limiter
+
+def run_sync(function: Callable[[AsyncVNDBClient], Awaitable[T]]) -> T:
+    """
+    Run `function(client)` on the shared loop and wait for its result.
+
+    The caller's app context and remote priority are carried over to the coroutine,
+    so the cache, the config and the right rate-limit class apply to the tasks it spawns.
+    """
+    if threading.current_thread().name == 'vndb-remote-loop':
+        raise RuntimeError("run_sync cannot be called from a coroutine of the remote client, await it instead")
+    client, loop = get_client()
+    app = current_app._get_current_object() if has_app_context() else None
+    priority = get_priority()
+
+    async def run() -> T:
+        with remote_priority(priority):
+            if app is None:
+                return await function(client)
+            with app.app_context():
+                return await function(client)
+
+    return asyncio.run_coroutine_threadsafe(run(), loop).result()
@@ -0,0 +1,153 @@
+import asyncio
+import copy
+import hashlib
+import json
+import time
+import uuid
+from collections import Counter
+from typing import Any, Awaitable, Callable
+
+import redis
+import redis.asyncio
+
+# Longest a caller waits for another process to fetch the same payload before fetching it itself
+REMOTE_COALESCE_TIMEOUT = 30.0
+
+FLIGHT_PREFIX = 'vndb:remote:flight'
+
+# Deletes the lock only if this caller still holds it
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_stats = Counter()
+
+def payload_key(path: str, payload: dict[str, Any]) -> str:
+    """Requests for the same endpoint and payload share a key, whatever the order of the payload keys."""
+    normalized = json.dumps([path, payload], sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.md5(normalized.encode('utf-8')).hexdigest()
+
+def get_coalesce_stats() -> dict[str, int]:
+    """
+    Single-flight counters of this process: `fetched` requests went to the API, `local`
+    and `remote` were answered by an identical request of this or another process, and
+    `timeouts` fetched themselves after the other process timed out or failed.
+    """
+    return {name: _stats[name] for name in ('fetched', 'local', 'remote', 'timeouts')}
+
+def reset_coalesce_stats() -> None:
+    _stats.clear()
+
+class SingleFlight:
+    """
+    Coalesces identical in-flight requests.
+
+    Within the process, callers of a key that is already being fetched await the same
+    future. Across processes, the first caller takes a Redis lock, fetches, stores the
+    result briefly and notifies the waiters on a channel; the others wait up to `timeout`
+    for it and fetch on their own if it never comes. Redis is used through its asyncio
+    client, so waiting followers hold no thread.
+    """
+
+    def __init__(self, redis_url: str | None, timeout: float = REMOTE_COALESCE_TIMEOUT):
+        self.timeout = max(0.0, timeout)
+        self.inflight: dict[str, asyncio.Future] = {}
+        self.followers: Counter = Counter()
+        self.redis = redis.asyncio.Redis.from_url(redis_url, socket_timeout=self.timeout + 5, socket_connect_timeout=1) \
+            if redis_url else None
+        self.release_script = self.redis.register_script(RELEASE_SCRIPT) if self.redis else None
+
+    async def do(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        future = self.inflight.get(key)
+        if future is not None:
+            _stats['local'] += 1
+            self.followers[key] += 1
+            # Results are mutated by their callers (enrichment), so followers get their own copy
+            return copy.deepcopy(await asyncio.shield(future))
+
+        future = asyncio.get_running_loop().create_future()
+        self.inflight[key] = future
+        try:
+            result = await self.fetch_shared(key, fetch)
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieve it so a flight without followers does not log an unretrieved exception
+            future.exception()
+            raise
+        else:
+            future.set_result(copy.deepcopy(result) if self.followers[key] else result)
+            return result
+        finally:
+            del self.inflight[key]
+            del self.followers[key]
+
+    async def fetch_shared(self, key: str, fetch: Callable[[], Awaitable[Any]]) -> Any:
+        if self.redis is None or not self.timeout:
+            _stats['fetched'] += 1
+            return await fetch()
+
+        lock_key, result_key, channel = (f"{FLIGHT_PREFIX}:{part}:{key}" for part in ('lock', 'result', 'done'))
+        token = uuid.uuid4().hex
+        try:
+            leader = await self.redis.set(lock_key, token, nx=True, px=int(self.timeout * 1000))
+        except redis.RedisError:
+            leader = True
+            token = None
+
+        if not leader:
+            found, result = await self.wait(lock_key, result_key, channel)
+            if found:
+                _stats['remote'] += 1
+                return result
+            _stats['timeouts'] += 1
+
+        _stats['fetched'] += 1
+        if not leader or token is None:
+            return await fetch()
+
+        try:
+            result = await fetch()
+            await self.share(result_key, result)
+            return result
+        finally:
+            await self.release(lock_key, token, channel)
+
+    async def share(self, result_key: str, result: Any) -> None:
+        try:
+            await self.redis.set(result_key, json.dumps(result), px=int(self.timeout * 1000))
+        except redis.RedisError:
+            pass
+
+    async def release(self, lock_key: str, token: str, channel: str) -> None:
+        try:
+            await self.release_script(keys=[lock_key], args=[token])
+            await self.redis.publish(channel, '1')
+        except redis.RedisError:
+            pass
+
+    async def wait(self, lock_key: str, result_key: str, channel: str) -> tuple[bool, Any]:
+        """Wait until the leader publishes a result, gives up, or `timeout` passes."""
+        deadline = time.monotonic() + self.timeout
+        try:
+            pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                # Subscribe before checking, so a notification sent in between is not missed
+                await pubsub.subscribe(channel)
+                while True:
+                    result = await self.redis.get(result_key)
+                    if result is not None:
+                        return True, json.loads(result)
+                    # The leader released its lock without a result: it failed
+                    if not await self.redis.exists(lock_key):
+                        return False, None
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False, None
+                    await pubsub.get_message(timeout=min(remaining, 1.0))
+            finally:
+                await pubsub.aclose()
+        except redis.RedisError:
+            return False, None
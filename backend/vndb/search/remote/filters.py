@@ -2,7 +2,8 @@ import re
 import httpx
 from typing import Any 
 from enum import Enum, auto
-from ..parse import validate_logical_expression
+from ..parse import Node, Term, TermSet, parse_expression, map_terms, compile_tree
+from .client import run_sync
 
 
 class FilterType(Enum):
@@ -216,191 +217,100 @@ def build_filters(filter_set: dict[str, VNDBFilter], filters: dict[str, Any]) ->
     return [] if not result else result[0] if len(result) == 1 else ["and"] + result
 
 
+def compile_logical_expression(node: Node, field: str) -> dict[str, Any]:
+    """
+    Compile a parsed expression into the `{"and": [...]}` / `{"or": [...]}` / `{field: value}`
+    form consumed by `build_filters`. OR-ed values end up in one flat "or" list.
+    """
+    def disjunction(filters: list[dict[str, Any]]) -> dict[str, Any]:
+        flat = []
+        for item in filters:
+            flat.extend(item["or"] if list(item) == ["or"] else [item])
+        return {"or": flat}
+
+    return compile_tree(
+        node,
+        term=lambda value: {field: value},
+        terms=lambda values: {"or": [{field: value} for value in values]},
+        conjunction=lambda filters: {"and": filters},
+        disjunction=disjunction
+    )
+
 def parse_logical_expression(expression: str, field: str) -> dict[str, Any]:
     """
-    Parse logical expression using two stacks.
+    Parse a logical expression into filters on `field`.
     Operators: OR (',', lower precedence) and AND ('+', higher precedence)
     """
-    if not validate_logical_expression(expression):
-        raise ValueError(f"Invalid expression: {expression}")
-
-    def or_operation(left: dict[str, Any], right: dict[str, Any]) -> dict[str, Any]:
-        """Merge OR operations"""
-        if isinstance(left, dict) and "or" in left:
-            if isinstance(right, dict) and "or" in right:
-                return {"or": left["or"] + right["or"]}
-            left["or"].append(right)
-            return left
-        elif isinstance(right, dict) and "or" in right:
-            right["or"].insert(0, left)
-            return right
-        return {"or": [left, right]}
-
-    def and_operation(left: dict[str, Any], right: dict[str, Any]) -> dict[str, Any]:
-        """Merge AND operations"""
-        if isinstance(left, dict) and "and" in left:
-            if isinstance(right, dict) and "and" in right:
-                return {"and": left["and"] + right["and"]}
-            left["and"].append(right)
-            return left
-        elif isinstance(right, dict) and "and" in right:
-            right["and"].insert(0, left)
-            return right
-        return {"and": [left, right]}
-
-    def evaluate(ops: list, vals: list) -> None:
-        if len(ops) > 0 and len(vals) >= 2:
-            op = ops.pop()
-            right = vals.pop()
-            left = vals.pop()
-            
-            if op == "or":
-                vals.append(or_operation(left, right))
-            elif op == "and":
-                vals.append(and_operation(left, right))
-
-    ops = []
-    vals = []
-    current = ""
-    
-    for char in expression:
-        if char == '(':
-            ops.append(char)
-        elif char == ')':
-            if current:
-                vals.append({field: current.strip()})
-                current = ""
-            while ops and ops[-1] != '(':
-                evaluate(ops, vals)
-            if ops and ops[-1] == '(':
-                ops.pop()
-        elif char in '+,':
-            if current:
-                vals.append({field: current.strip()})
-                current = ""
-            while ops and ops[-1] != '(' and char == ',' and ops[-1] == '+':
-                evaluate(ops, vals)
-            ops.append('and' if char == '+' else 'or')
-        else:
-            current += char
-    
-    if current:
-        vals.append({field: current.strip()})
-    
-    while ops:
-        evaluate(ops, vals)
-    
-    return vals[0] if vals else {}
+    return compile_logical_expression(parse_expression(expression), field)
+
+def ids_to_tree(ids: list[str], placeholder: str) -> Node:
+    if not ids:
+        return Term(placeholder)
+    return Term(ids[0]) if len(ids) == 1 else TermSet(tuple(ids))
+
+# Terms that already are ids are passed through
+ID_PATTERNS = {'tag': re.compile(r'^g\d+$', re.I), 'trait': re.compile(r'^i\d+$', re.I)}
+# Unknown tags and traits become a placeholder id that matches nothing
+PLACEHOLDER_IDS = {'tag': 'g0', 'trait': 'i0'}
+UPSTREAM_NAME_TIMEOUT = 60 * 60 * 24
+
+def search_upstream_ids(type: str, name: str) -> list[str]:
+    """Ids of the tags or traits the VNDB API finds for `name`, cached in the app cache."""
+    try:
+        from vndb import cache
+    except ImportError:
+        cache = None
+
+    cache_key = f"remote_names:{type}:{name.strip().casefold()}"
+    ids = cache.get(cache_key) if cache else None
+    if ids is None:
+        results = run_sync(lambda client: client.query_all(type, ["search", "=", name], "id"))
+        ids = [result['id'] for result in results]
+        if cache:
+            cache.set(cache_key, ids, timeout=UPSTREAM_NAME_TIMEOUT)
+    return ids
+
+def resolve_ids(type: str, name: str) -> list[str]:
+    """
+    Ids of a tag or trait term: ids as is, names from the local dictionary, and only
+    names it does not know from the VNDB API. Local names merely starting with the term
+    are a last resort for when the API cannot be reached.
+    """
+    name = name.strip()
+    if ID_PATTERNS[type].match(name):
+        return [name.lower()]
+
+    try:
+        from vndb.database import resolve_name, complete_name
+    except ImportError:
+        resolve_name = complete_name = None
+
+    ids = resolve_name(type, name) if resolve_name else None
+    if ids is not None:
+        return ids
+    try:
+        return search_upstream_ids(type, name)
+    except httpx.HTTPError:
+        ids = complete_name(type, name) if complete_name else None
+        if ids is None:
+            raise
+        return ids
+
+def parse_name_expression(type: str, expression: str, field: str) -> dict[str, Any]:
+    names = {}
+    def process_name(name: str) -> Node:
+        if name not in names:
+            names[name] = resolve_ids(type, name)
+        return ids_to_tree(names[name], PLACEHOLDER_IDS[type])
+
+    tree = map_terms(parse_expression(expression.strip()), process_name)
+    return compile_logical_expression(tree, field)
 
 def parse_tag_expression(expression: str, directly: bool = False) -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/tag"
-    client = httpx.Client()
-
-    def get_tag_ids(tag: str) -> list[str]:
-        """Get tag IDs from tag name using unpaginated search"""
-        results = []
-        page =1 
-        more = True
-        while more:
-            payload = {
-                "filters": ["search", "=", tag],
-                "fields": "id",
-                "page": page,
-                "results": 100
-            }
-            response = client.post(url, json=payload)
-            results.extend(response.json().get('results', []))
-            more = response.json().get('more', False)
-            page += 1
-        return [result['id'] for result in results]
-
-    def process_tags(expr: str) -> str:
-        """Extract and process tags from expression"""
-        # Store positions of brackets for reconstruction
-        brackets = []
-        current_pos = 0
-        while current_pos < len(expr):
-            if expr[current_pos] in '()':
-                brackets.append((current_pos, expr[current_pos]))
-            current_pos += 1
-
-        # Split by operators and process each tag
-        tags = re.split(r'[+,()]', expr)
-        tags = [tag.strip() for tag in tags if tag.strip()]
-        
-        # Create mapping of original tags to their IDs
-        tag_map = {}
-        for tag in tags:
-            if tag not in tag_map:
-                ids = get_tag_ids(tag)
-                if ids:
-                    # If multiple IDs found, combine them with OR
-                    tag_map[tag] = f"({','.join(ids)})" if len(ids) > 1 else ids[0]
-                else:
-                    tag_map[tag] = "t0"  # Placeholder for non-existent tag
-
-        # Reconstruct expression with IDs
-        new_expr = expr
-        for tag, tag_ids in tag_map.items():
-            new_expr = re.sub(r'\b' + re.escape(tag) + r'\b', tag_ids, new_expr)
-
-        return new_expr
-
-    new_expression = process_tags(expression.strip())
-
-    field = 'dtag' if directly else 'tag'
-    return parse_logical_expression(new_expression, field)
+    return parse_name_expression('tag', expression, 'dtag' if directly else 'tag')
 
 def parse_trait_expression(expression: str, directly: bool = False) -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/trait"
-    client = httpx.Client()
-
-    # def get_trait_ids(trait: str) -> List[str]:
-    #     """Get trait IDs from trait name using unpaginated search"""
-    #     results = []
-    #     page = 1
-    #     more = True
-    #     while more:
-    #         payload = {
-    #             "filters": ["search", "=", trait],
-    #             "fields": "id",
-    #             "page": page,
-    #             "results": 100
-    #         }
-    #         response = client.post(url, json=payload)
-    #         results.extend(response.json().get('results', []))
-    #         more = response.json().get('more', False)
-    #         page += 1
-    #     return [result['id'] for result in results]
-
-    def get_trait_ids(trait: str) -> list[str]:
-        # Recently, there is no way to get trait ids from trait name and trait group name at the same time.
-        # So, we don't process the trait here.
-        return [trait]
-
-    def process_traits(expr: str) -> str:
-        # Split by operators and process each trait
-        traits = re.split(r'[+,()]', expr)
-        traits = [trait.strip() for trait in traits if trait.strip()]
-        
-        # Create mapping of original traits to their IDs
-        trait_map = {}
-        for trait in traits:
-            if trait not in trait_map:
-                ids = get_trait_ids(trait)
-                trait_map[trait] = f"({','.join(ids)})" if len(ids) > 1 else ids[0] if ids else "i0"
-
-        # Reconstruct expression with IDs
-        new_expr = expr
-        for trait, trait_ids in trait_map.items():
-            new_expr = re.sub(r'\b' + re.escape(trait) + r'\b', trait_ids, new_expr)
-
-        return new_expr
-
-    new_expression = process_traits(expression.strip())
-
-    field = 'dtrait' if directly else 'trait'
-    return parse_logical_expression(new_expression, field)
+    return parse_name_expression('trait', expression, 'dtrait' if directly else 'trait')
 
 def parse_int(value: str | None, comparable: bool = False) -> str | None:
     value = value.replace(" ", "")
@@ -0,0 +1,173 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Iterator
+
+import httpx
+import redis
+
+# Defaults of the limiter, overridable through the app config. VNDB allows 200 requests
+# per 5 minutes per client; the bucket refills at that rate and holds at most `burst` tokens
+REMOTE_RATE_LIMIT = 200
+REMOTE_RATE_PERIOD = 300.0
+REMOTE_RATE_BURST = 20
+# Share of the burst background traffic must leave untouched for interactive requests
+REMOTE_BACKGROUND_RESERVE = 0.5
+# Attempts of a request answered with 429 before giving up
+REMOTE_MAX_RETRIES = 3
+
+RATE_LIMIT_KEY = 'vndb:remote:rate_limit'
+
+PRIORITIES = ('interactive', 'background')
+
+_priority: ContextVar[str] = ContextVar('remote_priority', default='interactive')
+
+@contextmanager
+def remote_priority(priority: str) -> Iterator[None]:
+    """Tag the remote requests issued in this block, e.g. `with remote_priority('background'):`."""
+    if priority not in PRIORITIES:
+        raise ValueError(f"Invalid remote priority: {priority}. Must be one of {', '.join(PRIORITIES)}.")
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+def get_priority() -> str:
+    return _priority.get()
+
+# Takes one token if at least `reserve` would be left, and returns how long to wait otherwise.
+# Redis' clock is used so every process agrees on the refill; numbers are returned as strings
+# because Lua numbers are truncated to integers on the way out.
+TAKE_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local capacity, rate, reserve = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated', 'blocked_until')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+local blocked_until = tonumber(bucket[3]) or 0
+if blocked_until > now then
+    return tostring(blocked_until - now)
+end
+
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens - 1 >= reserve then
+    tokens = tokens - 1
+else
+    wait = (reserve + 1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 3600)
+return tostring(wait)
+"""
+
+# Stops every process from taking tokens for `seconds`, e.g. after a 429 with Retry-After
+BLOCK_SCRIPT = """
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local blocked_until = tonumber(redis.call('HGET', KEYS[1], 'blocked_until')) or 0
+redis.call('HSET', KEYS[1], 'blocked_until', tostring(math.max(blocked_until, now + tonumber(ARGV[1]))))
+redis.call('EXPIRE', KEYS[1], math.ceil(tonumber(ARGV[1])) + 3600)
+return 1
+"""
+
+class LocalBucket:
+    """The same bucket in process memory, used while Redis cannot be reached."""
+
+    def __init__(self, capacity: float, rate: float):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def take(self, reserve: float) -> float:
+        with self.lock:
+            now = time.monotonic()
+            if self.blocked_until > now:
+                return self.blocked_until - now
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens - 1 >= reserve:
+                self.tokens -= 1
+                return 0.0
+            return (reserve + 1 - self.tokens) / self.rate
+
+    def block(self, seconds: float) -> None:
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+class RateLimiter:
+    """
+    Token bucket shared through Redis by every process talking to the VNDB API.
+
+    Interactive requests may drain the bucket; background requests wait while fewer
+    than `background_reserve` of the burst is left, so schedules only use the budget
+    the web tier does not.
+    """
+
+    def __init__(self, redis_url: str | None, limit: int = REMOTE_RATE_LIMIT, period: float = REMOTE_RATE_PERIOD,
+                 burst: int = REMOTE_RATE_BURST, background_reserve: float = REMOTE_BACKGROUND_RESERVE):
+        self.capacity = float(max(1, burst))
+        self.rate = max(1, limit) / max(period, 1e-3)
+        self.reserves = {
+            'interactive': 0.0,
+            'background': min(self.capacity - 1, self.capacity * max(background_reserve, 0.0)),
+        }
+        self.redis = redis.Redis.from_url(redis_url, socket_timeout=1, socket_connect_timeout=1) if redis_url else None
+        self.take_script = self.redis.register_script(TAKE_SCRIPT) if self.redis else None
+        self.block_script = self.redis.register_script(BLOCK_SCRIPT) if self.redis else None
+        self.local = LocalBucket(self.capacity, self.rate)
+
+    def reserve(self, priority: str) -> float:
+        """Try to take a token; returns 0 on success, otherwise the seconds to wait before trying again."""
+        reserve = self.reserves.get(priority, 0.0)
+        if self.take_script is not None:
+            try:
+                return float(self.take_script(keys=[RATE_LIMIT_KEY], args=[self.capacity, self.rate, reserve]))
+            except redis.RedisError:
+                pass
+        return self.local.take(reserve)
+
+    def block(self, seconds: float) -> None:
+        self.local.block(seconds)
+        if self.block_script is not None:
+            try:
+                self.block_script(keys=[RATE_LIMIT_KEY], args=[seconds])
+            except redis.RedisError:
+                pass
+
+    def acquire(self, priority: str | None = None) -> None:
+        priority = priority or get_priority()
+        while (wait := self.reserve(priority)) > 0:
+            time.sleep(wait)
+
+    async def acquire_async(self, priority: str | None = None) -> None:
+        priority = priority or get_priority()
+        while (wait := await asyncio.to_thread(self.reserve, priority)) > 0:
+            await asyncio.sleep(wait)
+
+    async def block_async(self, seconds: float) -> None:
+        await asyncio.to_thread(self.block, seconds)
+
+def retry_after(response: httpx.Response, default: float = 60.0) -> float:
+    """Seconds to back off after a 429, from its Retry-After header (delta-seconds or HTTP date)."""
+    value = response.headers.get('Retry-After')
+    if value is None:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
@@ -0,0 +1,73 @@
+import math
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from typing import Any, Callable, Iterator
+
+from flask import current_app, has_app_context
+
+from .client import REMOTE_CONCURRENCY, get_remote_config
+
+PageFetcher = Callable[[int], dict[str, Any]]
+
+def fetch_sequentially(fetch_page: PageFetcher, page: int) -> Iterator[list[dict[str, Any]]]:
+    more = True
+    while more:
+        response = fetch_page(page)
+        yield response.get('results') or []
+        more = response.get('more', False)
+        page += 1
+
+def iter_pages(fetch_page: PageFetcher, concurrency: int | None = None) -> Iterator[list[dict[str, Any]]]:
+    """
+    Stream every page of a paginated search, in order.
+
+    `fetch_page(page)` returns a response with `results`, `more` and, ideally, `count`.
+    The count of page 1 tells how many pages follow; they are fetched `concurrency` at a
+    time, so at most that many pages are held in memory however long the result is.
+    Without a count, pages are walked one after another. A page that raises ends the
+    stream with its error once the pages before it are yielded; pending pages are cancelled.
+    """
+    first = fetch_page(1)
+    results = first.get('results') or []
+    yield results
+
+    total = first.get('count')
+    if not first.get('more'):
+        return
+    if not total or not results:
+        yield from fetch_sequentially(fetch_page, 2)
+        return
+
+    last_page = math.ceil(total / len(results))
+    concurrency = max(1, concurrency or get_remote_config('REMOTE_CONCURRENCY', REMOTE_CONCURRENCY))
+    app = current_app._get_current_object() if has_app_context() else None
+
+    def fetch(page: int) -> dict[str, Any]:
+        if app is None:
+            return fetch_page(page)
+        with app.app_context():
+            return fetch_page(page)
+
+    pages = iter(range(2, last_page + 1))
+    pool = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='vndb-pager')
+    pending = deque()
+    try:
+        def submit() -> None:
+            if (page := next(pages, None)) is not None:
+                # A context copy per page carries the remote priority into the worker
+                pending.append(pool.submit(copy_context().run, fetch, page))
+
+        for _ in range(concurrency):
+            submit()
+        response = first
+        while pending:
+            response = pending.popleft().result()
+            submit()
+            yield response.get('results') or []
+    finally:
+        pool.shutdown(wait=True, cancel_futures=True)
+
+    # The result grew while it was being paged
+    if response.get('more'):
+        yield from fetch_sequentially(fetch_page, last_page + 1)
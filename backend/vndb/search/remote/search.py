@@ -1,13 +1,15 @@
+import asyncio
 import httpx
 from typing import Any, Callable
 from enum import Enum
 
+from .client import VNDB_API_URL, AsyncVNDBClient, get_limiter, run_sync
+from .limiter import REMOTE_MAX_RETRIES, retry_after
+from .pager import iter_pages
 from .filters import get_remote_filters
 from .fields import get_remote_fields, validate_sort
 
 
-VNDB_API_URL = "https://api.vndb.org/kana"
-
 class VNDBEndpoint(Enum):
     VN = "vn"
     CHARACTER = "character"
@@ -26,44 +28,20 @@ class VNDBAPIWrapper:
 
     def query(self, endpoint: VNDBEndpoint, filters: list, fields: list[str], 
               sort: str = "id", reverse: bool = False, results: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
-        url = f"{VNDB_API_URL}/{endpoint.value}"
-        
-        payload = {
-            "filters": filters,
-            "fields": ",".join(fields),
-            "sort": sort,
-            "reverse": reverse,
-            "results": results,
-            "page": page,
-            "count": count
-        }
-        
-        response = self.client.post(url, json=payload)
-
-        # TODO:DEBUG
-        from vndb.logger import add_log_entry
-        if response.status_code != 200:
-            level = "error"
-            message = f"Error querying {endpoint.value}"
-            details = {
-                "from": "remote",
-                "url": url,
-                "payload": payload,
-                "status_code": response.status_code,
-                "response": response.text
-            }
-        else:
-            level = "info"
-            message = f"Successfully queried {endpoint.value}"
-            details = {
-                "from": "remote",
-                "url": url,
-                "payload": payload,
-            }
-        add_log_entry(level, message, details)
-
+        return run_sync(lambda client: client.query(endpoint.value, filters, fields, sort=sort, reverse=reverse,
+                                                    results=results, page=page, count=count))
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """A request on the authenticated client, paced by the same limiter as the searches."""
+        limiter = get_limiter()
+        for attempt in range(REMOTE_MAX_RETRIES):
+            limiter.acquire()
+            response = self.client.request(method, url, **kwargs)
+            if response.status_code != 429 or attempt == REMOTE_MAX_RETRIES - 1:
+                break
+            limiter.block(retry_after(response))
         response.raise_for_status()
-        return response.json()
+        return response
 
     def get_vn(self, filters: dict[str, Any], fields: list[str], **kwargs) -> dict[str, Any]:
         return self.query(VNDBEndpoint.VN, filters, fields, **kwargs)
@@ -88,29 +66,23 @@ class VNDBAPIWrapper:
 
     def update_user_list(self, vn_id: str, data: dict[str, Any]) -> None:
         url = f"{VNDB_API_URL}/ulist/{vn_id}"
-        response = self.client.patch(url, json=data)
-        response.raise_for_status()
+        self.request("PATCH", url, json=data)
 
     def update_release_list(self, release_id: str, status: int) -> None:
         url = f"{VNDB_API_URL}/rlist/{release_id}"
-        response = self.client.patch(url, json={"status": status})
-        response.raise_for_status()
+        self.request("PATCH", url, json={"status": status})
 
     def remove_from_user_list(self, vn_id: str) -> None:
         url = f"{VNDB_API_URL}/ulist/{vn_id}"
-        response = self.client.delete(url)
-        response.raise_for_status()
+        self.request("DELETE", url)
 
     def remove_from_release_list(self, release_id: str) -> None:
         url = f"{VNDB_API_URL}/rlist/{release_id}"
-        response = self.client.delete(url)
-        response.raise_for_status()
+        self.request("DELETE", url)
 
     def get_auth_info(self) -> dict[str, Any]:
         url = f"{VNDB_API_URL}/authinfo"
-        response = self.client.get(url)
-        response.raise_for_status()
-        return response.json()
+        return self.request("GET", url).json()
 
 api = VNDBAPIWrapper()
 
@@ -123,15 +95,11 @@ def memoize(timeout=60*60*24):
         return lambda f: f
 
 def unpaginated_search(search_function: Callable, **kwargs) -> dict[str, Any]:
-    results = []
-    page = 1
-    more = True
-    while more:
-        response = search_function(**kwargs, page=page)
-        results.extend(response.get('results', []))
-        more = response.get('more', False)
-        page += 1
-    
+    results = [
+        item
+        for page in iter_pages(lambda page: search_function(**kwargs, page=page))
+        for item in page
+    ]
     return {'results': results, 'total': len(results), 'count': len(results)}
 
 def paginated_results(results: dict[str, Any], sort: str = 'id', reverse: bool = False, limit: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
@@ -174,20 +142,60 @@ def search_trait(filters: dict[str, Any], fields: list[str], page: int = 1, **kw
 def search_release(filters: dict[str, Any], fields: list[str], page: int = 1, **kwargs) -> dict[str, Any]:
     return api.get_release(filters, fields, page=page, **kwargs)
 
+CHARACTER_SUMMARY_FIELDS = ['id', 'name', 'original', 'sex', 'vns', 'image']
+SEIYUU_FIELDS = ['id', 'va.staff.id', 'va.staff.name', 'va.staff.original', 'va.character.id', 'va.note']
+
+# VN ids per combined filter of a batched enrichment query
+ENRICHMENT_BATCH_SIZE = 100
+
+def vn_ids_filter(vnids: list[str]) -> list:
+    ids = [["id", "=", vnid] for vnid in vnids]
+    return ids[0] if len(ids) == 1 else ["or", *ids]
+
+async def fetch_by_vn_ids(client: AsyncVNDBClient, path: str, vnids: list[str], fields: list[str] | str,
+                          relation: str | None = None) -> list[dict[str, Any]]:
+    """
+    Every `path` item related to any of `vnids`, or the VNs themselves without a `relation`.
+
+    Ids are sorted so the same page always yields the same (cached, coalesced) payloads;
+    each chunk of `ENRICHMENT_BATCH_SIZE` ids is one paginated query, chunks run concurrently.
+    """
+    vnids = sorted(set(vnids))
+    chunks = [vnids[start:start + ENRICHMENT_BATCH_SIZE] for start in range(0, len(vnids), ENRICHMENT_BATCH_SIZE)]
+    filters = [[relation, "=", vn_ids_filter(chunk)] if relation else vn_ids_filter(chunk) for chunk in chunks]
+    pages = await asyncio.gather(*[client.cached_query_all(path, chunk_filter, fields) for chunk_filter in filters])
+
+    items = {}
+    for page in pages:
+        for item in page:
+            items.setdefault(item['id'], item)
+    return list(items.values())
+
+def partition_by_vn(items: list[dict[str, Any]], vnids: list[str]) -> dict[str, list[dict[str, Any]]]:
+    """Group characters or releases under each of `vnids` they belong to, through their `vns`."""
+    partitions = {vnid: [] for vnid in vnids}
+    for item in sorted(items, key=lambda item: item['id']):
+        for vn in item.get('vns') or []:
+            if vn['id'] in partitions:
+                partitions[vn['id']].append(item)
+    return partitions
+
+async def fetch_vn_characters(client: AsyncVNDBClient, vnids: list[str]) -> dict[str, list[dict[str, Any]]]:
+    characters = await fetch_by_vn_ids(client, 'character', vnids, get_remote_fields('character', 'small'), relation='vn')
+    return partition_by_vn(characters, vnids)
+
+async def fetch_vn_releases(client: AsyncVNDBClient, vnids: list[str]) -> dict[str, list[dict[str, Any]]]:
+    releases = await fetch_by_vn_ids(client, 'release', vnids, get_remote_fields('release', 'small'), relation='vn')
+    return partition_by_vn(releases, vnids)
+
+def character_summaries(characters: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    return [{key: char[key] for key in CHARACTER_SUMMARY_FIELDS} for char in characters]
+
 def vn_additional_field_characters(vnid: str):
-    characters = unpaginated_search(
-        search_function=search_characters_by_resource_id_cache,
-        resource_type='vn', resource_id=vnid, response_size='small', limit=100
-    )['results']
-    characters = [{key: char[key] for key in ['id', 'name', 'original', 'sex', 'vns', 'image']} for char in characters]
-    return characters
+    return character_summaries(run_sync(lambda client: fetch_vn_characters(client, [vnid]))[vnid])
 
 def vn_additional_field_releases(vnid: str):
-    releases = unpaginated_search(
-        search_function=search_releases_by_resource_id_cache,
-        resource_type='vn', resource_id=vnid, response_size='small', limit=100
-    )['results']
-    return releases
+    return run_sync(lambda client: fetch_vn_releases(client, [vnid]))[vnid]
 
 def vn_additional_field_publishers(releases: list[dict[str, Any]]):
     release_languages = [
@@ -222,29 +230,53 @@ def vn_additional_field_publishers(releases: list[dict[str, Any]]):
 
     return publishers
 
-def character_additional_field_seiyuu(character: dict[str, Any]):
-    charid = character['id']
-
-    vns = get_vn_cache(
-        filters=get_remote_filters('vn', {'id': ','.join([ vn['id'] for vn in character['vns']])}),
-        fields=['va.staff.id', 'va.staff.name', 'va.staff.original', 'va.character.id', 'va.note']
-    )['results']
-
-    seiyuu = list({
-        (d['id'], d['name'], d['original'], d['note']): d 
-        for d in [
-            {
+async def fetch_character_seiyuu(client: AsyncVNDBClient, characters: list[dict[str, Any]]) -> dict[str, list[dict[str, Any]]]:
+    """The voice actors of every character, from one `va` query over the union of their VNs."""
+    charids = {char['id'] for char in characters}
+    vnids = [vn['id'] for char in characters for vn in char.get('vns') or []]
+    vns = await fetch_by_vn_ids(client, 'vn', vnids, SEIYUU_FIELDS) if vnids else []
+
+    seiyuu = {charid: {} for charid in charids}
+    for vn in sorted(vns, key=lambda vn: vn['id']):
+        for va in vn.get('va') or []:
+            charid = va['character']['id']
+            if charid not in seiyuu:
+                continue
+            d = {
                 'id': va['staff']['id'],
                 'name': va['staff']['name'],
                 'original': va['staff']['original'],
                 'note': va['note']
             }
-            for vn in vns
-            for va in vn['va']
-            if va['character']['id'] == charid
-    ]}.values())
+            seiyuu[charid][(d['id'], d['name'], d['original'], d['note'])] = d
 
-    return seiyuu
+    return {charid: list(entries.values()) for charid, entries in seiyuu.items()}
+
+def character_additional_field_seiyuu(character: dict[str, Any]):
+    return run_sync(lambda client: fetch_character_seiyuu(client, [character]))[character['id']]
+
+async def enrich_vns(client: AsyncVNDBClient, vns: list[dict[str, Any]]) -> None:
+    vnids = [vn['id'] for vn in vns]
+    characters, releases = await asyncio.gather(
+        fetch_vn_characters(client, vnids), fetch_vn_releases(client, vnids)
+    )
+    for vn in vns:
+        vn['characters'] = character_summaries(characters[vn['id']])
+        vn['releases'] = releases[vn['id']]
+        vn['publishers'] = vn_additional_field_publishers(vn['releases'])
+
+async def enrich_characters(client: AsyncVNDBClient, characters: list[dict[str, Any]]) -> None:
+    seiyuu = await fetch_character_seiyuu(client, characters)
+    for char in characters:
+        char['seiyuu'] = seiyuu[char['id']]
+
+def enrich_results(enrich: Callable, results: list[dict[str, Any]]) -> None:
+    """
+    Enrich a whole page of results in place with batched queries: the relations of every
+    result are fetched together and partitioned back per result in memory.
+    """
+    if results:
+        run_sync(lambda client: enrich(client, results))
 
 def search(resource_type: str, params: dict[str, Any], response_size: str = 'small',
            page: int = 1, limit: int = 100, 
@@ -275,28 +307,22 @@ def search(resource_type: str, params: dict[str, Any], response_size: str = 'sma
     if page and limit: 
         results = search_functions[resource_type](filters, fields, page=page, results=limit, sort=sort, reverse=reverse, count=count)
     else:
+        # Full pages, and a count on each so the pager can fetch the rest concurrently
         results = unpaginated_search(
             search_function=search_functions[resource_type], 
-            filters=filters, fields=fields, sort=sort, reverse=reverse, count=count
+            filters=filters, fields=fields, sort=sort, reverse=reverse, count=True, results=100
         )
     
     if (resource_type == 'vn' and response_size == 'large'):
-        for vn in results['results']:
-            vnid = vn['id']
-            vn['characters'] = vn_additional_field_characters(vnid)
-            vn['releases'] = vn_additional_field_releases(vnid)
-            vn['publishers'] = vn_additional_field_publishers(vn['releases'])
+        enrich_results(enrich_vns, results['results'])
 
     if (resource_type == 'character' and response_size == 'large'):
-        for char in results['results']:
-            char['seiyuu'] = character_additional_field_seiyuu(char)
+        enrich_results(enrich_characters, results['results'])
 
     return results
 
 
 def search_resources_by_release_id(release_id: str, related_resource_type: str, response_size: str = "small") -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/release"
-
     related_resource_fields = get_remote_fields(related_resource_type, response_size)
     fields = {
         'vn': [f'vns.{field}' for field in related_resource_fields] + ['vns.rtype'],
@@ -309,27 +335,22 @@ def search_resources_by_release_id(release_id: str, related_resource_type: str,
         "results": 100
     }
 
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()['results'][0]
-        results = results.get(
-            {
-                'vn': 'vns',
-                'producer': 'producers'
-            }.get(related_resource_type)
-        )
+    results = run_sync(lambda client: client.post('release', payload))['results'][0]
+    results = results.get(
+        {
+            'vn': 'vns',
+            'producer': 'producers'
+        }.get(related_resource_type)
+    )
 
     return {'results': results}
 
 def search_resources_by_charid(charid: str, related_resource_type: str, response_size: str = "small") -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/character"
-
     related_resource_fields = get_remote_fields(related_resource_type, response_size)
     fields = {
-        'trait': [f'traits.{field}' for field in related_resource_fields].extend['traits.spoiler', 'traits.lie'],
-        'vns': [f'vns.{field}' for field in related_resource_fields].extend['vns.spoiler', 'vns.role', 'vns.release.id']
-    }
+        'trait': [f'traits.{field}' for field in related_resource_fields] + ['traits.spoiler', 'traits.lie'],
+        'vn': [f'vns.{field}' for field in related_resource_fields] + ['vns.spoiler', 'vns.role', 'vns.release.id']
+    }.get(related_resource_type)
 
     payload = {
         "filters": ["id", "=", charid],
@@ -337,21 +358,17 @@ def search_resources_by_charid(charid: str, related_resource_type: str, response
         "results": 100
     }
 
-    with httpx.Client() as client: 
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()['results'][0]
-        results = results.get(
-            {
-                'trait': 'traits',
-            }.get(related_resource_type)
-        )
+    results = run_sync(lambda client: client.post('character', payload))['results'][0]
+    results = results.get(
+        {
+            'trait': 'traits',
+            'vn': 'vns'
+        }.get(related_resource_type)
+    )
 
     return {'results': results}
 
 def search_resources_by_vnid(vnid: str, related_resource_type: str, response_size: str = "small") -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/vn"
-
     related_resource_fields = get_remote_fields(related_resource_type, response_size)
     fields = {
         'vn': [f'relations.{field}' for field in related_resource_fields] + ['relations.relation', 'relations.relation_official'],
@@ -366,25 +383,20 @@ def search_resources_by_vnid(vnid: str, related_resource_type: str, response_siz
         "results": 100
     }
 
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()['results'][0]
-        results = results.get(
-            {
-                'vn': 'relations',
-                'tag': 'tags',
-                'producer': 'developers',
-                'staff': 'staff'
-            }.get(related_resource_type)
-        )
+    results = run_sync(lambda client: client.post('vn', payload))['results'][0]
+    results = results.get(
+        {
+            'vn': 'relations',
+            'tag': 'tags',
+            'producer': 'developers',
+            'staff': 'staff'
+        }.get(related_resource_type)
+    )
 
     return {'results': results}
 
 def search_releases_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small',
                                    sort: str = 'id', reverse: bool = False, limit: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/release"
-
     filters = {
         'vn': ['vn', '=', ['id', '=', resource_id]],
         'producer': ['producer', '=', ['id', '=', resource_id]]
@@ -392,27 +404,12 @@ def search_releases_by_resource_id(resource_type: str, resource_id: str, respons
 
     release_fields = get_remote_fields("release", response_size)
     sort = validate_sort(resource_type, sort)
-    payload = {
-        "filters": filters,
-        "fields": ",".join(release_fields),
-        "sort": sort,
-        "reverse": reverse,
-        "results": limit,
-        "page": page,
-        "count": count 
-    }
 
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()
-
-    return results
+    return run_sync(lambda client: client.query('release', filters, release_fields, sort=sort, reverse=reverse,
+                                                 results=limit, page=page, count=count))
 
 def search_characters_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small', 
                                       sort: str = 'id', reverse: bool = False, limit: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/character"
-
     filters = {
         'trait': ['trait', '=', [resource_id, 0, 0]], 
         'dtrait': ['dtrait', '=', [resource_id, 0, 0]],
@@ -421,27 +418,12 @@ def search_characters_by_resource_id(resource_type: str, resource_id: str, respo
 
     character_fields = get_remote_fields("character", response_size)
     sort = validate_sort(resource_type, sort)
-    payload = {
-        "filters": filters,
-        "fields": ",".join(character_fields),
-        "sort": sort,
-        "reverse": reverse,
-        "results": limit,
-        "page": page,
-        "count": count 
-    }
 
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()
-
-    return results
+    return run_sync(lambda client: client.query('character', filters, character_fields, sort=sort, reverse=reverse,
+                                                 results=limit, page=page, count=count))
 
 def search_vns_by_resource_id(resource_type: str, resource_id: str, response_size: str = 'small',
                               sort: str = 'id', reverse: bool = False, limit: int = 10, page: int = 1, count: bool = True) -> dict[str, Any]:
-    url = "https://api.vndb.org/kana/vn"
-
     filters = {
         'tag': ['tag', '=', [resource_id, 0, 0]],
         'dtag': ['dtag', '=', [resource_id, 0, 0]],
@@ -454,32 +436,18 @@ def search_vns_by_resource_id(resource_type: str, resource_id: str, response_siz
     vn_fields = get_remote_fields("vn", response_size)
     sort = validate_sort(resource_type, sort)
 
-    payload = {
-        "filters": filters,
-        "fields": ",".join(vn_fields),
-        "sort": sort,
-        "reverse": reverse,
-        "results": limit,
-        "page": page,
-        "count": count 
-    }
-
-    with httpx.Client() as client:
-        response = client.post(url, json=payload)
-        response.raise_for_status()
-        results = response.json()
+    async def query(client: AsyncVNDBClient) -> dict[str, Any]:
+        results = await client.query('vn', filters, vn_fields, sort=sort, reverse=reverse,
+                                     results=limit, page=page, count=count)
+        if response_size == 'small':
+            return results
 
-    if response_size == 'small':
+        characters = await fetch_vn_characters(client, [vn['id'] for vn in results['results']])
+        for vn in results['results']:
+            vn['characters'] = characters[vn['id']]
         return results
 
-    for vn in results['results']:
-        vnid = vn['id']
-        characters = unpaginated_search(
-            search_function=search_characters_by_resource_id,
-            resource_type='vn', resource_id=vnid, response_size='small'
-        )
-        vn['characters'] = characters['results'] 
-    return results
+    return run_sync(query)
 
 
 @memoize(timeout=3600)
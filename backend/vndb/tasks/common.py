@@ -3,15 +3,15 @@ from typing import Any
 from functools import wraps
 
 from vndb import celery, cache, db 
-from vndb.database import convert_model_to_dict
+from vndb.database import serialize, serialize_many
 
 NOT_FOUND = {'status': 'NOT_FOUND', 'result': None}
 
-def format_results(results: Any) -> dict[str, Any]:
+def format_results(results: Any, fields: list[str] | None = None) -> dict[str, Any]:
     if isinstance(results, db.Model):
-        return {'status': 'SUCCESS','results': convert_model_to_dict(results)}
+        return {'status': 'SUCCESS','results': serialize(results, fields)}
     elif isinstance(results, list) and all(isinstance(item, db.Model) for item in results):
-        return {'status': 'SUCCESS', 'results': [convert_model_to_dict(item) for item in results]}
+        return {'status': 'SUCCESS', 'results': serialize_many(results, fields)}
     elif isinstance(results, dict) and results.get('results'):
         results['status'] = 'SUCCESS'
         return results
@@ -37,6 +37,14 @@ def clear_caches(func):
         return result
     return wrapper
 
+def task_with_error_handler(func):
+    @celery.task
+    @wraps(func)
+    @error_handler
+    def wrapper(*args, **kwargs):
+        return func(*args, **kwargs)
+    return wrapper
+
 def task_with_cache_clear(func):
     @celery.task
     @wraps(func)
@@ -46,6 +54,22 @@ def task_with_cache_clear(func):
         return func(*args, **kwargs)
     return wrapper
 
+def task_with_progress(func):
+    """
+    Like `task_with_cache_clear`, but passes a `progress(done, total)` callback
+    that publishes a PROGRESS state while the task runs in a worker.
+    """
+    @celery.task(bind=True)
+    @wraps(func)
+    @error_handler
+    @clear_caches
+    def wrapper(self, *args, **kwargs):
+        def progress(done: int, total: int) -> None:
+            if self.request.id:
+                self.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+        return func(*args, progress=progress, **kwargs)
+    return wrapper
+
 def dont_cache(response):
     # Don't cache if the response is not a dict or if status is 'ERROR'
     return not isinstance(response, dict) or response.get('status') == 'ERROR'
@@ -60,7 +84,8 @@ def task_with_memoize(timeout=60*60*24):
             result = cache.get(cache_key)
             if result is None:
                 result = func(*args, **kwargs)
-                if result['status'] == 'SUCCESS':
+                # Plans carry timings of this very run, so they are never served from cache
+                if result['status'] == 'SUCCESS' and 'explain' not in result:
                     cache.set(cache_key, result, timeout=timeout)
             return result 
         return wrapper
@@ -1,4 +1,4 @@
-from typing import Any, Callable
+from typing import Any, Callable, Iterator
 
 from vndb.search import (
     search_resources_by_vnid_local,
@@ -13,63 +13,68 @@ from vndb.search import (
     search_vns_by_resource_id_remote, 
     search_characters_by_resource_id_remote,
     search_releases_by_resource_id_remote,
-    convert_remote_to_local
+    convert_remote_to_local, iter_pages
 )
+from datetime import timedelta
+
 from vndb.database import (
-    exists, create, update, delete,
+    delete, upsert_many
 )
 from .common import (
     task_with_memoize, task_with_cache_clear, format_results
 ) 
 
-def unpaginated_search(search_function: Callable, **kwargs) -> dict[str, Any]:
-    results = []
-    page = 1
-    more = True
-    while more:
+def iter_search_pages(search_function: Callable, **kwargs) -> Iterator[list[dict[str, Any]]]:
+    """
+    Stream the pages of a related resources task. A first page that did not succeed
+    means there is nothing related; any later one raises, so a task never goes on
+    with a page missing from the middle.
+    """
+    def fetch_page(page: int) -> dict[str, Any]:
         response = search_function(**kwargs, page=page)
-        if response.get('status', 'FAILED') == 'SUCCESS':
-            results.extend(response.get('results', []))
-            more = response.get('more', False)
-        else:
-            more = False
-        page += 1
-    
-    return results
+        status = response.get('status', 'FAILED')
+        if status == 'SUCCESS':
+            return response
+        if page == 1:
+            return {}
+        raise RuntimeError(f"Page {page} of the related resources did not succeed: {status}")
+
+    return iter_pages(fetch_page)
 
 @task_with_memoize(timeout=600)
 def get_related_resources_task(resource_type: str, resource_id: str, related_resource_type: str, response_size: str = 'small',
-                                page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
+                                page: int = 1, limit: int = 100, sort: str = 'id', reverse: bool = False, count: bool = True,
+                                cursor: str | None = None, explain: str | None = None) -> dict[str, Any]:
 
     if resource_type in ['tag', 'character', 'staff', 'producer'] and related_resource_type == 'vn':
         results = search_vns_by_resource_id_local(
             resource_type=resource_type, resource_id=resource_id, response_size=response_size,
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     elif resource_type in ['vn', 'trait'] and related_resource_type == 'character':
         results = search_characters_by_resource_id_local(
             resource_type=resource_type, resource_id=resource_id, response_size=response_size, 
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     elif resource_type in ['vn', 'producer'] and related_resource_type =='release':
         results = search_releases_by_resource_id_local(
             resource_type=resource_type, resource_id=resource_id, response_size=response_size, 
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     elif resource_type == 'vn' and related_resource_type in ['vn', 'tag', 'producer', 'staff', 'character', 'release']:
         results = search_resources_by_vnid_local(
             vnid=resource_id, related_resource_type=related_resource_type, response_size=response_size,
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     elif resource_type == 'character' and related_resource_type in ['vn', 'trait']:
         results = search_resources_by_charid_local(
             charid=resource_id, related_resource_type=related_resource_type, response_size=response_size,
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     elif resource_type == 'release' and related_resource_type in ['vn', 'producer']:
         results = search_resources_by_release_id_local(
-            charid=resource_id, related_resource_type=related_resource_type, response_size=response_size,
-            page=page, limit=limit, sort=sort, reverse=reverse, count=count
+            release_id=resource_id, related_resource_type=related_resource_type, response_size=response_size,
+            page=page, limit=limit, sort=sort, reverse=reverse, count=count, cursor=cursor, explain=explain
         )
     else:
         raise ValueError(f"Invalid combination of resource_type and related_resource_type: {resource_type} and {related_resource_type}")
@@ -132,45 +137,41 @@ def search_related_resources_task(resource_type: str, resource_id: str, related_
 @task_with_cache_clear
 def update_related_resources_task(resource_type: str, resource_id: str, related_resource_type: str) -> dict[str, Any]:
 
-    related_data = unpaginated_search(
+    pages = iter_search_pages(
         search_related_resources_task, 
         resource_type=resource_type, resource_id=resource_id, 
         related_resource_type=related_resource_type, response_size='large'
     )
 
+    # Upserted page by page, so only a few pages are ever held in memory
     update_results = {}
-
-    for item in related_data:
-        id = item['id']
-        try:
-            update_data = convert_remote_to_local(related_resource_type, item) 
-            if exists(related_resource_type, id):
-                data = update(related_resource_type, id, update_data)
-            else:
-                data = create(related_resource_type, id, update_data)
-            if not data:
-                update_results[id] = False
-            else:
-                update_results[id] = True
-            
-        except Exception as exc:
-            update_results[id] = False
+    for related_data in pages:
+        rows = [
+            {**convert_remote_to_local(related_resource_type, item), 'id': item['id']}
+            for item in related_data
+        ]
+        statuses = upsert_many(related_resource_type, rows, update_interval=timedelta(0)) or {}
+        update_results.update({item['id']: statuses.get(item['id']) in ('created', 'updated') for item in related_data})
 
     return format_results(update_results)
 
 @task_with_cache_clear
 def delete_related_resources_task(resource_type: str, resource_id: str, related_resource_type: str) -> dict[str, Any]:
 
-    related_data = unpaginated_search(
-        get_related_resources_task,
-        resource_type=resource_type, resource_id=resource_id,
-        related_resource_type=related_resource_type, response_size='large'    
-    )
+    # Deleting shifts the later pages, so the ids are collected before anything is deleted
+    ids = [
+        item['id']
+        for related_data in iter_search_pages(
+            get_related_resources_task,
+            resource_type=resource_type, resource_id=resource_id,
+            related_resource_type=related_resource_type, response_size='large'
+        )
+        for item in related_data
+    ]
 
     delete_results = {}
 
-    for item in related_data:
-        id = item['id']
+    for id in ids:
         try:
             data = delete(related_resource_type, id)
             if not data:
@@ -1,15 +1,18 @@
 from typing import Any
 
 from vndb.search import (
-    search_remote, search_local,
+    search_remote, search_local, get_local_fields,
     convert_remote_to_local
 )
+from datetime import timedelta
+
+from vndb import db
 from vndb.database import (
-    get_all, create, update, updatable,
-    delete, delete_all, exists
+    MODEL_MAP, get, get_many, update, upsert_many, serialize,
+    delete, delete_all
 )
 from .common import (
-    task_with_memoize, task_with_cache_clear,
+    task_with_memoize, task_with_cache_clear, task_with_progress, task_with_error_handler,
     format_results, NOT_FOUND
 )
 
@@ -25,8 +28,9 @@ def get_resource_task(resource_type: str, resource_id: str, response_size: str =
 
 @task_with_memoize(timeout=600)
 def get_resources_task(resource_type: str, args: dict[str, Any], response_size: str = 'small',
-                       page: int = 1, limit: int = 20, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    results = search_local(resource_type, args, response_size, page, limit, sort, reverse, count)
+                       page: int = 1, limit: int = 20, sort: str = 'id', reverse: bool = False, count: bool = True,
+                       cursor: str | None = None, explain: str | None = None, facets: str | None = None) -> dict[str, Any]:
+    results = search_local(resource_type, args, response_size, page, limit, sort, reverse, count, cursor, explain, facets)
     if not results or not isinstance(results, dict) or not results.get('results'):
         return NOT_FOUND
 
@@ -34,6 +38,42 @@ def get_resources_task(resource_type: str, args: dict[str, Any], response_size:
     results['source'] = 'local'
     return results
 
+# The VNDB API returns at most 100 results per call
+REMOTE_BATCH_SIZE = 100
+
+@task_with_error_handler
+def get_resources_by_ids_task(resource_type: str, ids: list[str], response_size: str = 'small',
+                              remote: bool = False) -> dict[str, Any]:
+    """
+    Multi-get: every id maps to its item, or None when it is neither local nor, with
+    `remote`, found on the VNDB API. Remote hits are converted to the local shape and
+    fields, and synchronized like remote searches.
+    """
+    fields = get_local_fields(resource_type, response_size)
+    items = get_many(resource_type, ids, fields)
+    results = {id: serialize(item, fields) if item else None for id, item in items.items()}
+
+    fetched = []
+    misses = [id for id, item in results.items() if item is None]
+    if remote:
+        for start in range(0, len(misses), REMOTE_BATCH_SIZE):
+            batch = misses[start:start + REMOTE_BATCH_SIZE]
+            found = search_remote(resource_type, {'id': ','.join(batch)}, response_size, 1, REMOTE_BATCH_SIZE, count=False)
+            found = found.get('results') if isinstance(found, dict) else None
+            if not found:
+                continue
+            if response_size == 'large':
+                synchronize_resources_task.delay(resource_type, found)
+            for item in found:
+                if item.get('id') in results:
+                    # Shaped like the serialized local rows it sits next to
+                    local = {**convert_remote_to_local(resource_type, item), 'id': item['id']}
+                    results[item['id']] = {field: local.get(field) for field in fields}
+                    fetched.append(item['id'])
+        misses = [id for id, item in results.items() if item is None]
+
+    return {'status': 'SUCCESS', 'results': results, 'misses': misses, 'remote': fetched}
+
 @task_with_memoize(timeout=600)
 def search_resource_task(resource_type: str, resource_id: str, response_size: str = 'small') -> dict[str, Any]:
     results = search_remote(resource_type, {'id': resource_id}, response_size)
@@ -69,21 +109,21 @@ def update_resource_task(resource_type: str, resource_id: str) -> dict[str, Any]
     
     update_data = convert_remote_to_local(resource_type, remote_result['results'][0])
 
-    if exists(resource_type, resource_id):
-        data = update(resource_type, resource_id, update_data)
-    else:
-        data = create(resource_type, resource_id, update_data)
+    if not upsert_many(resource_type, [{**update_data, 'id': resource_id}], update_interval=timedelta(0)):
+        return NOT_FOUND
     
-    return format_results(data)
+    return format_results(get(resource_type, resource_id))
 
 @task_with_cache_clear
 def update_resources_task(resource_type: str) -> dict[str, Any]:
     update_results = {}
 
-    resources = get_all(resource_type)
-    for resource in resources:
-        result = update_resource_task(resource_type, resource.id)
-        update_results[resource.id] = True if result['status'] == 'SUCCESS' else False
+    model = MODEL_MAP[resource_type]
+    # Every active row is refreshed, so only the ids are read, not the full rows
+    ids = [id for id, in db.session.query(model.id).filter(model.deleted_at == None).order_by(model.id)]
+    for resource_id in ids:
+        result = update_resource_task(resource_type, resource_id)
+        update_results[resource_id] = True if result['status'] == 'SUCCESS' else False
 
     return format_results(update_results)
 
@@ -92,9 +132,9 @@ def delete_resource_task(resource_type: str, resource_id: str) -> dict[str, Any]
     result = delete(resource_type, resource_id)
     return format_results(result)
 
-@task_with_cache_clear
-def delete_resources_task(resource_type: str) -> dict[str, Any]:
-    deleted_count = delete_all(resource_type)
+@task_with_progress
+def delete_resources_task(resource_type: str, vacuum: bool = False, progress=None) -> dict[str, Any]:
+    deleted_count = delete_all(resource_type, progress=progress, vacuum=vacuum)
     return format_results(deleted_count)
 
 @task_with_cache_clear
@@ -116,12 +156,7 @@ def edit_resources_task(resouce_type: str, update_datas: list[dict[str, Any]]) -
 
 @task_with_cache_clear
 def synchronize_resources_task(resource_type: str, results: list[dict[str, Any]]) -> dict[str, dict[str, bool]]:
-    created = {}
-    updated = {}
-    for result in results:
-        id = result['id']
-        if not exists(resource_type, id):
-            created[id] = (create(resource_type, id, result) is not None)
-        elif updatable(resource_type, id):
-            updated[id] = (update(resource_type, id, result) is not None)
+    statuses = upsert_many(resource_type, results) or {}
+    created = {id: True for id, status in statuses.items() if status == 'created'}
+    updated = {id: True for id, status in statuses.items() if status == 'updated'}
     return {'created': created, 'updated': updated}
@@ -6,8 +6,10 @@ from vndb.database import (
     recover, recover_all,
     count_all 
 )
+from vndb.database.pagination import encode_cursor
+from vndb.search import validate_sort_local
 from .common import (
-    task_with_memoize, task_with_cache_clear, 
+    task_with_memoize, task_with_cache_clear, task_with_progress,
     format_results, NOT_FOUND
 )
 
@@ -17,17 +19,25 @@ def get_inactive_resource_task(item_type: str, item_id: str) -> dict[str, Any]:
     return format_results(result)
 
 @task_with_memoize(timeout=600)
-def get_inactive_resources_task(item_type: str, page: int = None, limit: int = None, sort: str = 'id', reverse: bool = False, count: bool = True) -> dict[str, Any]:
-    results = get_inactive_all(item_type, page, limit, sort, reverse)
+def get_inactive_resources_task(item_type: str, page: int = None, limit: int = None, sort: str = 'id', reverse: bool = False, count: bool = True,
+                                cursor: str = None) -> dict[str, Any]:
+    # Same ordering as local search: released/birthday go through their typed keyset columns
+    sort = validate_sort_local(item_type, sort)
+    results = get_inactive_all(item_type, page, limit, sort, reverse, cursor)
     if not results:
         return NOT_FOUND
     total = count_all(item_type)
-    more = (page * limit) < total if page and limit else False
+    if cursor:
+        more = len(results) == limit if limit else False
+    else:
+        more = (page * limit) < total if page and limit else False
+    next_cursor = encode_cursor(sort, reverse, getattr(results[-1], sort), results[-1].id) if more else None
 
     results = format_results(results)
     if count:
         results['count'] = total
     results['more'] = more
+    results['next_cursor'] = next_cursor
     return results
 
 @task_with_cache_clear
@@ -35,9 +45,9 @@ def recover_resource_task(item_type: str, item_id: str) -> dict[str, Any]:
     result = recover(item_type, item_id)
     return format_results(result)
 
-@task_with_cache_clear
-def recover_resources_task(item_type: str) -> dict[str, Any]:
-    results = recover_all(item_type)
+@task_with_progress
+def recover_resources_task(item_type: str, vacuum: bool = False, progress=None) -> dict[str, Any]:
+    results = recover_all(item_type, progress=progress, vacuum=vacuum)
     return format_results(results)
 
 @task_with_cache_clear
@@ -45,7 +55,7 @@ def cleanup_resource_task(item_type: str, item_id: str) -> dict[str, Any]:
     result = cleanup(item_type, item_id)
     return format_results(result)
 
-@task_with_cache_clear
-def cleanup_resources_task(item_type: str) -> dict[str, Any]:
-    results = cleanup_all(item_type)
+@task_with_progress
+def cleanup_resources_task(item_type: str, vacuum: bool = False, progress=None) -> dict[str, Any]:
+    results = cleanup_all(item_type, progress=progress, vacuum=vacuum)
     return format_results(results)
\ No newline at end of file